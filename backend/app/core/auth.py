@@ -1,5 +1,7 @@
 # backend/app/core/auth.py
+from typing import Optional
 from fastapi import Depends, HTTPException, status
+from starlette.requests import HTTPConnection
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
@@ -31,3 +33,34 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         raise credentials_exception
 
     return usuario
+
+def bearer_token(connection: HTTPConnection) -> Optional[str]:
+    """
+    Token del header Authorization o, en un WebSocket (el navegador no permite
+    enviar headers), del parámetro ?token=.
+    """
+    scheme, _, token = connection.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token
+    return connection.query_params.get("token") or None
+
+def token_usuario_id(token: Optional[str]) -> Optional[int]:
+    """
+    usuario_id de un token JWT válido, o None. No consulta la base de datos.
+    """
+    if not token:
+        return None
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]).get("usuario_id")
+    except JWTError:
+        return None
+
+def request_identity(connection: HTTPConnection) -> str:
+    """
+    Identidad de la solicitud para los límites por usuario: "usuario:<id>" si trae
+    un token JWT válido, si no "ip:<dirección>".
+    """
+    usuario_id = token_usuario_id(bearer_token(connection))
+    if usuario_id is not None:
+        return f"usuario:{usuario_id}"
+    return f"ip:{connection.client.host if connection.client else 'desconocida'}"
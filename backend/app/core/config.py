@@ -18,4 +18,86 @@ class Settings:
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
+    # Preprocesamiento por lotes (1 = secuencial, 0 = todos los núcleos)
+    PREPROCESS_WORKERS: int = int(os.getenv("PREPROCESS_WORKERS", 1))
+    PREPROCESS_CHUNK_SIZE: int = int(os.getenv("PREPROCESS_CHUNK_SIZE", 16))
+
+    # Formato del dataset: "npy" (un archivo por secuencia) o "shard" (bloque empaquetado)
+    DATASET_FORMAT: str = os.getenv("DATASET_FORMAT", "npy")
+
+    # Proceso de entrenamiento (0 = valor por defecto de TensorFlow / sin restricción)
+    TRAINING_THREADS: int = int(os.getenv("TRAINING_THREADS", 0))
+    TRAINING_INTER_OP_THREADS: int = int(os.getenv("TRAINING_INTER_OP_THREADS", 0))
+    TRAINING_CPU_AFFINITY: str = os.getenv("TRAINING_CPU_AFFINITY", "")  # p. ej. "2,3" o "2-7"
+    TRAINING_NICE: int = int(os.getenv("TRAINING_NICE", 10))
+
+    # Registro de trabajos: segundos que dura el lease del worker dueño sin renovarse
+    JOB_LEASE_SECONDS: int = int(os.getenv("JOB_LEASE_SECONDS", 60))
+
+    # Micro-lotes de inferencia: ventana de espera (ms) y tamaño máximo (1 = sin agrupar)
+    INFERENCE_BATCH_WINDOW_MS: float = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", 5))
+    INFERENCE_MAX_BATCH_SIZE: int = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", 32))
+    # Cargar TensorFlow y precalentar el motor de inferencia al iniciar la API (en
+    # segundo plano); con 0 se cargan en la primera predicción o con POST /warmup
+    INFERENCE_WARMUP: bool = os.getenv("INFERENCE_WARMUP", "0") == "1"
+
+    # Ejecutor de inferencia: hilos, solicitudes en espera admitidas y tiempo límite (s)
+    INFERENCE_WORKERS: int = int(os.getenv("INFERENCE_WORKERS", 8))
+    INFERENCE_MAX_PENDING: int = int(os.getenv("INFERENCE_MAX_PENDING", 64))
+    INFERENCE_TIMEOUT_SECONDS: float = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", 10))
+    # Hilos de TensorFlow por operación y entre operaciones (0 = valor por defecto)
+    INFERENCE_INTRA_OP_THREADS: int = int(os.getenv("INFERENCE_INTRA_OP_THREADS", 0))
+    INFERENCE_INTER_OP_THREADS: int = int(os.getenv("INFERENCE_INTER_OP_THREADS", 0))
+
+    # Registro de versiones del modelo (utils.registro_modelos) y cada cuántos
+    # segundos la API revisa si cambió la versión activa
+    MODEL_DIR: str = os.getenv("MODEL_DIR", "models")
+    MODEL_REFRESH_SECONDS: float = float(os.getenv("MODEL_REFRESH_SECONDS", 5))
+
+    # Socket Unix del servidor de modelo (utils.servidor_modelo); si se define, los
+    # workers de la API le envían las secuencias preprocesadas y no cargan TensorFlow
+    MODEL_SERVER_SOCKET: str = os.getenv("MODEL_SERVER_SOCKET", "")
+
+    # Backend de inferencia: "keras" (gesture_model.h5) o "tflite" (gesture_model.tflite) del bundle activo
+    INFERENCE_BACKEND: str = os.getenv("INFERENCE_BACKEND", "keras")
+    # Exportar TFLite al terminar el entrenamiento; cuantización: "none", "dynamic" o "int8"
+    TFLITE_EXPORT: bool = os.getenv("TFLITE_EXPORT", "1") == "1"
+    TFLITE_QUANTIZATION: str = os.getenv("TFLITE_QUANTIZATION", "none")
+
+    # Reconocimiento continuo (WebSocket): frames entre evaluaciones, frames mínimos
+    # para evaluar y evaluaciones seguidas necesarias para confirmar una palabra
+    STREAM_STRIDE: int = int(os.getenv("STREAM_STRIDE", 5))
+    STREAM_MIN_FRAMES: int = int(os.getenv("STREAM_MIN_FRAMES", 15))
+    STREAM_DEBOUNCE: int = int(os.getenv("STREAM_DEBOUNCE", 2))
+    # Avanzar el estado del LSTM frame a frame en lugar de reevaluar cada ventana
+    # (mismo cómputo, repartido en un paso por frame y sin pasar por Keras)
+    STREAM_INCREMENTAL: bool = os.getenv("STREAM_INCREMENTAL", "1") == "1"
+    # Sesiones abiertas por worker de la API y frames admitidos por mensaje
+    STREAM_MAX_SESSIONS: int = int(os.getenv("STREAM_MAX_SESSIONS", 32))
+    STREAM_MAX_FRAMES_PER_MESSAGE: int = int(os.getenv("STREAM_MAX_FRAMES_PER_MESSAGE", 60))
+
+    # Predicción con salida temprana: frames mínimos de un prefijo, fracción mínima de
+    # TARGET_LENGTH que debe cubrir para salir antes y paso entre prefijos (frames)
+    EARLY_EXIT_MIN_FRAMES: int = int(os.getenv("EARLY_EXIT_MIN_FRAMES", 10))
+    EARLY_EXIT_MIN_COVERAGE: float = float(os.getenv("EARLY_EXIT_MIN_COVERAGE", 0.6))
+    EARLY_EXIT_STEP: int = int(os.getenv("EARLY_EXIT_STEP", 5))
+
+    # Control de admisión de las rutas de predicción (por worker de la API): solicitudes
+    # en curso, en espera de un lugar y segundos máximos de espera antes de responder 503
+    ADMISSION_MAX_INFLIGHT: int = int(os.getenv("ADMISSION_MAX_INFLIGHT", 16))
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", 32))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", 2))
+    # Límite por usuario (identidad del JWT, o IP sin token): solicitudes por segundo
+    # y ráfaga admitida (0 = sin límite); al excederlo se responde 429
+    RATE_LIMIT_PER_SECOND: float = float(os.getenv("RATE_LIMIT_PER_SECOND", 5))
+    RATE_LIMIT_BURST: int = int(os.getenv("RATE_LIMIT_BURST", 10))
+
+    # Evaluación por lotes (POST /evaluacion/batch): secuencias admitidas por solicitud
+    BATCH_PREDICT_MAX_SEQUENCES: int = int(os.getenv("BATCH_PREDICT_MAX_SEQUENCES", 64))
+
+    # Evaluación offline de versiones (utils.evaluacion_offline): secuencias por pasada
+    # del modelo y procesos que preprocesan capturas crudas (0 = todos los núcleos)
+    EVALUATION_BATCH_SIZE: int = int(os.getenv("EVALUATION_BATCH_SIZE", 256))
+    EVALUATION_WORKERS: int = int(os.getenv("EVALUATION_WORKERS", 1))
+
 settings = Settings()
@@ -1,5 +1,6 @@
 # backend/app/main.py
 import logging.config
+import threading
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -17,6 +18,7 @@ from app.routers import (
     evaluacion_router,
     dashboard_router
 )
+from app.routers.evaluacion_router import warmup_inference
 
 
 # Crear la aplicación con configuración centralizada
@@ -55,3 +57,14 @@ routers = [
 for r in routers:
     app.include_router(r)
 
+
+@app.on_event("startup")
+def warmup_model():
+    """
+    TensorFlow y el modelo se cargan en la primera predicción o con POST /warmup.
+    Con INFERENCE_WARMUP se cargan y precalientan al iniciar, en un hilo aparte
+    para que la API atienda las demás rutas mientras tanto.
+    """
+    if not settings.INFERENCE_WARMUP:
+        return
+    threading.Thread(target=warmup_inference, name="precalentamiento", daemon=True).start()
@@ -0,0 +1,46 @@
+# app/models/trabajo_model.py
+
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, JSON, Text
+from datetime import datetime
+from app.models.clase_base import Base
+
+class Trabajo(Base):
+    """
+    Trabajo pesado (preprocesamiento, entrenamiento o evaluación) compartido por todos los
+    workers de la API.
+
+    Solo puede haber un trabajo activo por tipo: mientras está activo, `bloqueo`
+    toma el valor del tipo y la restricción única impide reclamar otro (los NULL
+    no colisionan). El worker dueño renueva `lease_hasta`; si deja de hacerlo el
+    trabajo se considera abandonado y puede reclamarse de nuevo.
+    """
+    __tablename__ = "trabajos"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+
+    # "preprocesamiento", "entrenamiento" o "evaluacion"
+    tipo = Column(String(50), nullable=False, index=True)
+
+    # running, completed, failed, cancelled
+    estado = Column(String(50), nullable=False, default="running")
+
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=True)
+    meta_entrenamiento_id = Column(Integer, ForeignKey("meta_entrenamiento.id"), nullable=True)
+
+    # Worker dueño ("host:pid") y vencimiento de su lease
+    propietario = Column(String(255), nullable=True)
+    lease_hasta = Column(DateTime, nullable=True)
+    bloqueo = Column(String(50), unique=True, nullable=True)
+
+    cancelacion_solicitada = Column(Boolean, nullable=False, default=False)
+
+    hora_creacion = Column(DateTime, default=datetime.utcnow)
+    hora_inicio = Column(DateTime, nullable=True)
+    hora_fin = Column(DateTime, nullable=True)
+
+    progreso = Column(JSON, nullable=True)
+    resultado = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+
+    def __repr__(self):
+        return f"<Trabajo id={self.id} tipo={self.tipo} estado={self.estado}>"
@@ -1,17 +1,22 @@
 # backend/app/routers/captura_router.py
+import io
 import os
-import json
 import datetime
 import aiofiles
 import logging
+import numpy as np
+from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 from app.db.coneccion import get_db
 from app.models.meta_captura_model import MetadatosCaptura
-from app.schemas.captura_schema import CaptureRequest
+from app.schemas.captura_schema import CaptureRequest, frames_data_to_array
 from app.core.rol_auth import require_role
 from app.models.usuario_model import Usuario
+from utils.formato_binario import BINARY_CONTENT_TYPE, decode_landmarks
 
 logger = logging.getLogger(__name__)
 
@@ -24,41 +29,78 @@ router = APIRouter(
 DATA_DIR = "data/capturas"
 os.makedirs(DATA_DIR, exist_ok=True)  # Crear directorio si no existe
 
-@router.post("/", status_code=status.HTTP_201_CREATED, summary="Capturar datos de referencia")
+@router.post(
+    "/",
+    status_code=status.HTTP_201_CREATED,
+    summary="Capturar datos de referencia",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "object"}},
+                BINARY_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+            },
+        }
+    },
+)
 async def capture_data(
-    data: CaptureRequest, 
+    request: Request,
+    label: Optional[str] = Query(None, description="Palabra asociada (solo para el formato binario)."),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(require_role("admin"))
     ):
     """
-    Recibe datos de referencia para una palabra en lenguaje de señas y los guarda en un archivo JSON.
+    Recibe datos de referencia para una palabra en lenguaje de señas y los guarda
+    como .npz (array de landmarks + palabra) en data/capturas.
     - **label**: Palabra asociada.
-    - **framesData**: Datos de landmarks por fotograma.
+    - **framesData**: Datos de landmarks por fotograma. Cada grupo puede enviarse
+      como lista plana [x0, y0, z0, ...] o con el formato anidado {"x","y","z"}.
+
+    También acepta el formato binario compacto (Content-Type: application/x-landmarks,
+    ver utils.formato_binario) con la palabra en el parámetro `label`.
     """
     
     def safe_label(label: str) -> str:
         temp = label.replace(" ", "_")
         return temp
+
+    body = await request.body()
+    if request.headers.get("content-type", "").split(";")[0].strip() == BINARY_CONTENT_TYPE:
+        if not label:
+            raise HTTPException(status_code=422, detail="El parámetro 'label' es obligatorio en formato binario.")
+        try:
+            landmarks = decode_landmarks(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        cant_fotogramas = len(landmarks)
+    else:
+        try:
+            data = CaptureRequest.model_validate_json(body)
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+        label = data.label
+        landmarks = frames_data_to_array(data.framesData)
+        cant_fotogramas = len(landmarks)
+
     try:
         # Crear el nombre del archivo basado en la palabra y un timestamp
-        clean_label = safe_label(data.label)
+        clean_label = safe_label(label)
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        file_name = f"{clean_label}_{len(data.framesData)}_{timestamp}.json"
+        file_name = f"{clean_label}_{cant_fotogramas}_{timestamp}.npz"
         ##file_name = f"{data.label}_{len(data.framesData)}_{timestamp}.json"
         file_path = os.path.join(DATA_DIR, file_name)
 
-        # Guardar los datos en un archivo JSON de forma asíncrona
-        async with aiofiles.open(file_path, "w", encoding="utf-8") as file:
-            # Convertir el objeto Pydantic a dict y luego a JSON
-            content = json.dumps(data.dict(), ensure_ascii=False, indent=4)
-            await file.write(content)
+        # Guardar los datos de forma asíncrona
+        buffer = io.BytesIO()
+        np.savez(buffer, landmarks=landmarks, label=np.array(label))
+        async with aiofiles.open(file_path, "wb") as file:
+            await file.write(buffer.getvalue())
 
         logger.info(f"Datos capturados y guardados en {file_path}")
         # Guarda metadatos
-        cant_fotogramas = len(data.framesData)
         nuevos_metadatos = MetadatosCaptura(
             usuario_id=current_user.id,
-            palabra=data.label,
+            palabra=label,
             cant_fotogramas=cant_fotogramas
         )
         db.add(nuevos_metadatos)
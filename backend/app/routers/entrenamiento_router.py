@@ -1,14 +1,20 @@
 # backend/app/routers/entrenamiento_router.py
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from typing import Literal, Optional
+import os
 import logging
 from app.models.meta_entrenamiento_model import MetadatosEntrenamiento
-from utils.entrenamiento_modelo import train_gesture_recognition_model
-from utils.generar_label_map import create_label_map_from_folders
+from app.services.trabajo_service import (
+    JOB_EVALUATION, JOB_TRAINING, claim_job, finish_job, job_status, request_cancel, start_heartbeat
+)
+from utils.trabajador_entrenamiento import cancel_training_process, start_training_process
+from utils.evaluacion_offline import SOURCES, cancel_evaluation_process, start_evaluation_process
+from utils.registro_modelos import activate_version, list_versions, load_bundle, read_registry, rollback
 from app.models.usuario_model import Usuario
 from app.core.rol_auth import require_role
-from app.db.coneccion import get_db
+from app.db.coneccion import SessionLocal, get_db
 
 logging.basicConfig(
     level=logging.INFO,
@@ -25,66 +31,187 @@ router = APIRouter(
     tags=["Entrenamiento"]
 )
 
-# Estado global simple para entrenamiento
+# Progreso local del entrenamiento que corre en este worker; el estado compartido
+# entre workers vive en la tabla de trabajos (app.services.trabajo_service)
 TRAIN_STATE = {
-    "status": "idle"  # "idle", "running", "completed", "failed"
+    "status": "idle",  # "idle", "running", "completed", "failed", "cancelled"
+    "progress": {},    # última época reportada por el proceso de entrenamiento
+    "result": {}
+}
+
+# Progreso local de la evaluación offline que corre en este worker
+EVALUATION_STATE = {
+    "status": "idle",  # "idle", "running", "completed", "failed", "cancelled"
+    "progress": {},
+    "result": {}
 }
 
 @router.post("/", summary="Ejecuta el entrenamiento del modelo LSTM")
 async def start_training(
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(require_role("admin"))
 ):
     """
-    Inicia el entrenamiento en segundo plano.
+    Inicia el entrenamiento en un proceso dedicado (utils.trabajador_entrenamiento).
+    Solo un worker de la API puede reclamar el trabajo de entrenamiento a la vez.
     """
-    if TRAIN_STATE["status"] == "running":
-        raise HTTPException(status_code=400, detail="Ya hay un entrenamiento en curso.")
+    job = claim_job(db, JOB_TRAINING, usuario_id=current_user.id)
+    stop_heartbeat = None
+    try:
+        # Crear registro en DB (el label_map se guarda en el bundle de la versión entrenada)
+        nuevo_meta = MetadatosEntrenamiento(
+            usuario_id=current_user.id,
+            estado="started"
+        )
+        db.add(nuevo_meta)
+        db.commit()
+        db.refresh(nuevo_meta)
+        job.meta_entrenamiento_id = nuevo_meta.id
+        db.commit()
 
-    # Generar label_map
-    create_label_map_from_folders("dataset", "models/label_map.json")
+        logger.info("Iniciando entrenamiento en segundo plano.")
+        stop_heartbeat = start_heartbeat(job.id, lambda: TRAIN_STATE["progress"], cancel_training_process)
+        start_training_process(nuevo_meta.id, TRAIN_STATE,
+                               on_finish=lambda estado, state: record_training_end(job.id, stop_heartbeat, estado, state))
+    except Exception as e:
+        if stop_heartbeat:
+            stop_heartbeat.set()
+        finish_job(db, job.id, "failed", error=str(e))
+        logger.exception(f"No se pudo iniciar el entrenamiento: {e}")
+        raise HTTPException(status_code=500, detail="No se pudo iniciar el entrenamiento.")
 
-    # Crear registro en DB
-    nuevo_meta = MetadatosEntrenamiento(
-        usuario_id=current_user.id,
-        estado="started"
-    )
-    db.add(nuevo_meta)
-    db.commit()
-    db.refresh(nuevo_meta)
+    return {"message": "El entrenamiento ha sido iniciado en segundo plano.", "job_id": job.id}
 
-    # setear estado a 'running'
-    TRAIN_STATE["status"] = "running"
-    logger.info("Iniciando entrenamiento en segundo plano.")
+@router.post("/cancel", summary="Cancela el entrenamiento en curso")
+def cancel_training(
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role("admin"))
+):
+    """
+    Detiene el entrenamiento al terminar el batch en curso. Si corre en otro
+    worker, este la aplica en su siguiente renovación del lease.
+    """
+    job = request_cancel(db, JOB_TRAINING)
+    cancel_training_process()
+    logger.info("Cancelación de entrenamiento solicitada.")
+    return {"message": "Cancelación solicitada.", "job_id": job.id}
 
-    # Lanza la tarea real en background
-    background_tasks.add_task(real_training_task, nuevo_meta.id)
+@router.get("/status", summary="Retorna el estado actual del entrenamiento")
+def get_training_status(db: Session = Depends(get_db)):
+    """
+    Devuelve el estado actual ('running', 'completed', 'failed', 'cancelled', 'idle')
+    y el progreso por época del último trabajo de entrenamiento.
+    """
+    state = job_status(db, JOB_TRAINING)
+    job = state["job"] or {}
+    return {**state, "progress": job.get("progreso", {}), "result": job.get("resultado") or {}}
 
-    return {"message": "El entrenamiento ha sido iniciado en segundo plano."}
+@router.get("/modelos", summary="Lista las versiones del modelo")
+def get_model_versions(current_user: Usuario = Depends(require_role("admin"))):
+    """
+    Versiones publicadas en el registro, la activa y el historial de activaciones.
+    """
+    return {**read_registry(), "versions": list_versions()}
 
-@router.get("/status", summary="Retorna el estado actual del entrenamiento")
-def get_training_status():
+@router.post("/modelos/{version}/activar", summary="Activa una versión del modelo")
+def activate_model_version(version: str, current_user: Usuario = Depends(require_role("admin"))):
+    """
+    Marca la versión como activa. Cada worker de la API la carga y precalienta en
+    segundo plano y cambia a ella sin reiniciarse (MODEL_REFRESH_SECONDS).
+    """
+    try:
+        registry = activate_version(version)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return registry
+
+@router.post("/modelos/rollback", summary="Vuelve a la versión anterior del modelo")
+def rollback_model_version(current_user: Usuario = Depends(require_role("admin"))):
+    try:
+        registry = rollback()
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return registry
+
+@router.post("/evaluacion", summary="Evalúa una versión del modelo sobre el dataset o las capturas")
+def start_evaluation(
+    version: Optional[str] = Query(None, description="Versión del registro; por defecto la activa"),
+    source: Literal["dataset", "capturas"] = Query("dataset", description="dataset (secuencias preprocesadas) o capturas crudas"),
+    subset: Literal["test", "all"] = Query("test", description="test = conjunto de prueba del entrenamiento; all = dataset completo (incluye datos de entrenamiento)"),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role("admin"))
+):
     """
-    Devuelve el estado actual: 'running', 'completed', 'failed', 'idle'
+    Inicia la evaluación offline en un proceso dedicado (utils.evaluacion_offline):
+    matriz de confusión, precisión y recall por clase y tiempos por lote, sin pasar
+    por el endpoint de predicción. El resultado queda en GET /entrenamiento/evaluacion/status.
     """
-    return {"status": TRAIN_STATE["status"]}
+    if version:
+        try:
+            load_bundle(version)
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if not os.path.isdir(SOURCES[source]):
+        raise HTTPException(status_code=400, detail=f"No existe: {SOURCES[source]}")
 
-def real_training_task(entrenamiento_id: int):
+    job = claim_job(db, JOB_EVALUATION, usuario_id=current_user.id)
+    stop_heartbeat = None
+    try:
+        stop_heartbeat = start_heartbeat(job.id, lambda: EVALUATION_STATE["progress"], cancel_evaluation_process)
+        start_evaluation_process(EVALUATION_STATE, version=version, source=source, subset=subset,
+                                 on_finish=lambda estado, state: record_evaluation_end(job.id, stop_heartbeat, estado, state))
+    except Exception as e:
+        if stop_heartbeat:
+            stop_heartbeat.set()
+        finish_job(db, job.id, "failed", error=str(e))
+        logger.exception(f"No se pudo iniciar la evaluación: {e}")
+        raise HTTPException(status_code=500, detail="No se pudo iniciar la evaluación.")
+
+    return {"message": "La evaluación ha sido iniciada en segundo plano.", "job_id": job.id}
+
+@router.post("/evaluacion/cancel", summary="Cancela la evaluación en curso")
+def cancel_evaluation(
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role("admin"))
+):
+    job = request_cancel(db, JOB_EVALUATION)
+    cancel_evaluation_process()
+    return {"message": "Cancelación solicitada.", "job_id": job.id}
+
+@router.get("/evaluacion/status", summary="Retorna el estado y el resultado de la última evaluación")
+def get_evaluation_status(db: Session = Depends(get_db)):
+    state = job_status(db, JOB_EVALUATION)
+    job = state["job"] or {}
+    return {**state, "progress": job.get("progreso", {}), "result": job.get("resultado") or {}}
+
+def record_evaluation_end(job_id: int, stop_heartbeat, estado: str, state: dict):
     """
-    Llama la función real 'train_gesture_recognition_model'.
-    Si todo ok => TRAIN_STATE['status']='completed'
-    si falla => 'failed'
+    Registra en la tabla de trabajos el resultado de la evaluación offline.
     """
-    from app.db.coneccion import SessionLocal
+    stop_heartbeat.set()
     db = SessionLocal()
     try:
-        train_gesture_recognition_model(entrenamiento_id)
-        TRAIN_STATE["status"] = "completed"
-        logger.info("Entrenamiento completado con éxito.")
-    except Exception as e:
-        TRAIN_STATE["status"] = "failed"
-        logger.exception(f"Error en entrenamiento: {str(e)}")
-        # Actualiza en DB si quieres
+        result = state.get("result") or {}
+        finish_job(db, job_id, estado, progreso=state.get("progress"),
+                   resultado=result, error=result.get("error"))
+    finally:
+        db.close()
+
+def record_training_end(job_id: int, stop_heartbeat, estado: str, state: dict):
+    """
+    Registra en la tabla de trabajos el resultado reportado por el proceso de entrenamiento.
+    """
+    stop_heartbeat.set()
+    db = SessionLocal()
+    try:
+        result = state.get("result") or {}
+        finish_job(db, job_id, estado, progreso=state.get("progress"),
+                   resultado=result, error=result.get("error"))
     finally:
         db.close()
@@ -1,8 +1,29 @@
 # backend/app/routers/evaluacion_router.py
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List, Dict
-from utils.evaluacion import predict
+# utils.evaluacion (TensorFlow) se importa en el primer uso, dentro del ejecutor de
+# inferencia, para que iniciar la API no cargue la pila de ML
+import sys
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional
+from app.core.config import settings
+from app.core.auth import bearer_token, request_identity, token_usuario_id
+from app.core.rol_auth import require_role
+from app.models.usuario_model import Usuario
+from app.schemas.captura_schema import FrameData, frames_data_to_array
+from utils.control_admision import (
+    Overloaded, RateLimited, get_admission_controller, get_admission_metrics, get_rate_limiter, retry_after_header
+)
+from utils.ejecutor_inferencia import ExecutorBusy, get_executor, get_executor_metrics
+from utils.formato_binario import BINARY_CONTENT_TYPE, TooManyRecords, decode_landmarks, decode_landmarks_batch
+from utils.preprocesamiento import NoSigningDetected
+from utils.servidor_modelo import ModelServerError
+from utils.reconocimiento_continuo import StreamingSession
+
+logger = logging.getLogger(__name__)
 
 
 router = APIRouter(
@@ -11,18 +32,376 @@ router = APIRouter(
 )
 
 class PredictionRequest(BaseModel):
-    framesData: List[Dict]    
+    framesData: List[FrameData]
+
+class BatchPredictionRequest(BaseModel):
+    sequences: List[PredictionRequest] = Field(..., min_length=1)
+
+async def enforce_rate_limit(request: Request):
+    """
+    Límite por usuario de las rutas de predicción (utils.control_admision):
+    responde 429 con Retry-After al excederlo.
+    """
+    try:
+        get_rate_limiter().acquire(request_identity(request))
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers=retry_after_header(e.retry_after))
     
-@router.post("/" , summary="Evalua los puntos de refencia y muestra resultado")
-async def predict_gesture(request: PredictionRequest):
+@router.post(
+    "/",
+    summary="Evalua los puntos de refencia y muestra resultado",
+    dependencies=[Depends(enforce_rate_limit)],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "object"}},
+                BINARY_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+            },
+        }
+    },
+)
+async def predict_gesture(
+    request: Request,
+    early_exit: bool = Query(False, description="Retornar con el primer prefijo que supere el umbral de confianza")
+):
     """
     Endpoint para realizar predicción de gestos en tiempo real.
+    Acepta JSON ({"framesData": [...]}, cada grupo como lista plana [x0, y0, z0, ...]
+    o con el formato anidado {"x","y","z"}) o el formato binario compacto
+    (Content-Type: application/x-landmarks, ver utils.formato_binario).
+    La decodificación, el preprocesamiento y la inferencia corren en el ejecutor
+    de inferencia, sin bloquear el event loop.
+    - **early_exit**: evalúa prefijos crecientes de la secuencia (con una cobertura mínima) y retorna con el primero
+      suficientemente confiable; la respuesta incluye frames_used y frames_received.
+    Las secuencias sin señas (manos ausentes y brazos quietos) se rechazan con 422
+    sin ejecutar el modelo. Con el servicio saturado se responde 503, y 429 si el
+    usuario excede su límite, ambos con Retry-After (ver utils.control_admision).
     """
     try:
-        # Pasa framesData directamente al proceso de predicción
-        prediction_result = predict({"framesData": request.framesData})
+        # El cuerpo se lee recién con un lugar asignado: las solicitudes descartadas no lo cargan
+        async with get_admission_controller().slot():
+            body = await request.body()
+            content_type = request.headers.get("content-type", "").split(";")[0].strip()
+            prediction_result = await get_executor().run(predict_from_body, content_type, body, early_exit)
         return prediction_result
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=retry_after_header(e.retry_after))
+    except HTTPException:
+        raise
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    except NoSigningDetected as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except (ExecutorBusy, ModelServerError) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="La predicción excedió el tiempo límite.")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error interno: {e}")
+
+def decode_prediction_body(content_type: str, body: bytes) -> dict:
+    """
+    Convierte el cuerpo de la solicitud (binario o JSON) en {"landmarks": array}.
+    """
+    if content_type == BINARY_CONTENT_TYPE:
+        try:
+            return {"landmarks": decode_landmarks(body)}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    frames = PredictionRequest.model_validate_json(body).framesData
+    return {"landmarks": frames_data_to_array(frames)}
+
+def predict_from_body(content_type: str, body: bytes, early_exit: bool = False):
+    from utils.evaluacion import predict
+
+    data = decode_prediction_body(content_type, body)
+    data["early_exit"] = early_exit
+    return predict(data)
+
+@router.post(
+    "/batch",
+    summary="Evalúa varias secuencias en una sola pasada del modelo",
+    dependencies=[Depends(enforce_rate_limit)],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "object"}},
+                BINARY_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+            },
+        }
+    },
+)
+async def predict_gesture_batch(
+    request: Request,
+    top_k: int = Query(3, ge=1, le=20, description="Clases más probables a incluir por secuencia")
+):
+    """
+    Evaluación por lotes. Acepta JSON ({"sequences": [{"framesData": [...]}, ...]})
+    o registros binarios consecutivos (Content-Type: application/x-landmarks), hasta
+    BATCH_PREDICT_MAX_SEQUENCES secuencias. Retorna model_version y, en el orden
+    recibido, predicted_label, confidence y top_k de cada secuencia; las que no
+    contienen señas se informan con "error" sin rechazar el lote.
+    """
+    try:
+        async with get_admission_controller().slot():
+            body = await request.body()
+            content_type = request.headers.get("content-type", "").split(";")[0].strip()
+            return await get_executor().run(predict_batch_from_body, content_type, body, top_k)
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=retry_after_header(e.retry_after))
+    except HTTPException:
+        raise
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    except (ExecutorBusy, ModelServerError) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="La predicción excedió el tiempo límite.")
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error interno: {e}")
+
+def decode_batch_body(content_type: str, body: bytes) -> list:
+    """
+    Convierte el cuerpo de la solicitud por lotes en una lista de arrays (T, POINTS_PER_FRAME, 3).
+    El límite de BATCH_PREDICT_MAX_SEQUENCES (413) se controla antes de decodificar
+    las secuencias: en binario al contar los registros, en JSON con el largo de la lista.
+    """
+    limit = settings.BATCH_PREDICT_MAX_SEQUENCES
+    if content_type == BINARY_CONTENT_TYPE:
+        try:
+            return decode_landmarks_batch(body, limit)
+        except TooManyRecords as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        # JSON mal formado: Pydantic arma el error de validación (422)
+        BatchPredictionRequest.model_validate_json(body)
+        raise
+    items = payload.get("sequences") if isinstance(payload, dict) else None
+    if isinstance(items, list) and len(items) > limit:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El lote admite hasta {limit} secuencias; se recibieron {len(items)}.",
+        )
+    return [frames_data_to_array(item.framesData)
+            for item in BatchPredictionRequest.model_validate(payload).sequences]
+
+def predict_batch_from_body(content_type: str, body: bytes, top_k: int = 3):
+    from utils.evaluacion import predict_batch
+
+    return predict_batch(decode_batch_body(content_type, body), top_k)
+
+def load_streaming_model():
+    """
+    Versión del modelo en servicio para una sesión continua y, con
+    STREAM_INCREMENTAL, su modelo incremental.
+    """
+    from utils.evaluacion import get_served_model
+
+    served = get_served_model()
+    return served, served.incremental() if settings.STREAM_INCREMENTAL else None
+
+def warmup_inference() -> bool:
+    """
+    Importa la pila de ML, carga el modelo y precalienta el motor de inferencia.
+    Retorna False si aún no hay un modelo entrenado.
+    """
+    from utils import evaluacion
+
+    try:
+        evaluacion.warmup_inference()
+        return True
+    except FileNotFoundError as e:
+        logger.warning(f"Precalentamiento omitido: {e}")
+        return False
+
+@router.post("/warmup", summary="Carga y precalienta el modelo de evaluación")
+async def warmup_model(current_user: Usuario = Depends(require_role("admin"))):
+    """
+    Carga explícita de TensorFlow y del modelo en este worker, para que la primera
+    predicción no pague ese costo. Se ejecuta fuera del ejecutor de inferencia
+    porque puede superar INFERENCE_TIMEOUT_SECONDS.
+    """
+    loaded = await asyncio.to_thread(warmup_inference)
+    if not loaded:
+        raise HTTPException(status_code=404, detail="No hay un modelo entrenado para cargar.")
+    return {"message": "Modelo cargado y precalentado.", **sys.modules["utils.evaluacion"].get_model_info()}
+
+
+@router.websocket("/ws")
+async def stream_recognition(websocket: WebSocket):
+    """
+    Reconocimiento continuo. El cliente se conecta con su token (?token=... o el
+    header Authorization) y envía los frames a medida que los captura: mensajes
+    binarios en el formato de utils.formato_binario (hasta
+    STREAM_MAX_FRAMES_PER_MESSAGE frames) o texto JSON {"frame": {...}} /
+    {"framesData": [...]}. El servidor evalúa una ventana deslizante cada
+    STREAM_STRIDE frames y envía {"type": "prediction", "predicted_label",
+    "confidence", "frame"} cuando una palabra se confirma (STREAM_DEBOUNCE
+    evaluaciones seguidas).
+    Con STREAM_INCREMENTAL el estado del LSTM avanza frame a frame (un paso por
+    ventana en curso) en lugar de reevaluar la ventana completa. Si falla la
+    evaluación de una ventana se envía {"type": "error"} y la sesión continúa.
+    Sin un token válido la conexión se cierra con 1008; si el usuario excede su
+    límite o ya hay STREAM_MAX_SESSIONS sesiones abiertas, con 1013.
+    """
+    await websocket.accept()
+    usuario_id = token_usuario_id(bearer_token(websocket))
+    if usuario_id is None:
+        await websocket.close(code=1008, reason="Token inválido o expirado")
+        return
+    try:
+        get_rate_limiter().acquire(f"usuario:{usuario_id}")
+    except RateLimited:
+        await websocket.close(code=1013, reason="Límite de solicitudes excedido")
+        return
+    admission = get_admission_controller()
+    if not admission.open_session():
+        await websocket.close(code=1013, reason="Demasiadas sesiones de reconocimiento abiertas")
+        return
+
+    session = None
+    pending: Optional[asyncio.Task] = None
+    error_tasks = set()
+    try:
+        try:
+            # La sesión usa la misma versión del modelo hasta cerrarse
+            served, incremental = await get_executor().run(load_streaming_model)
+        except (FileNotFoundError, ValueError, ModelServerError) as e:
+            await websocket.send_json({"type": "error", "detail": str(e)})
+            await websocket.close(code=1011)
+            return
+        except (ExecutorBusy, asyncio.TimeoutError):
+            await websocket.close(code=1013, reason="Servicio de evaluación saturado")
+            return
+        # Ya importado por load_streaming_model
+        from utils.evaluacion import CONFIDENCE_THRESHOLD, get_batcher
+        inv_label_map = served.inv_label_map
+
+        session = StreamingSession(
+            stride=settings.STREAM_STRIDE,
+            min_frames=settings.STREAM_MIN_FRAMES,
+            debounce=settings.STREAM_DEBOUNCE,
+            threshold=CONFIDENCE_THRESHOLD,
+            incremental=incremental,
+        )
+
+        async def evaluate(window):
+            probabilities = await asyncio.wrap_future(get_batcher().submit((served, window)))
+            event = session.update(probabilities, inv_label_map)
+            if event:
+                await websocket.send_json(event)
+
+        async def send_error(detail: str):
+            try:
+                await websocket.send_json({"type": "error", "detail": detail})
+            except Exception:
+                pass   # el cliente ya se desconectó
+
+        def evaluated(task: asyncio.Task):
+            # Se lee el resultado de cada evaluación para no perder sus errores
+            if task.cancelled() or task.exception() is None:
+                return
+            logger.error(f"Error evaluando una ventana del reconocimiento continuo: {task.exception()}")
+            error_tasks.add(asyncio.ensure_future(send_error("No se pudo evaluar la ventana.")))
+            error_tasks.difference_update([t for t in error_tasks if t.done()])
+
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            try:
+                frames = decode_stream_message(message)
+            except (ValueError, ValidationError) as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+
+            # Normalización y pasos del LSTM fuera del event loop
+            try:
+                if session.incremental:
+                    results, windows = await get_executor().run(session.push_incremental, frames)
+                else:
+                    results, windows = [], await get_executor().run(session.push, frames)
+            except ExecutorBusy:
+                await websocket.send_json({"type": "error", "detail": "Servicio saturado; se descartaron frames."})
+                continue
+            except asyncio.TimeoutError:
+                # El hilo puede seguir modificando la sesión: no se admiten más frames
+                await websocket.close(code=1011, reason="La evaluación excedió el tiempo límite")
+                break
+
+            for probabilities in results:
+                event = session.update(probabilities, inv_label_map)
+                if event:
+                    await websocket.send_json(event)
+            # Solo una evaluación en curso por sesión: si la anterior no terminó,
+            # se espera a la siguiente ventana en lugar de acumular atraso
+            if windows and (pending is None or pending.done()):
+                pending = asyncio.create_task(evaluate(windows[-1]))
+                pending.add_done_callback(evaluated)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        admission.close_session()
+        # La evaluación en curso ya no tiene a quién responder
+        tasks = list(error_tasks) + ([pending] if pending is not None else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if session is not None:
+            logger.info(f"Sesión de reconocimiento continuo cerrada tras {session.frames} frames.")
+
+def decode_stream_message(message: dict):
+    """
+    Convierte un mensaje del WebSocket en un array (n, POINTS_PER_FRAME, 3).
+    Lanza ValueError si trae más de STREAM_MAX_FRAMES_PER_MESSAGE frames.
+    """
+    if message.get("bytes") is not None:
+        frames = decode_landmarks(message["bytes"])
+        _check_stream_frames(len(frames))
+        return frames
+    payload = json.loads(message.get("text") or "{}")
+    if "frame" in payload:
+        payload = {"framesData": [payload["frame"]]}
+    # Se valida el tamaño antes de validar cada frame
+    _check_stream_frames(len(payload.get("framesData") or []))
+    frames = PredictionRequest.model_validate(payload).framesData
+    return frames_data_to_array(frames)
+
+def _check_stream_frames(count: int):
+    if count > settings.STREAM_MAX_FRAMES_PER_MESSAGE:
+        raise ValueError(f"Cada mensaje admite hasta {settings.STREAM_MAX_FRAMES_PER_MESSAGE} frames; "
+                         f"se recibieron {count}.")
+
+
+@router.get("/metrics", summary="Métricas acumuladas del preprocesamiento en evaluación")
+def evaluation_metrics():
+    """
+    Contadores de diagnóstico acumulados desde el inicio del proceso:
+    frames sin manos/pose/rostro, frames con distancia entre hombros cero,
+    frames rellenados y recortados; el uso de micro-lotes, los tiempos por etapa de la inferencia,
+    la versión del modelo en servicio y el control de admisión (cola y solicitudes descartadas).
+    """
+    # Las métricas no cargan la pila de ML si aún no se usó en este worker
+    evaluacion = sys.modules.get("utils.evaluacion")
+    if evaluacion is None:
+        return {"diagnostics": {}, "batching": {}, "timings": {}, "executor": get_executor_metrics(),
+                "admission": get_admission_metrics(), "model": {"version": None, "previous_version": None}}
+    return {
+        "diagnostics": evaluacion.get_evaluation_metrics(),
+        "batching": evaluacion.get_batching_metrics(),
+        "timings": evaluacion.get_inference_timings(),
+        "executor": get_executor_metrics(),
+        "admission": get_admission_metrics(),
+        "model": evaluacion.get_model_info(),
+    }
@@ -1,11 +1,17 @@
 # backend/app/routers/procesamiento_router.py
 
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from sqlalchemy.orm import Session
 import os
 import logging
 from utils.procesamiento import preprocess_all_files
+from app.core.config import settings
 from app.core.rol_auth import require_role
 from app.models.usuario_model import Usuario
+from app.db.coneccion import SessionLocal, get_db
+from app.services.trabajo_service import (
+    JOB_PREPROCESSING, claim_job, finish_job, job_status, start_heartbeat
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -27,55 +33,82 @@ INPUT_DIR = "data/capturas"
 OUTPUT_DIR = "data/procesados"
 DATASET_DIR = "dataset"
 
-# Variable global de estado
+# Estado local de la ejecución en este worker; el estado compartido entre
+# workers vive en la tabla de trabajos (app.services.trabajo_service)
 PROCESS_STATE = {
-    "status": "idle"   # "idle", "running", "completed", "failed"
+    "status": "idle",   # "idle", "running", "completed", "failed"
+    "stats": {}         # progreso y rendimiento de la última ejecución
 }
 
 @router.post("/", summary="Ejecuta la normalización de los puntos de referencia")
 async def trigger_preprocessing(
     background_tasks: BackgroundTasks,
+    rebuild: bool = False,
+    db: Session = Depends(get_db),
     current_user: Usuario = Depends(require_role("admin"))
 ):
     """
     Endpoint para activar el preprocesamiento en segundo plano.
+    Solo procesa las capturas nuevas o modificadas.
+    - **rebuild**: si es true, reconstruye desde cero las secuencias generadas a partir de capturas.
     """
     if not os.path.exists(INPUT_DIR):
         logger.error(f"El directorio de entrada no existe: {INPUT_DIR}")
         raise HTTPException(status_code=400, detail=f"No existe: {INPUT_DIR}")
     
-    if PROCESS_STATE["status"] == "running":
-        raise HTTPException(status_code=400, detail="Ya hay un proceso de normalización en curso.")
+    # Reclamo atómico: falla si otro worker ya tiene un preprocesamiento en curso
+    job = claim_job(db, JOB_PREPROCESSING, usuario_id=current_user.id)
 
     # Actualizamos estado a 'running'
     PROCESS_STATE["status"] = "running"
+    PROCESS_STATE["stats"] = {}
     logger.info("Solicitando preprocesamiento en segundo plano.")
 
     # Inicia la tarea real en background
-    background_tasks.add_task(real_preprocessing_task)
+    background_tasks.add_task(real_preprocessing_task, job.id, rebuild)
 
-    return {"message": "El preprocesamiento ha sido activado en segundo plano."}
+    return {"message": "El preprocesamiento ha sido activado en segundo plano.", "job_id": job.id}
 
 
 @router.get("/status")
-def get_preprocessing_status():
+def get_preprocessing_status(db: Session = Depends(get_db)):
     """
     Retorna el estado actual del proceso de normalización: 
-    'idle', 'running', 'completed', o 'failed'
+    'idle', 'running', 'completed', o 'failed',
+    junto con el progreso y el rendimiento (archivos/s, tiempo por archivo).
     """
-    return {"status": PROCESS_STATE["status"]}
+    state = job_status(db, JOB_PREPROCESSING)
+    return {**state, "stats": (state["job"] or {}).get("progreso", {})}
 
 
-def real_preprocessing_task():
+def real_preprocessing_task(job_id: int, rebuild: bool = False):
     """
     Ejecuta 'preprocess_all_files' real. 
     Si todo va bien, setea status='completed'.
     Si algo falla, setea status='failed'.
+    El progreso se publica en el trabajo mientras se renueva su lease.
     """
+    stop_heartbeat = start_heartbeat(job_id, lambda: PROCESS_STATE["stats"])
+    error = None
     try:
-        preprocess_all_files(INPUT_DIR, OUTPUT_DIR, DATASET_DIR)
+        preprocess_all_files(
+            INPUT_DIR, OUTPUT_DIR, DATASET_DIR,
+            workers=settings.PREPROCESS_WORKERS,
+            chunk_size=settings.PREPROCESS_CHUNK_SIZE,
+            stats=PROCESS_STATE["stats"],
+            rebuild=rebuild,
+            dataset_format=settings.DATASET_FORMAT
+        )
         PROCESS_STATE["status"] = "completed"
         logger.info("Preprocesamiento completado.")
     except Exception as e:
         PROCESS_STATE["status"] = "failed"
+        error = str(e)
         logger.exception(f"Error en preprocesamiento: {str(e)}")
+    finally:
+        stop_heartbeat.set()
+        db = SessionLocal()
+        try:
+            finish_job(db, job_id, PROCESS_STATE["status"], progreso=PROCESS_STATE["stats"], error=error)
+        finally:
+            db.close()
@@ -1,16 +1,82 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+import numpy as np
+from operator import itemgetter
+from pydantic import BaseModel, Field, PlainValidator, WithJsonSchema
+from typing import Annotated, List, Optional
+from utils.preprocesamiento import LANDMARK_GROUPS, frames_to_array
 
 class Landmark(BaseModel):
     x: float = Field(..., example=0.123)
     y: float = Field(..., example=0.456)
     z: float = Field(..., example=0.789)
 
+_MAX_POINTS = dict(LANDMARK_GROUPS)
+_get_xyz = itemgetter("x", "y", "z")
+
+def parse_landmark_group(value) -> Optional[np.ndarray]:
+    """
+    Valida un grupo de puntos y lo convierte directamente a un array (n, 3) float32.
+    Acepta el formato plano [x0, y0, z0, x1, ...], pares [[x, y, z], ...] o el
+    formato anidado [{"x", "y", "z"}, ...] sin crear un modelo por punto.
+    """
+    if value is None:
+        return None
+    if isinstance(value, np.ndarray):
+        points = value.astype(np.float32, copy=False)
+    elif not isinstance(value, list):
+        raise ValueError("El grupo de puntos debe ser una lista.")
+    elif not value:
+        return np.empty((0, 3), dtype=np.float32)
+    elif isinstance(value[0], dict):
+        try:
+            points = np.array(list(map(_get_xyz, value)), dtype=np.float32)
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Punto inválido: se esperaban las claves x, y, z ({e}).")
+    else:
+        try:
+            points = np.asarray(value, dtype=np.float32)
+        except (TypeError, ValueError):
+            raise ValueError("El grupo de puntos debe contener solo números.")
+
+    if points.ndim == 1:
+        if points.size % 3:
+            raise ValueError("La lista plana debe tener una longitud múltiplo de 3 (x, y, z).")
+        points = points.reshape(-1, 3)
+    if points.ndim != 2 or points.shape[1] != 3:
+        raise ValueError(f"Forma de puntos inválida: {points.shape}.")
+    if not np.isfinite(points).all():
+        raise ValueError("Los puntos contienen valores no finitos.")
+    return points
+
+LandmarkGroup = Annotated[
+    np.ndarray,
+    PlainValidator(parse_landmark_group),
+    WithJsonSchema({
+        "anyOf": [
+            {"type": "array", "items": {"type": "number"}, "description": "Formato plano [x0, y0, z0, x1, ...]"},
+            {"type": "array", "items": Landmark.model_json_schema()},
+        ]
+    }),
+]
+
 class FrameData(BaseModel):
-    pose: Optional[List[Landmark]] = None
-    leftHand: Optional[List[Landmark]] = None
-    rightHand: Optional[List[Landmark]] = None
-    face: Optional[List[Landmark]] = None
+    pose: Optional[LandmarkGroup] = None
+    leftHand: Optional[LandmarkGroup] = None
+    rightHand: Optional[LandmarkGroup] = None
+    face: Optional[LandmarkGroup] = None
+
+    def model_post_init(self, __context):
+        for group in ("pose", "leftHand", "rightHand", "face"):
+            points = getattr(self, group)
+            if points is not None and len(points) > _MAX_POINTS[group]:
+                raise ValueError(
+                    f"El grupo '{group}' admite como máximo {_MAX_POINTS[group]} puntos, se recibieron {len(points)}."
+                )
+
+def frames_data_to_array(frames: List[FrameData]) -> np.ndarray:
+    """
+    Convierte los frames validados en un array (T, POINTS_PER_FRAME, 3) float32.
+    """
+    return frames_to_array([vars(frame) for frame in frames])
 
 class CaptureData(BaseModel):
     framesData: List[FrameData]
@@ -22,9 +88,9 @@ class CaptureRequest(BaseModel):
         example=[
             {
                 "pose": [{"x": 0.444, "y": 0.555, "z": 0.666}],
-                "leftHand": [{"x": 0.111, "y": 0.222, "z": 0.333}],
+                "leftHand": [0.111, 0.222, 0.333],
                 "rightHand": [{"x": 0.123, "y": 0.456, "z": 0.789}],
-                "face": [{"x": 0.987, "y": 0.654, "z": 0.321}]
+                "face": [0.987, 0.654, 0.321]
             }
         ]
     )
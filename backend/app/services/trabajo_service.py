@@ -0,0 +1,201 @@
+# backend/app/services/trabajo_service.py
+import os
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.db.coneccion import SessionLocal
+from app.models.trabajo_model import Trabajo
+
+logger = logging.getLogger(__name__)
+
+JOB_PREPROCESSING = "preprocesamiento"
+JOB_TRAINING = "entrenamiento"
+JOB_EVALUATION = "evaluacion"
+FINAL_STATES = ("completed", "failed", "cancelled")
+
+# Identificador de este worker de la API
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+def _lease_deadline() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+
+def expire_stale_jobs(db: Session, tipo: str) -> int:
+    """
+    Marca como fallidos los trabajos cuyo dueño dejó de renovar el lease,
+    liberando el bloqueo del tipo.
+    """
+    now = datetime.utcnow()
+    expired = db.query(Trabajo).filter(
+        Trabajo.tipo == tipo,
+        Trabajo.bloqueo.isnot(None),
+        Trabajo.lease_hasta < now
+    ).update({
+        "estado": "failed",
+        "error": "Lease vencido: el worker dueño dejó de responder.",
+        "hora_fin": now,
+        "bloqueo": None,
+    }, synchronize_session=False)
+    db.commit()
+    if expired:
+        logger.warning(f"{expired} trabajo(s) de {tipo} con lease vencido marcados como fallidos.")
+    return expired
+
+def claim_job(db: Session, tipo: str, usuario_id: Optional[int] = None,
+              meta_entrenamiento_id: Optional[int] = None) -> Trabajo:
+    """
+    Reclama de forma atómica el único trabajo activo del tipo para este worker.
+    Lanza HTTPException 400 si ya hay uno en curso en cualquier worker.
+    """
+    expire_stale_jobs(db, tipo)
+    now = datetime.utcnow()
+    job = Trabajo(
+        tipo=tipo,
+        estado="running",
+        usuario_id=usuario_id,
+        meta_entrenamiento_id=meta_entrenamiento_id,
+        propietario=WORKER_ID,
+        lease_hasta=_lease_deadline(),
+        bloqueo=tipo,
+        hora_inicio=now,
+        progreso={},
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        logger.warning(f"Intento de iniciar {tipo} con otro trabajo en curso.")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ya hay un trabajo de {tipo} en curso."
+        )
+    db.refresh(job)
+    logger.info(f"Trabajo {job.id} ({tipo}) reclamado por {WORKER_ID}.")
+    return job
+
+def renew_lease(db: Session, job_id: int, progreso: Optional[Dict] = None) -> Optional[Trabajo]:
+    """
+    Extiende el lease del trabajo (y guarda el progreso) solo si sigue activo y
+    pertenece a este worker. Retorna el trabajo actualizado o None si se perdió.
+    """
+    values = {"lease_hasta": _lease_deadline()}
+    if progreso is not None:
+        values["progreso"] = progreso
+    updated = db.query(Trabajo).filter(
+        Trabajo.id == job_id,
+        Trabajo.propietario == WORKER_ID,
+        Trabajo.bloqueo.isnot(None)
+    ).update(values, synchronize_session=False)
+    db.commit()
+    if not updated:
+        return None
+    return db.query(Trabajo).filter(Trabajo.id == job_id).first()
+
+def finish_job(db: Session, job_id: int, estado: str, progreso: Optional[Dict] = None,
+               resultado: Optional[Dict] = None, error: Optional[str] = None) -> bool:
+    """
+    Registra el estado final del trabajo y libera el bloqueo del tipo.
+    """
+    values = {"estado": estado, "hora_fin": datetime.utcnow(), "bloqueo": None,
+              "resultado": resultado, "error": error}
+    if progreso is not None:
+        values["progreso"] = progreso
+    updated = db.query(Trabajo).filter(
+        Trabajo.id == job_id,
+        Trabajo.propietario == WORKER_ID,
+        Trabajo.bloqueo.isnot(None)
+    ).update(values, synchronize_session=False)
+    db.commit()
+    if not updated:
+        logger.warning(f"El trabajo {job_id} ya no pertenece a {WORKER_ID}; no se registra '{estado}'.")
+        return False
+    logger.info(f"Trabajo {job_id} finalizado: {estado}.")
+    return True
+
+def request_cancel(db: Session, tipo: str) -> Trabajo:
+    """
+    Marca la cancelación del trabajo activo del tipo; el worker dueño la aplica
+    en su siguiente renovación del lease.
+    """
+    job = get_active_job(db, tipo)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"No hay un trabajo de {tipo} en curso."
+        )
+    job.cancelacion_solicitada = True
+    db.commit()
+    db.refresh(job)
+    logger.info(f"Cancelación solicitada para el trabajo {job.id} ({tipo}).")
+    return job
+
+def get_active_job(db: Session, tipo: str) -> Trabajo | None:
+    return db.query(Trabajo).filter(Trabajo.tipo == tipo, Trabajo.bloqueo.isnot(None)).first()
+
+def get_latest_job(db: Session, tipo: str) -> Trabajo | None:
+    return db.query(Trabajo).filter(Trabajo.tipo == tipo).order_by(Trabajo.id.desc()).first()
+
+def job_status(db: Session, tipo: str) -> Dict:
+    """
+    Estado del último trabajo del tipo, igual desde cualquier worker.
+    """
+    expire_stale_jobs(db, tipo)
+    job = get_latest_job(db, tipo)
+    if not job:
+        return {"status": "idle", "job": None}
+    return {
+        "status": job.estado,
+        "job": {
+            "id": job.id,
+            "usuario_id": job.usuario_id,
+            "meta_entrenamiento_id": job.meta_entrenamiento_id,
+            "propietario": job.propietario,
+            "cancelacion_solicitada": job.cancelacion_solicitada,
+            "hora_creacion": job.hora_creacion,
+            "hora_inicio": job.hora_inicio,
+            "hora_fin": job.hora_fin,
+            "progreso": job.progreso or {},
+            "resultado": job.resultado,
+            "error": job.error,
+        },
+    }
+
+# ------------------ LATIDO DEL WORKER DUEÑO ------------------
+
+def start_heartbeat(job_id: int, get_progress: Callable[[], Dict],
+                    on_cancel: Optional[Callable[[], None]] = None) -> threading.Event:
+    """
+    Renueva el lease del trabajo y publica `get_progress()` periódicamente en un
+    hilo propio. Si se solicitó la cancelación, llama a `on_cancel` una vez.
+    Retorna el Event que detiene el latido.
+    """
+    stop = threading.Event()
+    interval = max(settings.JOB_LEASE_SECONDS / 3, 1)
+
+    def _beat():
+        cancelled = False
+        while not stop.wait(interval):
+            db = SessionLocal()
+            try:
+                job = renew_lease(db, job_id, dict(get_progress()))
+                if job is None:
+                    logger.warning(f"Se perdió el lease del trabajo {job_id}.")
+                    return
+                if job.cancelacion_solicitada and on_cancel and not cancelled:
+                    cancelled = True
+                    on_cancel()
+            except Exception as e:
+                logger.error(f"Error al renovar el lease del trabajo {job_id}: {e}")
+            finally:
+                db.close()
+
+    threading.Thread(target=_beat, name=f"lease-trabajo-{job_id}", daemon=True).start()
+    return stop
@@ -0,0 +1,29 @@
+# backend/tests/test_control_admision.py
+import asyncio
+
+import pytest
+
+from utils import control_admision
+from utils.control_admision import AdmissionController, Overloaded
+
+
+def test_timeout_racing_a_release_does_not_lose_the_slot(monkeypatch):
+    controller = AdmissionController(max_inflight=1, max_queue=1, queue_timeout=1)
+
+    async def release_then_time_out(waiter, timeout):
+        # El lugar se entrega a la solicitud en espera justo cuando vence su tiempo
+        controller.release()
+        assert waiter.done()
+        raise asyncio.TimeoutError()
+
+    async def scenario():
+        await controller.acquire()
+        with monkeypatch.context() as patch:
+            patch.setattr(control_admision.asyncio, "wait_for", release_then_time_out)
+            with pytest.raises(Overloaded):
+                await controller.acquire()
+        assert controller.stats()["inflight"] == 0
+        await asyncio.wait_for(controller.acquire(), 0.1)
+        assert controller.stats()["inflight"] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,67 @@
+# backend/tests/test_early_exit.py
+import numpy as np
+import pytest
+
+from utils import evaluacion
+from utils.inferencia_incremental import IncrementalLSTM
+from utils.preprocesamiento import FEATURES_PER_FRAME, TARGET_LENGTH, pad_or_trim_array
+
+
+def make_lstm(seed=0, units=8, classes=3):
+    rng = np.random.default_rng(seed)
+    return IncrementalLSTM(
+        [(rng.normal(scale=0.05, size=(FEATURES_PER_FRAME, 4 * units)),
+          rng.normal(scale=0.3, size=(units, 4 * units)), np.zeros(4 * units))],
+        [(rng.normal(scale=2.0, size=(units, classes)), np.zeros(classes), "softmax")],
+    )
+
+
+class FullWindowEngine:
+    """
+    Motor que evalúa cada ventana completa desde cero, como el modelo Keras.
+    """
+    def __init__(self, lstm):
+        self.lstm = lstm
+
+    def collate(self, items):
+        return np.stack(items)
+
+    def run(self, batch):
+        return np.stack([self.lstm.run_sequence(sequence)[-1] for sequence in batch])
+
+
+class FakeServed:
+    version = "test"
+    inv_label_map = {0: "a", 1: "b", 2: "c"}
+
+    def __init__(self, lstm, incremental):
+        self.engine = FullWindowEngine(lstm)
+        self._incremental = lstm if incremental else None
+
+    def incremental(self):
+        return self._incremental
+
+
+def test_padded_prefixes_match_padded_windows():
+    lstm = make_lstm()
+    window = np.random.default_rng(1).normal(size=(TARGET_LENGTH, FEATURES_PER_FRAME)).astype(np.float32)
+    lengths = [10, 18, 25]
+    for n, probabilities in lstm.padded_prefixes(window, lengths, TARGET_LENGTH):
+        expected = lstm.run_sequence(pad_or_trim_array(window[:n], TARGET_LENGTH))[-1]
+        np.testing.assert_allclose(probabilities, expected, atol=1e-5)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_early_exit_paths_agree(seed, monkeypatch):
+    lstm = make_lstm(seed)
+    window = np.random.default_rng(100 + seed).normal(size=(TARGET_LENGTH, FEATURES_PER_FRAME)).astype(np.float32)
+    # Umbral entre las confianzas de los prefijos, para que la salida temprana dependa de ellas
+    confidences = [lstm.run_sequence(pad_or_trim_array(window[:n], TARGET_LENGTH))[-1].max() for n in (18, 23, 28)]
+    monkeypatch.setattr(evaluacion, "CONFIDENCE_THRESHOLD", float(np.median(confidences)))
+
+    incremental = evaluacion.predict_early_exit(window, TARGET_LENGTH, FakeServed(lstm, incremental=True))
+    batched = evaluacion.predict_early_exit(window, TARGET_LENGTH, FakeServed(lstm, incremental=False))
+
+    assert incremental["frames_used"] == batched["frames_used"] < TARGET_LENGTH
+    assert incremental["predicted_label"] == batched["predicted_label"]
+    assert incremental["confidence"] == pytest.approx(batched["confidence"], abs=1e-5)
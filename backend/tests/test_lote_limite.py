@@ -0,0 +1,46 @@
+# backend/tests/test_lote_limite.py
+import json
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.routers import evaluacion_router
+from utils import formato_binario
+from utils.formato_binario import TooManyRecords, decode_landmarks_batch, encode_landmarks_batch
+from utils.preprocesamiento import POINTS_PER_FRAME
+
+
+def _arrays(n):
+    return [np.zeros((2, POINTS_PER_FRAME, 3), dtype=np.float32) for _ in range(n)]
+
+
+def test_binary_batch_stops_at_limit(monkeypatch):
+    buffer = encode_landmarks_batch(_arrays(4))
+    decoded = []
+    original = formato_binario._decode_record
+
+    def counting(buf, start):
+        decoded.append(start)
+        return original(buf, start)
+
+    monkeypatch.setattr(formato_binario, "_decode_record", counting)
+    assert len(decode_landmarks_batch(buffer, 4)) == 4
+    decoded.clear()
+    with pytest.raises(TooManyRecords):
+        decode_landmarks_batch(buffer, 2)
+    assert len(decoded) == 2
+
+
+def test_json_batch_rejected_before_validation(monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_PREDICT_MAX_SEQUENCES", 1)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("no debería validar el lote")
+
+    monkeypatch.setattr(evaluacion_router.BatchPredictionRequest, "model_validate", fail)
+    body = json.dumps({"sequences": [{"framesData": []}, {"framesData": []}]}).encode()
+    with pytest.raises(HTTPException) as exc:
+        evaluacion_router.decode_batch_body("application/json", body)
+    assert exc.value.status_code == 413
@@ -0,0 +1,70 @@
+# backend/tests/test_manifiesto_pendiente.py
+import os
+
+import numpy as np
+import pytest
+
+from utils import procesamiento
+from utils.preprocesamiento import POINTS_PER_FRAME, TARGET_LENGTH
+
+
+class Crash(Exception):
+    pass
+
+
+def _fake_process_file(filename, input_dir, output_dir):
+    return {
+        "filename": filename,
+        "label": "HOLA",
+        "sequence": np.ones((TARGET_LENGTH, POINTS_PER_FRAME, 3), dtype=np.float32),
+        "diagnostics": procesamiento.new_diagnostics(),
+        "elapsed": 0.0,
+    }
+
+
+@pytest.mark.parametrize("dataset_format", ["npy", "shard"])
+def test_crash_before_commit_leaves_no_orphans(tmp_path, monkeypatch, dataset_format):
+    input_dir, output_dir, dataset_dir = (str(tmp_path / d) for d in ("in", "out", "dataset"))
+    os.makedirs(input_dir)
+    for name in ("a.json", "b.json"):
+        (tmp_path / "in" / name).write_text("{}")
+    monkeypatch.setattr(procesamiento, "process_file", _fake_process_file)
+
+    # Caída después de escribir las secuencias y antes del registro definitivo
+    append = procesamiento.append_manifest_entry
+
+    def crash_on_commit(manifest_path, entry):
+        if not entry.get("pending"):
+            raise Crash()
+        append(manifest_path, entry)
+
+    monkeypatch.setattr(procesamiento, "append_manifest_entry", crash_on_commit)
+    with pytest.raises(Crash):
+        procesamiento.preprocess_all_files(input_dir, output_dir, dataset_dir, dataset_format=dataset_format)
+    monkeypatch.setattr(procesamiento, "append_manifest_entry", append)
+
+    stats = procesamiento.preprocess_all_files(input_dir, output_dir, dataset_dir, dataset_format=dataset_format)
+    assert stats["total_files"] == 0
+
+    manifest = procesamiento.load_manifest(os.path.join(dataset_dir, procesamiento.MANIFEST_NAME))
+    assert sorted(manifest) == ["a.json", "b.json"]
+    assert not any(entry.get("pending") for entry in manifest.values())
+    if dataset_format == "npy":
+        stored = [f for f in os.listdir(os.path.join(dataset_dir, "HOLA")) if f.endswith(".npy")]
+        assert len(stored) == 2
+    else:
+        _, label_ids, _ = procesamiento.dataset_shards.open_shard(dataset_dir)
+        assert int((label_ids >= 0).sum()) == 2
+    assert all(procesamiento.sequence_exists(entry["path"]) for entry in manifest.values())
+
+
+def test_pending_entry_without_sequence_restores_previous(tmp_path):
+    previous_path = tmp_path / "seq_001.npy"
+    np.save(previous_path, np.zeros(3, dtype=np.float32))
+    previous = {"file": "a.json", "path": str(previous_path), "label": "HOLA"}
+    manifest = {"a.json": {**previous, "path": str(tmp_path / "seq_002.npy"),
+                           "pending": True, "previous": previous}}
+
+    assert procesamiento.recover_pending_entries(manifest) == 1
+    assert manifest["a.json"] == previous
+    assert previous_path.exists()
@@ -0,0 +1,63 @@
+# backend/tests/test_tflite_engine.py
+import queue
+import types
+
+import numpy as np
+import pytest
+
+from utils import evaluacion
+
+
+class FakeInterpreter:
+    """
+    Intérprete con la entrada fija en lote 1, como el LSTM fusionado exportado.
+    """
+    def __init__(self, model_path, num_threads=None):
+        self.input = None
+
+    def allocate_tensors(self):
+        pass
+
+    def get_input_details(self):
+        return [{"index": 0, "shape": np.array([1, 4, 3])}]
+
+    def get_output_details(self):
+        return [{"index": 1, "shape": np.array([1, 2])}]
+
+    def resize_tensor_input(self, index, shape):
+        raise AssertionError("el lote del LSTM fusionado no se puede redimensionar")
+
+    def set_tensor(self, index, value):
+        assert value.shape == (1, 4, 3)
+        self.input = value.copy()
+
+    def invoke(self):
+        pass
+
+    def get_tensor(self, index):
+        total = self.input.sum()
+        return np.array([[total, -total]], dtype=np.float32)
+
+
+def test_tflite_engine_runs_batches_one_sequence_at_a_time(tmp_path, monkeypatch):
+    model_path = tmp_path / "gesture_model.tflite"
+    model_path.write_bytes(b"")
+    monkeypatch.setattr(evaluacion, "_tensorflow", lambda: types.SimpleNamespace(
+        lite=types.SimpleNamespace(Interpreter=FakeInterpreter)))
+
+    engine = evaluacion.TFLiteEngine(str(model_path), max_batch_size=8)
+    batch = np.random.default_rng(0).normal(size=(5, 4, 3)).astype(np.float32)
+    probabilities = engine.run(engine.collate(list(batch)))
+
+    expected = np.stack([engine.run(sequence[None])[0] for sequence in batch])
+    assert probabilities.shape == (5, 2)
+    np.testing.assert_allclose(probabilities, expected)
+    np.testing.assert_allclose(probabilities[:, 0], batch.sum(axis=(1, 2)), rtol=1e-5)
+    engine.warmup(runs=1)
+
+
+def test_compare_backends_does_not_wait_for_a_dead_child():
+    exportacion = pytest.importorskip("utils.exportacion_tflite")
+    dead = types.SimpleNamespace(is_alive=lambda: False, exitcode=-11)
+    result = exportacion._wait_result(dead, queue.Queue(), "tflite", timeout=5)
+    assert "-11" in result["error"]
@@ -0,0 +1,96 @@
+# backend/utils/benchmark_arranque.py
+"""
+Benchmark del costo de importación de la API.
+
+Importa la aplicación en procesos nuevos con `python -X importtime` y reporta
+el tiempo de importación (mediana de varias corridas), la memoria residente, los
+paquetes más costosos y si se cargó la pila de ML (TensorFlow, scikit-learn),
+que solo debe cargarse en el primer uso o con el precalentamiento.
+
+Uso (en backend/):
+    python -m utils.benchmark_arranque [--module app.main] [--runs 5] [--top 15] [--strict]
+
+Con --strict termina con código 1 si la importación cargó la pila de ML.
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Dict
+
+HEAVY_MODULES = ("tensorflow", "keras", "sklearn")
+
+# Se ejecuta en el proceso hijo: mide la importación y la memoria residente pico
+_PROBE = """
+import json, os, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss / 1024 if sys.platform != "darwin" else rss / 2 ** 20,
+                  "heavy_modules": heavy}}))
+"""
+
+def _parse_importtime(stderr: str) -> Dict[str, float]:
+    """
+    Tiempo acumulado (ms) por paquete raíz a partir de las líneas
+    "import time: self [us] | cumulative | módulo" de -X importtime.
+    """
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # El acumulado del módulo más externo de cada paquete incluye a sus submódulos
+        root = name.strip().split(".")[0]
+        packages[root] = max(packages.get(root, 0.0), int(cumulative_us) / 1000)
+    return packages
+
+def measure_import(module: str = "app.main") -> Dict:
+    """
+    Importa `module` en un proceso nuevo y retorna sus tiempos y memoria.
+    """
+    probe = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", probe],
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        errors = [line for line in completed.stderr.splitlines() if line.strip() and not line.startswith("import time:")]
+        raise RuntimeError(f"No se pudo importar {module}: {errors[-1] if errors else completed.returncode}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["packages"] = _parse_importtime(completed.stderr)
+    return result
+
+def benchmark(module: str = "app.main", runs: int = 5, top: int = 15) -> Dict:
+    """
+    Mediana y máximo del tiempo de importación en `runs` procesos nuevos, y los
+    `top` paquetes con mayor tiempo acumulado (última corrida).
+    """
+    results = [measure_import(module) for _ in range(max(runs, 1))]
+    seconds = [r["seconds"] for r in results]
+    last = results[-1]
+    return {
+        "module": module,
+        "runs": len(results),
+        "import_seconds_median": round(statistics.median(seconds), 3),
+        "import_seconds_max": round(max(seconds), 3),
+        "rss_mb": round(last["rss_mb"], 1),
+        "heavy_modules": last["heavy_modules"],
+        "slowest_packages_ms": dict(sorted(last["packages"].items(), key=lambda item: item[1], reverse=True)[:top]),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Costo de importación de la API.")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--strict", action="store_true", help="falla si se cargó la pila de ML")
+    args = parser.parse_args()
+
+    report = benchmark(args.module, args.runs, args.top)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.strict and report["heavy_modules"]:
+        print(f"La importación cargó la pila de ML: {', '.join(report['heavy_modules'])}", file=sys.stderr)
+        sys.exit(1)
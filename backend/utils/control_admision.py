@@ -0,0 +1,233 @@
+# backend/utils/control_admision.py
+"""
+Control de admisión de las rutas de predicción.
+
+Antes de leer el cuerpo de la solicitud se aplican dos límites, por worker de
+la API:
+  - RateLimiter: token bucket por identidad (usuario del JWT o IP), con
+    RATE_LIMIT_PER_SECOND solicitudes por segundo y ráfagas de RATE_LIMIT_BURST.
+    Al excederlo se responde 429.
+  - AdmissionController: a lo sumo ADMISSION_MAX_INFLIGHT solicitudes en curso
+    y ADMISSION_MAX_QUEUE esperando un lugar, cada una durante a lo sumo
+    ADMISSION_QUEUE_TIMEOUT_SECONDS. Con la cola llena o el tiempo vencido se
+    responde 503 de inmediato, en lugar de acumular trabajo hasta que los
+    clientes abandonen. También limita las sesiones de reconocimiento continuo
+    abiertas (STREAM_MAX_SESSIONS); las que exceden el límite se cierran con 1013.
+Ambos indican en Retry-After cuándo conviene reintentar. La profundidad de la
+cola y las solicitudes descartadas se exponen en GET /metrics.
+"""
+import math
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from app.core.config import settings
+
+class RateLimited(Exception):
+    """La identidad superó su límite de solicitudes."""
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class Overloaded(Exception):
+    """No hay lugar para la solicitud: cola llena o espera vencida."""
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def retry_after_header(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+# ------------------ LÍMITE POR USUARIO ------------------
+
+class RateLimiter:
+    """
+    Un token bucket por identidad: se recargan `rate` tokens por segundo hasta
+    `burst`. Se conservan los `max_keys` buckets usados más recientemente; uno
+    descartado equivale a un bucket lleno.
+    """
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000):
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self.max_keys = max(int(max_keys), 1)
+        self._buckets = OrderedDict()   # identidad -> (tokens, última actualización)
+        self._lock = threading.Lock()
+        self._rejected = 0
+
+    def acquire(self, key: str, cost: float = 1.0):
+        """
+        Consume `cost` tokens de `key`. Lanza RateLimited con los segundos que
+        faltan para tenerlos si no alcanzan.
+        """
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            else:
+                self._rejected += 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        if not allowed:
+            raise RateLimited("Límite de solicitudes excedido.", (cost - tokens) / self.rate)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+                "tracked_identities": len(self._buckets),
+                "rate_limited": self._rejected,
+            }
+
+# ------------------ SOLICITUDES EN CURSO Y COLA ------------------
+
+class AdmissionController:
+    """
+    Semáforo con cola acotada para el event loop de la API. Un lugar liberado
+    pasa directamente a la solicitud que más tiempo lleva esperando.
+    """
+    def __init__(self, max_inflight: int, max_queue: int, queue_timeout: float, max_sessions: int = 0):
+        self.max_inflight = max(int(max_inflight), 1)
+        self.max_queue = max(int(max_queue), 0)
+        self.queue_timeout = max(float(queue_timeout), 0.0)
+        self.max_sessions = max(int(max_sessions), 0)
+        self._inflight = 0
+        self._sessions = 0
+        self._waiters = deque()
+        self._service_seconds = 0.0   # promedio móvil del tiempo de cada solicitud
+        self._stats = {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_timeout": 0,
+                       "max_queue_depth": 0, "sessions_refused": 0}
+
+    def retry_after(self) -> float:
+        """
+        Tiempo estimado para vaciar la cola actual con los lugares disponibles.
+        """
+        return (len(self._waiters) + 1) * self._service_seconds / self.max_inflight
+
+    async def acquire(self):
+        if self._inflight < self.max_inflight and not self._waiters:
+            self._inflight += 1
+            self._stats["admitted"] += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._stats["shed_queue_full"] += 1
+            raise Overloaded("Servicio de evaluación saturado; reintente más tarde.", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._stats["queued"] += 1
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._waiters))
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._stats["shed_timeout"] += 1
+            # El lugar pudo llegar justo antes de vencer la espera: se devuelve para no perderlo
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise Overloaded("Tiempo de espera agotado en la cola de evaluación.", self.retry_after())
+        except BaseException:
+            # Cancelada (p. ej. el cliente se desconectó) justo después de recibir el lugar
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self._stats["admitted"] += 1
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)   # el lugar pasa a la siguiente solicitud
+                return
+        self._inflight -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Reserva un lugar durante el bloque. Lanza Overloaded si no se obtiene a tiempo.
+        """
+        await self.acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._service_seconds = elapsed if not self._service_seconds else 0.9 * self._service_seconds + 0.1 * elapsed
+            self.release()
+
+    def open_session(self) -> bool:
+        """
+        Reserva una sesión de reconocimiento continuo; False si ya hay max_sessions abiertas.
+        """
+        if self._sessions >= self.max_sessions:
+            self._stats["sessions_refused"] += 1
+            return False
+        self._sessions += 1
+        return True
+
+    def close_session(self):
+        self._sessions -= 1
+
+    def stats(self) -> Dict:
+        return {
+            **self._stats,
+            "open_sessions": self._sessions,
+            "max_sessions": self.max_sessions,
+            "inflight": self._inflight,
+            "queue_depth": len(self._waiters),
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            "queue_timeout_seconds": self.queue_timeout,
+            "avg_service_ms": round(self._service_seconds * 1000, 2),
+        }
+
+_admission = None
+_rate_limiter = None
+_lock = threading.Lock()
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Controlador compartido (ADMISSION_MAX_INFLIGHT, ADMISSION_MAX_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT_SECONDS, STREAM_MAX_SESSIONS).
+    """
+    global _admission
+    if _admission is None:
+        with _lock:
+            if _admission is None:
+                _admission = AdmissionController(
+                    settings.ADMISSION_MAX_INFLIGHT,
+                    settings.ADMISSION_MAX_QUEUE,
+                    settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+                    settings.STREAM_MAX_SESSIONS,
+                )
+    return _admission
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Límite por identidad compartido (RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST).
+    """
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter(settings.RATE_LIMIT_PER_SECOND, settings.RATE_LIMIT_BURST)
+    return _rate_limiter
+
+def get_admission_metrics() -> Dict:
+    metrics = {}
+    if _admission is not None:
+        metrics.update(_admission.stats())
+    if _rate_limiter is not None:
+        metrics.update(_rate_limiter.stats())
+    return metrics
@@ -0,0 +1,307 @@
+# backend/utils/dataset_shards.py
+"""
+Formato empaquetado del dataset.
+
+En lugar de un archivo seq_NNN.npy por secuencia, todas las secuencias se
+guardan en un único bloque contiguo float32 (dataset.f32) junto con:
+  - dataset_labels.i32: id de etiqueta por registro (-1 = registro eliminado).
+  - dataset_index.json: forma de cada registro, dtype y lista de etiquetas.
+
+El registro i ocupa los bytes [i * record_bytes, (i + 1) * record_bytes) del
+bloque, por lo que el dataset se abre con np.memmap sin leer archivo por archivo
+ni copiarlo completo en memoria. Los archivos viven en la raíz de dataset/ y no
+interfieren con las carpetas por palabra.
+"""
+import os
+import json
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SHARD_DATA = "dataset.f32"
+SHARD_LABELS = "dataset_labels.i32"
+SHARD_INDEX = "dataset_index.json"
+DELETED = -1
+
+_DTYPE = np.dtype("<f4")
+_LABEL_DTYPE = np.dtype("<i4")
+
+# ------------------ ÍNDICE ------------------
+
+def shard_exists(dataset_dir: str) -> bool:
+    return os.path.exists(os.path.join(dataset_dir, SHARD_INDEX))
+
+def read_index(dataset_dir: str) -> Dict:
+    with open(os.path.join(dataset_dir, SHARD_INDEX), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_index(dataset_dir: str, index: Dict):
+    index_path = os.path.join(dataset_dir, SHARD_INDEX)
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, index_path)
+
+def _record_bytes(index: Dict) -> int:
+    return int(np.prod(index["shape"])) * _DTYPE.itemsize
+
+def record_count(dataset_dir: str, index: Optional[Dict] = None) -> int:
+    """
+    Cantidad de registros completos. Un registro cuenta solo si su bloque de datos
+    y su etiqueta están escritos, así que una escritura interrumpida no se ve.
+    """
+    index = index or read_index(dataset_dir)
+    data_path = os.path.join(dataset_dir, SHARD_DATA)
+    labels_path = os.path.join(dataset_dir, SHARD_LABELS)
+    if not os.path.exists(data_path) or not os.path.exists(labels_path):
+        return 0
+    return min(
+        os.path.getsize(data_path) // _record_bytes(index),
+        os.path.getsize(labels_path) // _LABEL_DTYPE.itemsize,
+    )
+
+# ------------------ LOCALIZADORES ------------------
+
+def record_locator(dataset_dir: str, record: int) -> str:
+    """
+    Ruta con la que se referencia un registro del bloque (p. ej. en el manifiesto).
+    """
+    return f"{os.path.join(dataset_dir, SHARD_DATA)}#{record}"
+
+def is_record_locator(path: str) -> bool:
+    return path.rpartition("#")[0].endswith(SHARD_DATA)
+
+def _parse_locator(locator: str) -> Tuple[str, int]:
+    data_path, _, record = locator.rpartition("#")
+    return os.path.dirname(data_path), int(record)
+
+# ------------------ ESCRITURA ------------------
+
+def append_sequences(dataset_dir: str, sequences: np.ndarray, word: str,
+                     before_write: Optional[Callable[[List[str]], None]] = None) -> List[str]:
+    """
+    Agrega un lote de secuencias (n, T, F) de una misma palabra al final del bloque.
+    Retorna los localizadores de los registros creados; `before_write` los recibe
+    antes de escribir los datos.
+    """
+    sequences = np.ascontiguousarray(sequences, dtype=_DTYPE)
+    os.makedirs(dataset_dir, exist_ok=True)
+
+    if shard_exists(dataset_dir):
+        index = read_index(dataset_dir)
+        if list(sequences.shape[1:]) != index["shape"]:
+            raise ValueError(
+                f"Forma de secuencia {sequences.shape[1:]} incompatible con el dataset {index['shape']}."
+            )
+    else:
+        index = {"dtype": "float32", "shape": list(sequences.shape[1:]), "labels": []}
+        _write_index(dataset_dir, index)
+
+    if word not in index["labels"]:
+        index["labels"].append(word)
+        _write_index(dataset_dir, index)
+    label_id = index["labels"].index(word)
+
+    data_path = os.path.join(dataset_dir, SHARD_DATA)
+    labels_path = os.path.join(dataset_dir, SHARD_LABELS)
+    count = record_count(dataset_dir, index)
+    locators = [record_locator(dataset_dir, count + i) for i in range(len(sequences))]
+    if before_write is not None:
+        before_write(locators)
+
+    # Descartar restos de una escritura interrumpida antes de agregar
+    for path, size in ((data_path, count * _record_bytes(index)), (labels_path, count * _LABEL_DTYPE.itemsize)):
+        with open(path, "ab") as f:
+            f.truncate(size)
+
+    with open(data_path, "ab") as f:
+        f.write(sequences.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    # La etiqueta se escribe al final: es la que confirma el registro
+    with open(labels_path, "ab") as f:
+        f.write(np.full(len(sequences), label_id, dtype=_LABEL_DTYPE).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+    return locators
+
+def overwrite_record(locator: str, sequence: np.ndarray):
+    """
+    Reemplaza en su lugar los datos de un registro existente.
+    """
+    dataset_dir, record = _parse_locator(locator)
+    index = read_index(dataset_dir)
+    sequence = np.ascontiguousarray(sequence, dtype=_DTYPE)
+    if list(sequence.shape) != index["shape"]:
+        raise ValueError(f"Forma de secuencia {sequence.shape} incompatible con el dataset {index['shape']}.")
+    with open(os.path.join(dataset_dir, SHARD_DATA), "r+b") as f:
+        f.seek(record * _record_bytes(index))
+        f.write(sequence.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+def delete_record(locator: str):
+    """
+    Marca un registro como eliminado; el espacio se recupera con compact_shard.
+    """
+    dataset_dir, record = _parse_locator(locator)
+    with open(os.path.join(dataset_dir, SHARD_LABELS), "r+b") as f:
+        f.seek(record * _LABEL_DTYPE.itemsize)
+        f.write(np.array([DELETED], dtype=_LABEL_DTYPE).tobytes())
+
+def delete_records(locators: List[str]) -> List[str]:
+    """
+    Marca varios registros como eliminados, abriendo una sola vez las etiquetas de cada bloque.
+    Retorna los directorios de los bloques modificados.
+    """
+    by_dir = {}
+    for locator in locators:
+        dataset_dir, record = _parse_locator(locator)
+        by_dir.setdefault(dataset_dir, []).append(record)
+    modified = []
+    for dataset_dir, records in by_dir.items():
+        if not shard_exists(dataset_dir):
+            continue
+        count = record_count(dataset_dir)
+        with open(os.path.join(dataset_dir, SHARD_LABELS), "r+b") as f:
+            for record in sorted(r for r in records if r < count):
+                f.seek(record * _LABEL_DTYPE.itemsize)
+                f.write(np.array([DELETED], dtype=_LABEL_DTYPE).tobytes())
+        modified.append(dataset_dir)
+    return modified
+
+def record_exists(locator: str, label_ids: Optional[np.ndarray] = None) -> bool:
+    """
+    Indica si el registro está escrito y no fue eliminado. `label_ids` son las
+    etiquetas del mismo bloque ya abiertas con open_shard; sin ellas, o para los
+    registros agregados después de abrirlas, se lee solo la etiqueta del registro.
+    """
+    dataset_dir, record = _parse_locator(locator)
+    if label_ids is not None and record < len(label_ids):
+        return bool(label_ids[record] != DELETED)
+    if not shard_exists(dataset_dir) or record >= record_count(dataset_dir):
+        return False
+    with open(os.path.join(dataset_dir, SHARD_LABELS), "rb") as f:
+        f.seek(record * _LABEL_DTYPE.itemsize)
+        label = np.frombuffer(f.read(_LABEL_DTYPE.itemsize), dtype=_LABEL_DTYPE)[0]
+    return bool(label != DELETED)
+
+# ------------------ LECTURA ------------------
+
+def open_shard(dataset_dir: str, mmap_mode: str = "r") -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Abre el bloque con memoria mapeada.
+    Retorna (datos (n, T, F), ids de etiqueta (n,), nombres de etiqueta).
+    """
+    index = read_index(dataset_dir)
+    count = record_count(dataset_dir, index)
+    if count == 0:
+        return np.empty((0, *index["shape"]), dtype=_DTYPE), np.empty(0, dtype=_LABEL_DTYPE), index["labels"]
+    data = np.memmap(os.path.join(dataset_dir, SHARD_DATA), dtype=_DTYPE, mode=mmap_mode,
+                     shape=(count, *index["shape"]))
+    label_ids = np.memmap(os.path.join(dataset_dir, SHARD_LABELS), dtype=_LABEL_DTYPE, mode=mmap_mode,
+                          shape=(count,))
+    return data, label_ids, index["labels"]
+
+def shard_labels(dataset_dir: str) -> List[str]:
+    """
+    Etiquetas con al menos un registro vigente en el bloque.
+    """
+    if not shard_exists(dataset_dir):
+        return []
+    _, label_ids, labels = open_shard(dataset_dir)
+    present = np.unique(np.asarray(label_ids))
+    return [labels[i] for i in present if i != DELETED]
+
+# ------------------ MANTENIMIENTO ------------------
+
+def compact_shard(dataset_dir: str) -> Dict[int, int]:
+    """
+    Reescribe el bloque sin los registros eliminados.
+    Retorna el mapeo {registro anterior: registro nuevo}.
+    """
+    data, label_ids, labels = open_shard(dataset_dir)
+    keep = np.flatnonzero(np.asarray(label_ids) != DELETED)
+    data_path = os.path.join(dataset_dir, SHARD_DATA)
+    labels_path = os.path.join(dataset_dir, SHARD_LABELS)
+
+    with open(f"{data_path}.tmp", "wb") as f:
+        for start in range(0, len(keep), 256):
+            f.write(np.ascontiguousarray(data[keep[start:start + 256]]).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    with open(f"{labels_path}.tmp", "wb") as f:
+        f.write(np.asarray(label_ids)[keep].astype(_LABEL_DTYPE).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    del data, label_ids
+
+    # Las etiquetas se reemplazan primero por un archivo vacío para que un corte no
+    # mezcle ambos archivos. Todo se publica con os.replace (archivos nuevos): los
+    # procesos que tienen el bloque abierto con open_shard siguen leyendo el anterior
+    open(f"{labels_path}.empty", "wb").close()
+    os.replace(f"{labels_path}.empty", labels_path)
+    os.replace(f"{data_path}.tmp", data_path)
+    os.replace(f"{labels_path}.tmp", labels_path)
+    logger.info(f"Bloque compactado: {len(keep)} registros vigentes.")
+    return {int(old): new for new, old in enumerate(keep)}
+
+def convert_npy_dataset(dataset_dir: str = "dataset", remove_files: bool = True,
+                        batch_size: int = 256) -> Dict[str, str]:
+    """
+    Empaqueta los archivos seq_NNN.npy existentes de cada carpeta de palabra en el bloque.
+    Retorna {ruta .npy original: localizador nuevo}. Con remove_files=True los .npy
+    se eliminan una vez escritos en el bloque.
+    """
+    moved = {}
+    words = sorted(d for d in os.listdir(dataset_dir) if os.path.isdir(os.path.join(dataset_dir, d)))
+    for word in words:
+        word_dir = os.path.join(dataset_dir, word)
+        paths = sorted(
+            os.path.join(word_dir, f) for f in os.listdir(word_dir) if f.endswith(".npy")
+        )
+        for start in range(0, len(paths), batch_size):
+            batch_paths = paths[start:start + batch_size]
+            batch = np.stack([np.load(p) for p in batch_paths])
+            locators = append_sequences(dataset_dir, batch, word)
+            moved.update(zip(batch_paths, locators))
+            if remove_files:
+                for path in batch_paths:
+                    os.remove(path)
+        logger.info(f"Palabra '{word}': {len(paths)} secuencias empaquetadas.")
+    return moved
+
+
+if __name__ == "__main__":
+    import sys
+    from utils.procesamiento import MANIFEST_NAME, load_manifest, recover_pending_entries, write_manifest
+
+    target_dir = sys.argv[1] if len(sys.argv) > 1 else "dataset"
+    manifest_path = os.path.join(target_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path) if os.path.exists(manifest_path) else None
+    if manifest is not None:
+        # Los registros pendientes se resuelven antes de que cambien las rutas
+        recover_pending_entries(manifest)
+    moved = convert_npy_dataset(target_dir)
+    renumbered = compact_shard(target_dir) if shard_exists(target_dir) else {}
+
+    # Actualizar el manifiesto de capturas para que apunte a los registros vigentes
+    if manifest is not None:
+        for entry in manifest.values():
+            if not entry.get("path"):
+                continue
+            path = moved.get(entry["path"], entry["path"])
+            if is_record_locator(path):
+                record_dir, record = _parse_locator(path)
+                if record in renumbered:
+                    path = record_locator(record_dir, renumbered[record])
+            entry["path"] = path
+        write_manifest(manifest_path, manifest)
+
+    print(f"{len(moved)} secuencias empaquetadas en {os.path.join(target_dir, SHARD_DATA)}")
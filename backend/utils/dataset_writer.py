@@ -0,0 +1,126 @@
+# backend/utils/dataset_writer.py
+"""
+Escritura segura de secuencias en el dataset.
+
+- Los ids seq_NNN se asignan con un contador persistente por palabra
+  (dataset/<palabra>/.seq_counter) protegido por un bloqueo de archivo, así que
+  la asignación es O(1) y varios procesos no reutilizan ids.
+- Cada archivo se escribe en un temporal y se publica con os.replace, por lo que
+  una escritura interrumpida nunca deja un .npy a medias.
+- Las secuencias se pueden guardar por lotes en una sola llamada; las rutas
+  reservadas se conocen antes de escribir los datos (ver save_sequences).
+"""
+import os
+import re
+import logging
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from utils import dataset_shards
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+COUNTER_NAME = ".seq_counter"
+LOCK_NAME = ".seq.lock"
+SHARD_LOCK_NAME = ".shard.lock"
+_SEQ_PATTERN = re.compile(r"^seq_(\d+)\.npy$")
+
+# ------------------ BLOQUEO ------------------
+
+@contextmanager
+def file_lock(lock_path: str):
+    """
+    Bloqueo exclusivo entre procesos basado en un archivo.
+    """
+    with open(lock_path, "a+b") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+# ------------------ ASIGNACIÓN DE IDS ------------------
+
+def _write_atomic(path: str, content: bytes):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _max_existing_id(word_dir: str) -> int:
+    """
+    Mayor id seq_NNN presente en la carpeta. Solo se usa para inicializar el
+    contador de carpetas creadas antes de que existiera.
+    """
+    ids = [int(m.group(1)) for m in map(_SEQ_PATTERN.match, os.listdir(word_dir)) if m]
+    return max(ids, default=0)
+
+def reserve_sequence_ids(word_dir: str, count: int) -> List[int]:
+    """
+    Reserva `count` ids consecutivos para la palabra y persiste el contador.
+    """
+    os.makedirs(word_dir, exist_ok=True)
+    counter_path = os.path.join(word_dir, COUNTER_NAME)
+    with file_lock(os.path.join(word_dir, LOCK_NAME)):
+        if os.path.exists(counter_path):
+            with open(counter_path, "r") as f:
+                next_id = int(f.read().strip())
+        else:
+            next_id = _max_existing_id(word_dir) + 1
+        _write_atomic(counter_path, str(next_id + count).encode())
+    return list(range(next_id, next_id + count))
+
+# ------------------ ESCRITURA ------------------
+
+def _save_npy_atomic(file_path: str, sequence: np.ndarray):
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, sequence)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+def save_sequences(sequences: np.ndarray, word: str, dataset_dir: str = "dataset",
+                   dataset_format: str = "npy",
+                   before_write: Optional[Callable[[List[str]], None]] = None) -> List[str]:
+    """
+    Guarda un lote de secuencias (n, T, F) de una palabra.
+    Retorna la ruta (o localizador del bloque) de cada secuencia, en el mismo orden.
+    `before_write` recibe esas rutas una vez reservadas y antes de escribir los datos,
+    p. ej. para registrarlas en el manifiesto.
+    """
+    sequences = np.asarray(sequences, dtype=np.float32)
+    if len(sequences) == 0:
+        return []
+
+    if dataset_format == "shard":
+        os.makedirs(dataset_dir, exist_ok=True)
+        with file_lock(os.path.join(dataset_dir, SHARD_LOCK_NAME)):
+            return dataset_shards.append_sequences(dataset_dir, sequences, word, before_write)
+
+    word_dir = os.path.join(dataset_dir, word)
+    paths = [os.path.join(word_dir, f"seq_{seq_id:03d}.npy")
+             for seq_id in reserve_sequence_ids(word_dir, len(sequences))]
+    if before_write is not None:
+        before_write(paths)
+    for file_path, sequence in zip(paths, sequences):
+        _save_npy_atomic(file_path, sequence)
+    return paths
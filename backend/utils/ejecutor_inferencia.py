@@ -0,0 +1,97 @@
+# backend/utils/ejecutor_inferencia.py
+"""
+Ejecutor acotado para el trabajo bloqueante de la inferencia (decodificación,
+validación, preprocesamiento y espera del micro-lote).
+
+Las rutas async lo usan con `await executor.run(fn, ...)`, así el event loop
+queda libre para el resto de endpoints. Se limita la cantidad de solicitudes
+admitidas (en ejecución + en espera) y el tiempo de espera de cada una.
+
+El módulo no importa TensorFlow: las rutas pueden usar el ejecutor sin cargar
+la pila de ML, que se importa dentro de las funciones que se le envían.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class ExecutorBusy(Exception):
+    """El ejecutor alcanzó su límite de solicitudes admitidas."""
+
+class BoundedExecutor:
+    def __init__(self, max_workers: int, max_pending: int, timeout: Optional[float] = None,
+                 name: str = "inferencia"):
+        self.max_workers = max(int(max_workers), 1)
+        self.max_pending = max(int(max_pending), 0)
+        self.timeout = timeout or None
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._stats = {"completed": 0, "failed": 0, "rejected": 0, "timeouts": 0}
+
+    def _release(self, future):
+        with self._lock:
+            self._admitted -= 1
+            if future.cancelled():
+                return
+            self._stats["failed" if future.exception() else "completed"] += 1
+
+    async def run(self, fn: Callable, *args):
+        """
+        Ejecuta fn(*args) en el pool. Lanza ExecutorBusy si ya hay
+        max_workers + max_pending solicitudes admitidas y asyncio.TimeoutError
+        si no termina dentro de `timeout` segundos.
+        """
+        with self._lock:
+            if self._admitted >= self.max_workers + self.max_pending:
+                self._stats["rejected"] += 1
+                raise ExecutorBusy("Demasiadas solicitudes de inferencia en curso.")
+            self._admitted += 1
+
+        future = self._pool.submit(fn, *args)
+        # El cupo se libera cuando el hilo termina, no cuando vence el timeout
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            logger.warning(f"Inferencia sin respuesta tras {self.timeout}s.")
+            raise
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "admitted": self._admitted,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "timeout_seconds": self.timeout,
+            }
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor() -> BoundedExecutor:
+    """
+    Ejecutor compartido por las rutas de inferencia
+    (INFERENCE_WORKERS, INFERENCE_MAX_PENDING, INFERENCE_TIMEOUT_SECONDS).
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = BoundedExecutor(
+                    settings.INFERENCE_WORKERS,
+                    settings.INFERENCE_MAX_PENDING,
+                    settings.INFERENCE_TIMEOUT_SECONDS,
+                )
+    return _executor
+
+def get_executor_metrics() -> Dict:
+    return _executor.stats() if _executor is not None else {}
@@ -8,6 +8,10 @@ from app.db.coneccion import SessionLocal
 from datetime import datetime
 from app.models.meta_entrenamiento_model import MetadatosEntrenamiento
 import logging
+from utils import dataset_shards
+from utils.exportacion_tflite import export_tflite
+from utils.registro_modelos import TFLITE_FILE, publish_bundle
+from app.core.config import settings
 
 # Configuración de logging
 logging.basicConfig(
@@ -24,46 +28,169 @@ logger = logging.getLogger(__name__)
 
 # ------------------ FUNCIONES DE PREPARACIÓN DE DATOS ------------------
 
+def _discover_dataset(dataset_dir: str):
+    """
+    Recorre el dataset sin leer secuencias.
+    Retorna ({palabra: [rutas .npy]}, bloque abierto o None, label_map).
+    """
+    file_paths = {}  # palabra -> rutas .npy sueltas
+    for word_dir in os.listdir(dataset_dir):
+        word_path = os.path.join(dataset_dir, word_dir)
+        if os.path.isdir(word_path):
+            file_paths[word_dir] = sorted(
+                os.path.join(word_path, f) for f in os.listdir(word_path) if f.endswith(".npy")
+            )
+
+    shard = None
+    words = set(file_paths)
+    if dataset_shards.shard_exists(dataset_dir):
+        shard = dataset_shards.open_shard(dataset_dir)
+        words.update(dataset_shards.shard_labels(dataset_dir))
+
+    # Mismo orden que create_label_map_from_folders (alfabético)
+    label_map = {word: idx for idx, word in enumerate(sorted(words))}
+    return file_paths, shard, label_map
+
+def _shard_labels_to_indices(shard, label_map):
+    """
+    Retorna (registros vigentes del bloque, índice de clase de cada uno).
+    """
+    _, shard_label_ids, shard_labels = shard
+    label_ids = np.asarray(shard_label_ids)
+    valid = label_ids != dataset_shards.DELETED
+    remap = np.array([label_map.get(word, -1) for word in shard_labels], dtype=np.int32)
+    return np.flatnonzero(valid), remap[label_ids[valid]]
+
 def load_dataset(dataset_dir: str):
     """
     Carga los datos del dataset estructurado en formato NumPy.
     Retorna los datos y etiquetas como arrays NumPy.
+    Si existe el bloque empaquetado (utils.dataset_shards) se abre con memoria mapeada;
+    cuando no hay archivos .npy sueltos ni registros eliminados, X se retorna sin copiar.
     """
-    X = []  # Datos (secuencias)
-    y = []  # Etiquetas (palabras)
-
     logger.info(f"Cargando dataset desde {dataset_dir}")
-    label_map = {}  # Mapear palabras a índices
+    file_paths, shard, label_map = _discover_dataset(dataset_dir)
 
-    for idx, word_dir in enumerate(os.listdir(dataset_dir)):
-        word_path = os.path.join(dataset_dir, word_dir)
-        if os.path.isdir(word_path):
-            label_map[word_dir] = idx
-            for file_name in os.listdir(word_path):
-                if file_name.endswith(".npy"):
-                    file_path = os.path.join(word_path, file_name)
-                    try:
-                        sequence = np.load(file_path)
-                        X.append(sequence)
-                        y.append(idx)
-                    except Exception as e:
-                        logger.error(f"Error al cargar archivo {file_path}: {e}")
-
-    X = np.array(X, dtype=np.float32)
-    y = np.array(y, dtype=np.int32)
+    X_parts, y_parts = [], []
+    if shard is not None and len(shard[0]):
+        shard_data = shard[0]
+        records, shard_y = _shard_labels_to_indices(shard, label_map)
+        if len(records) == len(shard_data):
+            X_parts.append(shard_data)
+        else:
+            logger.info("El bloque contiene registros eliminados; se recomienda compactarlo.")
+            X_parts.append(shard_data[records])
+        y_parts.append(shard_y)
+
+    X_files, y_files = [], []
+    for word, paths in file_paths.items():
+        for file_path in paths:
+            try:
+                X_files.append(np.load(file_path))
+                y_files.append(label_map[word])
+            except Exception as e:
+                logger.error(f"Error al cargar archivo {file_path}: {e}")
+    if X_files:
+        X_parts.append(np.stack(X_files).astype(np.float32, copy=False))
+        y_parts.append(np.array(y_files, dtype=np.int32))
+
+    if len(X_parts) == 1:
+        X = X_parts[0]
+        y = np.asarray(y_parts[0], dtype=np.int32)
+    elif X_parts:
+        X = np.concatenate(X_parts).astype(np.float32, copy=False)
+        y = np.concatenate(y_parts).astype(np.int32)
+    else:
+        X = np.empty((0,), dtype=np.float32)
+        y = np.empty((0,), dtype=np.int32)
 
     logger.info(f"Dataset cargado correctamente: {len(X)} secuencias, {len(label_map)} clases.")
     return X, y, label_map
 
-def split_dataset(X, y, test_size=0.2, validation_size=0.1):
+# ------------------ PIPELINE DE ENTRADA EN STREAMING ------------------
+
+def index_dataset(dataset_dir: str):
+    """
+    Lista los registros del dataset sin cargar las secuencias en memoria.
+    Retorna (rutas, registros, etiquetas, label_map): para archivos .npy la ruta
+    es el archivo y el registro -1; para el bloque empaquetado la ruta es
+    dataset_dir y el registro su posición dentro del bloque.
+    """
+    logger.info(f"Indexando dataset en {dataset_dir}")
+    file_paths, shard, label_map = _discover_dataset(dataset_dir)
+
+    paths, records, y = [], [], []
+    if shard is not None and len(shard[0]):
+        shard_records, shard_y = _shard_labels_to_indices(shard, label_map)
+        paths.extend([dataset_dir] * len(shard_records))
+        records.extend(shard_records.tolist())
+        y.extend(shard_y.tolist())
+    for word, word_paths in file_paths.items():
+        paths.extend(word_paths)
+        records.extend([-1] * len(word_paths))
+        y.extend([label_map[word]] * len(word_paths))
+
+    logger.info(f"Dataset indexado: {len(y)} secuencias, {len(label_map)} clases.")
+    return (np.array(paths), np.array(records, dtype=np.int64),
+            np.array(y, dtype=np.int32), label_map)
+
+# Bloques abiertos por proceso (memoria mapeada), reutilizados entre lecturas
+_open_shards = {}
+
+def read_record(path, record) -> np.ndarray:
+    """
+    Lee una secuencia (T, F) float32 de un archivo .npy o del bloque empaquetado.
+    """
+    path = path.decode() if isinstance(path, bytes) else str(path)
+    record = int(record)
+    if record < 0:
+        return np.load(path).astype(np.float32, copy=False)
+    data = _open_shards.get(path)
+    if data is None or record >= len(data):
+        data = dataset_shards.open_shard(path)[0]
+        _open_shards[path] = data
+    return np.array(data[record], dtype=np.float32)
+
+def make_input_pipeline(paths, records, labels, record_shape, batch_size=32,
+                        shuffle=False, cache=None, shuffle_buffer=1024, seed=42):
+    """
+    Crea un tf.data.Dataset que lee las secuencias bajo demanda con lecturas en
+    paralelo, en lugar de cargar todo el dataset en memoria.
+
+    - shuffle: baraja el orden en cada época.
+    - cache: None (sin caché), "" (caché en memoria) o ruta de archivo para la caché en disco.
+    """
+    dataset = tf.data.Dataset.from_tensor_slices((paths, records, labels))
+
+    def load(path, record, label):
+        sequence = tf.numpy_function(read_record, [path, record], tf.float32)
+        sequence.set_shape(record_shape)
+        return sequence, label
+
+    if cache is None:
+        # Se barajan solo los índices: el costo de memoria no depende del tamaño de las secuencias
+        if shuffle:
+            dataset = dataset.shuffle(len(labels), seed=seed, reshuffle_each_iteration=True)
+        dataset = dataset.map(load, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle)
+    else:
+        dataset = dataset.map(load, num_parallel_calls=tf.data.AUTOTUNE).cache(cache)
+        if shuffle:
+            dataset = dataset.shuffle(min(len(labels), shuffle_buffer), seed=seed, reshuffle_each_iteration=True)
+
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+# Semilla de la división; la evaluación offline la usa para reconstruir el conjunto de prueba
+SPLIT_SEED = 42
+
+def split_dataset(X, y, test_size=0.2, validation_size=0.1, seed=SPLIT_SEED):
     """
     Divide el dataset en conjuntos de entrenamiento, validación y prueba.
     """
     logger.info("Dividiendo el dataset en entrenamiento, validación y prueba.")
     X_train, X_temp, y_train, y_temp = train_test_split(
-        X, y, test_size=test_size + validation_size, random_state=42)
+        X, y, test_size=test_size + validation_size, random_state=seed)
     X_val, X_test, y_val, y_test = train_test_split(
-        X_temp, y_temp, test_size=test_size / (test_size + validation_size), random_state=42)
+        X_temp, y_temp, test_size=test_size / (test_size + validation_size), random_state=seed)
     logger.info(f"Conjuntos generados: {len(X_train)} entrenamiento, {len(X_val)} validación, {len(X_test)} prueba.")
     return X_train, X_val, X_test, y_train, y_val, y_test
 
@@ -85,15 +212,25 @@ def create_lstm_model(input_shape, n_classes):
     logger.info("Modelo LSTM creado y compilado.")
     return model
 
-def train_model(model, X_train, y_train, X_val, y_val, batch_size=32, epochs=50, model_dir="models"):
-    """
-    Entrena el modelo LSTM y guarda el modelo entrenado.
-    """
+def _training_callbacks(model_path):
+    return [
+        tf.keras.callbacks.ModelCheckpoint(model_path, save_best_only=True, monitor='val_accuracy', mode='max'),
+        tf.keras.callbacks.EarlyStopping(monitor='val_accuracy', patience=5, restore_best_weights=True)
+    ]
+
+def _model_path(model_dir):
     if not os.path.exists(model_dir):
         os.makedirs(model_dir)
         logger.info(f"Directorio para guardar modelos creado: {model_dir}")
+    return os.path.join(model_dir, "gesture_model.h5")
 
-    model_path = os.path.join(model_dir, "gesture_model.h5")
+def train_model(model, X_train, y_train, X_val, y_val, batch_size=32, epochs=50, model_dir="models",
+                callbacks=None):
+    """
+    Entrena el modelo LSTM y guarda el modelo entrenado.
+    `callbacks` se agregan a los de checkpoint y parada temprana (p. ej. progreso).
+    """
+    model_path = _model_path(model_dir)
 
     logger.info("Iniciando entrenamiento del modelo.")
     history = model.fit(
@@ -101,49 +238,137 @@ def train_model(model, X_train, y_train, X_val, y_val, batch_size=32, epochs=50,
         validation_data=(X_val, y_val),
         batch_size=batch_size,
         epochs=epochs,
-        callbacks=[
-            tf.keras.callbacks.ModelCheckpoint(model_path, save_best_only=True, monitor='val_accuracy', mode='max'),
-            tf.keras.callbacks.EarlyStopping(monitor='val_accuracy', patience=5, restore_best_weights=True)
-        ]
+        callbacks=_training_callbacks(model_path) + list(callbacks or [])
     )
     logger.info(f"Entrenamiento completado. Modelo guardado en {model_path}.")
     return history, model_path
 
+def train_model_streaming(model, train_dataset, val_dataset, epochs=50, model_dir="models", callbacks=None):
+    """
+    Igual que train_model, pero a partir de tf.data.Dataset ya batcheados.
+    """
+    model_path = _model_path(model_dir)
+
+    logger.info("Iniciando entrenamiento del modelo (streaming).")
+    history = model.fit(
+        train_dataset,
+        validation_data=val_dataset,
+        epochs=epochs,
+        callbacks=_training_callbacks(model_path) + list(callbacks or [])
+    )
+    logger.info(f"Entrenamiento completado. Modelo guardado en {model_path}.")
+    return history, model_path
+
+class TrainingCancelled(Exception):
+    """El entrenamiento fue cancelado antes de terminar."""
+
+class TrainingProgress(tf.keras.callbacks.Callback):
+    """
+    Reporta las métricas de cada época con `report(dict)` y, si se pasa
+    `cancel_event` (threading/multiprocessing Event), interrumpe el entrenamiento
+    al terminar el batch en curso una vez que el evento se activa.
+    """
+    def __init__(self, report, epochs, cancel_event=None):
+        super().__init__()
+        self.report = report
+        self.epochs = epochs
+        self.cancel_event = cancel_event
+
+    def on_train_batch_end(self, batch, logs=None):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise TrainingCancelled("Entrenamiento cancelado.")
+
+    def on_epoch_end(self, epoch, logs=None):
+        metrics = {key: float(value) for key, value in (logs or {}).items()}
+        self.report({"epoch": epoch + 1, "epochs": self.epochs, **metrics})
+
 # ------------------ ENTRENAMIENTO COMPLETO ------------------
 
 def train_gesture_recognition_model(meta_entrenamiento_id:int, dataset_dir="dataset", model_dir="models", 
                                     test_size=0.2, validation_size=0.1, 
-                                    batch_size=32, epochs=50):
+                                    batch_size=32, epochs=50,
+                                    streaming=True, cache=None, callbacks=None):
     """
-    Proceso completo de entrenamiento del modelo: carga, división, entrenamiento.
+    Proceso completo de entrenamiento del modelo: carga, división, entrenamiento
+    y publicación de la versión en el registro de modelos (utils.registro_modelos).
+    - streaming: lee las secuencias con un pipeline tf.data (memoria constante);
+      con False se carga todo el dataset en memoria como antes.
+    - cache: caché del pipeline en streaming (None, "" = memoria, o ruta en disco).
+    - callbacks: callbacks de Keras adicionales (progreso, cancelación).
     """
     db = SessionLocal()
     try:
-        X, y, label_map = load_dataset(dataset_dir)
-        X_train, X_val, X_test, y_train, y_val, y_test = split_dataset(X, y, test_size, validation_size)
+        if streaming:
+            paths, records, y, label_map = index_dataset(dataset_dir)
+            idx_train, idx_val, idx_test, y_train, y_val, y_test = split_dataset(
+                np.arange(len(y)), y, test_size, validation_size)
+
+            input_shape = read_record(paths[0], records[0]).shape  # (n_frames, n_points * 3)
+            n_classes = len(label_map)
+            model = create_lstm_model(input_shape, n_classes)
+
+            def pipeline(idx, labels, shuffle=False, cache_suffix=None):
+                cache_path = None
+                if cache is not None:
+                    cache_path = f"{cache}_{cache_suffix}" if cache else ""
+                return make_input_pipeline(paths[idx], records[idx], labels, input_shape,
+                                           batch_size, shuffle=shuffle, cache=cache_path)
+
+            train_dataset = pipeline(idx_train, y_train, shuffle=True, cache_suffix="train")
+            val_dataset = pipeline(idx_val, y_val, cache_suffix="val")
+            history, model_path = train_model_streaming(model, train_dataset, val_dataset, epochs, model_dir,
+                                                        callbacks)
 
-        input_shape = X_train.shape[1:]  # (n_frames, n_points * 3)
-        n_classes = len(label_map)
-        model = create_lstm_model(input_shape, n_classes)
+            test_loss, test_accuracy = model.evaluate(pipeline(idx_test, y_test, cache_suffix="test"))
+            calibration_data = lambda: np.stack([read_record(paths[i], records[i]) for i in idx_train[:200]])
+        else:
+            X, y, label_map = load_dataset(dataset_dir)
+            X_train, X_val, X_test, y_train, y_val, y_test = split_dataset(X, y, test_size, validation_size)
 
-        history, model_path = train_model(model, X_train, y_train, X_val, y_val, batch_size, epochs)
+            input_shape = X_train.shape[1:]  # (n_frames, n_points * 3)
+            n_classes = len(label_map)
+            model = create_lstm_model(input_shape, n_classes)
 
-        test_loss, test_accuracy = model.evaluate(X_test, y_test)
+            history, model_path = train_model(model, X_train, y_train, X_val, y_val, batch_size, epochs,
+                                              model_dir, callbacks)
+
+            test_loss, test_accuracy = model.evaluate(X_test, y_test)
+            calibration_data = lambda: X_train[:200]
         logger.info(f"Evaluación en conjunto de prueba: pérdida = {test_loss:.4f}, precisión = {test_accuracy:.4f}")
 
+        tflite_path = None
+        if settings.TFLITE_EXPORT:
+            # La exportación es opcional: un fallo no invalida el modelo Keras ya guardado
+            try:
+                tflite_path = export_tflite(model, os.path.join(model_dir, TFLITE_FILE),
+                                            settings.TFLITE_QUANTIZATION, calibration_data)
+            except Exception as e:
+                logger.error(f"No se pudo exportar el modelo a TFLite: {e}")
+
+        # Bundle versionado con el label_map usado en el entrenamiento; al activarse,
+        # la API cambia a esta versión sin reiniciarse
+        model_version = publish_bundle(model_path, label_map, tflite_path, model_dir=model_dir, metrics={
+            "test_accuracy": float(test_accuracy),
+            "test_loss": float(test_loss),
+            "meta_entrenamiento_id": meta_entrenamiento_id,
+            # Para reconstruir el conjunto de prueba al evaluar la versión
+            "split": {"test_size": test_size, "validation_size": validation_size,
+                      "seed": SPLIT_SEED, "sequences": int(len(y))},
+        })
 
         meta = db.query(MetadatosEntrenamiento).filter_by(id=meta_entrenamiento_id).first()
         if meta:
-            meta.status = "completed"
-            meta.finished_at = datetime.utcnow()
-            # Registrar métricas si gustas
-            meta.accuracy = f"{test_accuracy:.2f}"
-            meta.loss = f"{test_loss:.2f}"
+            meta.estado = "completed"
+            meta.hora_fin = datetime.utcnow()
+            meta.exactitud = f"{test_accuracy:.2f}"
+            meta.perdida = f"{test_loss:.2f}"
             db.commit()
             
         return {
             "message": "Entrenamiento completado exitosamente.",
             "model_path": model_path,
+            "model_version": model_version,
+            "tflite_path": tflite_path,
             "test_accuracy": test_accuracy,
             "label_map": label_map
         }
@@ -152,8 +377,9 @@ def train_gesture_recognition_model(meta_entrenamiento_id:int, dataset_dir="data
         logger.error(f"Error en el entrenamiento del modelo: {e}")
         meta = db.query(MetadatosEntrenamiento).filter_by(id=meta_entrenamiento_id).first()
         if meta:
-            meta.status = "failed"
-            db.commit() 
+            meta.estado = "cancelled" if isinstance(e, TrainingCancelled) else "failed"
+            meta.hora_fin = datetime.utcnow()
+            db.commit()
         raise
     finally:
         db.close()
@@ -170,10 +170,31 @@
 # backend/utils/evaluacion.py
 import os
 import json
+import math
+import time
 import numpy as np
-import tensorflow as tf
 import logging
-from typing import Dict
+from typing import Dict, List, Optional
+import threading
+from app.core.config import settings
+from utils.inferencia_incremental import IncrementalLSTM, max_difference
+from utils.lotes_inferencia import MicroBatcher
+from utils.registro_modelos import bundle_endpointing, load_bundle, registry_mtime, resolve_active
+from utils.servidor_modelo import ModelServerClient
+from utils.preprocesamiento import (
+    ENDPOINTING,
+    TARGET_LENGTH,
+    Endpointing,
+    NoSigningDetected,
+    flatten_features,
+    format_diagnostics,
+    merge_diagnostics,
+    new_diagnostics,
+    pad_or_trim_array,
+    preprocess_array,
+    preprocess_batch,
+    preprocess_frames,
+)
 
 # Configuración de logging
 logging.basicConfig(
@@ -187,172 +208,606 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+_tf = None
+
+def _tensorflow():
+    """
+    Importa TensorFlow en el primer uso y fija sus hilos para la inferencia
+    (0 = valor por defecto) antes de que ejecute la primera operación. Con el
+    servidor de modelo (MODEL_SERVER_SOCKET) los workers de la API no lo importan.
+    """
+    global _tf
+    if _tf is None:
+        import tensorflow as tf
+        try:
+            if settings.INFERENCE_INTRA_OP_THREADS:
+                tf.config.threading.set_intra_op_parallelism_threads(settings.INFERENCE_INTRA_OP_THREADS)
+            if settings.INFERENCE_INTER_OP_THREADS:
+                tf.config.threading.set_inter_op_parallelism_threads(settings.INFERENCE_INTER_OP_THREADS)
+        except RuntimeError as e:
+            logger.warning(f"No se pudo fijar los hilos de TensorFlow: {e}")
+        _tf = tf
+    return _tf
+
 # ------------------ CONSTANTES ------------------
-MODEL_PATH = "models/gesture_model.h5"
-LABEL_MAP_PATH = "models/label_map.json"
 CONFIDENCE_THRESHOLD = 0.8
 
-# Variables globales para caché
-_model = None
-_label_map = None
-_inv_label_map = None  # <<-- Se añade para la versión invertida
-
-# ------------------ FUNCIÓN DE CARGA CON CACHÉ ------------------
-def load_model_cached():
-    global _model
-    if _model is None:
-        if not os.path.exists(MODEL_PATH):
-            logger.error(f"El modelo no se encontró en {MODEL_PATH}.")
-            raise FileNotFoundError(f"El modelo no se encontró en {MODEL_PATH}.")
-        logger.info("Cargando modelo.")
-        _model = tf.keras.models.load_model(MODEL_PATH)
-        logger.info("Modelo cargado correctamente.")
-    return _model
+# Versión del modelo en servicio y la anterior (se conserva cargada para el rollback)
+_served = None
+_previous = None
+_load_lock = threading.Lock()
+_registry_state = {"mtime": None, "checked_at": 0.0}
+_model_server_client = None
 
-def load_label_map_cached():
-    """
-    Carga el label_map original (clase -> índice) y crea un inv_label_map (índice -> clase),
-    guardándolos en variables globales.
-    """
-    global _label_map, _inv_label_map
-    if _label_map is None or _inv_label_map is None:
-        if not os.path.exists(LABEL_MAP_PATH):
-            logger.error(f"El archivo de etiquetas no se encontró en {LABEL_MAP_PATH}.")
-            raise FileNotFoundError(f"El archivo de etiquetas no se encontró en {LABEL_MAP_PATH}.")
-        with open(LABEL_MAP_PATH, "r") as f:
-            _label_map = json.load(f)
-
-        # Crear la versión invertida
-        _inv_label_map = {v: k for k, v in _label_map.items()}
-
-        logger.info(f"label_map cargado con {len(_label_map)} clases.")
-    return _label_map, _inv_label_map
-
-# ------------------ NORMALIZACIÓN Y PREPROCESAMIENTO ------------------
-def fill_missing_landmarks(frame: Dict) -> Dict:
-    expected_points = {
-        "pose": 33,
-        "leftHand": 21,
-        "rightHand": 21,
-        "face": 33
-    }
+# Contadores de diagnóstico acumulados de las secuencias evaluadas
+_metrics_lock = threading.Lock()
+EVALUATION_METRICS = {**new_diagnostics(), "rejected_sequences": 0}
 
-    def fill_landmarks(points, expected_count):
-        if not points:
-            logger.warning(f"Puntos faltantes detectados, rellenando con {expected_count} puntos.")
-            return [{"x": 0, "y": 0, "z": 0} for _ in range(expected_count)]
-        elif len(points) < expected_count:
-            missing = expected_count - len(points)
-            logger.warning(f"Puntos incompletos detectados, rellenando con {missing} puntos.")
-            return points + [{"x": 0, "y": 0, "z": 0} for _ in range(missing)]
-        return points
+_batcher = None
+_batcher_lock = threading.Lock()
 
-    return {
-        "pose": fill_landmarks(frame.get("pose", []), expected_points["pose"]),
-        "leftHand": fill_landmarks(frame.get("leftHand", []), expected_points["leftHand"]),
-        "rightHand": fill_landmarks(frame.get("rightHand", []), expected_points["rightHand"]),
-        "face": fill_landmarks(frame.get("face", []), expected_points["face"]),
-    }
+# Diferencia máxima admitida entre el modelo incremental y el completo
+INCREMENTAL_TOLERANCE = 1e-3
 
-def normalize_landmarks(frame: Dict) -> Dict:
-    frame = fill_missing_landmarks(frame)
-    pose = frame.get("pose", [])
-    if not pose or len(pose) < 12:
-        logger.warning("No se encontraron suficientes puntos para normalizar. Frame no procesado.")
-        return frame
-
-    left_shoulder = np.array([pose[11]["x"], pose[11]["y"], pose[11]["z"]])
-    right_shoulder = np.array([pose[12]["x"], pose[12]["y"], pose[12]["z"]])
-    center = (left_shoulder + right_shoulder) / 2
-    ref_distance = np.linalg.norm(left_shoulder - right_shoulder)
-
-    if ref_distance == 0:
-        logger.warning("La distancia de referencia entre hombros es cero. Ajustando a 1.")
-        ref_distance = 1
-
-    def normalize_points(points):
-        return [
-            {
-                "x": (p["x"] - center[0]) / ref_distance,
-                "y": (p["y"] - center[1]) / ref_distance,
-                "z": (p["z"] - center[2]) / ref_distance,
+# Tiempos acumulados por etapa de la inferencia
+_timings_lock = threading.Lock()
+INFERENCE_TIMINGS = {}
+
+# ------------------ MOTOR DE INFERENCIA ------------------
+class InferenceEngine:
+    """
+    Envuelve el modelo en una función compilada (tf.function) con firma fija
+    (lote variable, TARGET_LENGTH, FEATURES_PER_FRAME), así cada pasada evita la
+    maquinaria de model.predict. El lote se arma en un buffer preasignado y se
+    acumulan los tiempos de cada etapa.
+    """
+    def __init__(self, model, max_batch_size: int = 1):
+        self.model = model
+        self.input_shape = tuple(model.input_shape[1:])
+        self.output_size = int(model.output_shape[-1])
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self._buffer = np.zeros((self.max_batch_size, *self.input_shape), dtype=np.float32)
+        tf = _tensorflow()
+        self._forward = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[tf.TensorSpec(shape=(None, *self.input_shape), dtype=tf.float32)],
+        )
+
+    def collate(self, items) -> np.ndarray:
+        """
+        Copia las entradas en el buffer preasignado y retorna la vista del lote.
+        """
+        start = time.perf_counter()
+        if len(items) > self.max_batch_size:
+            batch = np.stack(items).astype(np.float32, copy=False)
+        else:
+            batch = self._buffer[:len(items)]
+            for i, item in enumerate(items):
+                batch[i] = item
+        record_timing("collate", time.perf_counter() - start)
+        return batch
+
+    def _invoke(self, batch: np.ndarray) -> np.ndarray:
+        tf = _tensorflow()
+        return self._forward(tf.convert_to_tensor(batch, dtype=tf.float32)).numpy()
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        start = time.perf_counter()
+        probabilities = self._invoke(batch)
+        record_timing("forward", time.perf_counter() - start)
+        return probabilities
+
+    def warmup(self, runs: int = 3):
+        """
+        Traza la función compilada y ejecuta pasadas de prueba con entrada en ceros
+        (lote de 1 y lote máximo), para que la primera solicitud no pague ese costo.
+        """
+        start = time.perf_counter()
+        for size in sorted({1, self.max_batch_size}):
+            for _ in range(runs):
+                self._invoke(np.zeros((size, *self.input_shape), dtype=np.float32))
+        logger.info(f"Motor de inferencia precalentado en {time.perf_counter() - start:.2f}s.")
+
+class TFLiteEngine(InferenceEngine):
+    """
+    Mismo contrato que InferenceEngine, pero ejecuta el modelo exportado a TFLite
+    (utils.exportacion_tflite) con el intérprete, que usa menos memoria y carga
+    más rápido que el modelo Keras completo. El LSTM fusionado de TFLite guarda
+    su estado con lote 1, así que cada secuencia del lote se ejecuta en una
+    invocación propia en lugar de redimensionar la entrada.
+    """
+    def __init__(self, model_path: str, max_batch_size: int = 1):
+        if not os.path.exists(model_path):
+            logger.error(f"El modelo TFLite no se encontró en {model_path}.")
+            raise FileNotFoundError(f"El modelo TFLite no se encontró en {model_path}.")
+        self.model = None
+        self._interpreter = _tensorflow().lite.Interpreter(
+            model_path=model_path, num_threads=settings.INFERENCE_INTRA_OP_THREADS or None
+        )
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        output = self._interpreter.get_output_details()[0]
+        self._output_index = output["index"]
+        self.output_size = int(output["shape"][-1])
+        self._lock = threading.Lock()
+
+        self.input_shape = tuple(int(d) for d in self._input["shape"][1:])
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self._buffer = np.zeros((self.max_batch_size, *self.input_shape), dtype=np.float32)
+        logger.info(f"Modelo TFLite cargado desde {model_path}.")
+
+    def _invoke(self, batch: np.ndarray) -> np.ndarray:
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        probabilities = np.empty((len(batch), self.output_size), dtype=np.float32)
+        with self._lock:
+            for i in range(len(batch)):
+                self._interpreter.set_tensor(self._input["index"], batch[i:i + 1])
+                self._interpreter.invoke()
+                probabilities[i] = self._interpreter.get_tensor(self._output_index)[0]
+        return probabilities
+
+def record_timing(stage: str, seconds: float):
+    with _timings_lock:
+        timing = INFERENCE_TIMINGS.setdefault(stage, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+        timing["count"] += 1
+        timing["total_seconds"] += seconds
+        timing["max_seconds"] = max(timing["max_seconds"], seconds)
+
+def get_inference_timings() -> Dict:
+    """
+    Tiempo promedio y máximo (ms) por etapa: preprocess, collate, forward y postprocess.
+    La espera en cola del micro-lote se reporta en las métricas de batching.
+    """
+    with _timings_lock:
+        return {
+            stage: {
+                "count": t["count"],
+                "avg_ms": round(t["total_seconds"] * 1000 / t["count"], 3),
+                "max_ms": round(t["max_seconds"] * 1000, 3),
             }
-            for p in points
-        ]
+            for stage, t in INFERENCE_TIMINGS.items() if t["count"]
+        }
+
+# ------------------ VERSIÓN EN SERVICIO ------------------
+class ServedModel:
+    """
+    Motor de inferencia, label_map e inferencia incremental de un mismo bundle
+    del registro (utils.registro_modelos). Cada solicitud toma una referencia a
+    la versión en servicio y la usa de principio a fin, así el modelo y sus
+    etiquetas nunca se mezclan durante un cambio de versión.
+    """
+    def __init__(self, bundle: Dict):
+        self.version = bundle["version"]
+        self.bundle = bundle
+        with open(bundle["label_map_path"], "r", encoding="utf-8") as f:
+            self.label_map = json.load(f)
+        self.inv_label_map = {v: k for k, v in self.label_map.items()}
+
+        self.model = None
+        if settings.INFERENCE_BACKEND == "tflite":
+            if not bundle.get("tflite_path"):
+                raise FileNotFoundError(f"La versión {self.version} no incluye un modelo TFLite.")
+            self.engine = TFLiteEngine(bundle["tflite_path"], settings.INFERENCE_MAX_BATCH_SIZE)
+        else:
+            self.engine = InferenceEngine(self.load_keras_model(), settings.INFERENCE_MAX_BATCH_SIZE)
+
+        if self.engine.output_size != len(self.label_map):
+            raise ValueError(f"La versión {self.version} tiene {self.engine.output_size} salidas "
+                             f"y {len(self.label_map)} etiquetas.")
+        self._incremental = None  # False = no disponible
+        self._incremental_lock = threading.Lock()
+        # Recorte de reposo con el que se entrenó la versión; se aplica a sus solicitudes
+        self.endpointing = bundle_endpointing(bundle)
+        logger.info(f"Versión {self.version} del modelo cargada con {len(self.label_map)} clases "
+                    f"({'con' if self.endpointing else 'sin'} recorte de reposo).")
+
+    def load_keras_model(self):
+        if self.model is None:
+            if not os.path.exists(self.bundle["model_path"]):
+                logger.error(f"El modelo no se encontró en {self.bundle['model_path']}.")
+                raise FileNotFoundError(f"El modelo no se encontró en {self.bundle['model_path']}.")
+            self.model = _tensorflow().keras.models.load_model(self.bundle["model_path"])
+        return self.model
+
+    def incremental(self):
+        """
+        IncrementalLSTM construido con los pesos del modelo Keras, validado contra la
+        salida del modelo sobre ventanas completas. Retorna None si la arquitectura no
+        es compatible o la validación falla; en ese caso se evalúan ventanas completas.
+        """
+        if self._incremental is None:
+            with self._incremental_lock:
+                if self._incremental is None:
+                    try:
+                        model = self.load_keras_model()
+                        lstm = IncrementalLSTM.from_keras_model(model)
+                        sample = np.random.default_rng(0).normal(size=(4, *model.input_shape[1:])).astype(np.float32)
+                        difference = max_difference(model, lstm, sample)
+                        if difference > INCREMENTAL_TOLERANCE:
+                            raise ValueError(f"difiere del modelo completo en {difference:.2e}")
+                        logger.info(f"Modelo incremental validado (diferencia máxima {difference:.2e}).")
+                        self._incremental = lstm
+                    except (ValueError, FileNotFoundError) as e:
+                        logger.warning(f"Inferencia incremental no disponible: {e}")
+                        self._incremental = False
+        return self._incremental or None
+
+class RemoteEngine:
+    """
+    Mismo contrato que InferenceEngine, pero cada lote se envía al servidor de
+    modelo (utils.servidor_modelo), que lo ejecuta con la versión `version`.
+    """
+    def __init__(self, client: ModelServerClient, version: str, output_size: int):
+        self.client = client
+        self.version = version
+        self.output_size = output_size
+
+    def collate(self, items) -> np.ndarray:
+        return np.stack(items).astype(np.float32, copy=False)
 
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        start = time.perf_counter()
+        probabilities = self.client.predict(batch, self.version)
+        record_timing("forward", time.perf_counter() - start)
+        return probabilities
+
+    def warmup(self, runs: int = 3):
+        # El servidor de modelo se precalienta al iniciar
+        pass
+
+class RemoteServedModel:
+    """
+    Versión en servicio del servidor de modelo: el worker solo guarda su
+    label_map y envía los lotes al servidor.
+    """
+    def __init__(self, client: ModelServerClient):
+        info = client.info()
+        self.version = info["version"]
+        self.label_map = info["label_map"]
+        self.inv_label_map = {v: k for k, v in self.label_map.items()}
+        self.endpointing = info.get("endpointing")
+        self.engine = RemoteEngine(client, self.version, len(self.label_map))
+        logger.info(f"Usando la versión {self.version} del servidor de modelo en {client.socket_path}.")
+
+    def incremental(self):
+        # Los pesos viven en el servidor de modelo: el reconocimiento continuo evalúa ventanas
+        return None
+
+def get_model_server_client() -> ModelServerClient:
+    global _model_server_client
+    if _model_server_client is None:
+        _model_server_client = ModelServerClient(settings.MODEL_SERVER_SOCKET, settings.INFERENCE_TIMEOUT_SECONDS)
+    return _model_server_client
+
+def _load_served_model():
+    if settings.MODEL_SERVER_SOCKET:
+        return RemoteServedModel(get_model_server_client())
+    return ServedModel(resolve_active())
+
+def get_served_model() -> ServedModel:
+    """
+    Versión del modelo en servicio. La primera llamada la carga; después, cada
+    MODEL_REFRESH_SECONDS se revisa si cambió la versión activa del registro y,
+    si es así, la nueva se carga y precalienta en segundo plano mientras se
+    sigue sirviendo la actual. Con MODEL_SERVER_SOCKET el modelo lo carga el
+    servidor de modelo y aquí se sigue su versión activa.
+    """
+    served = _served
+    if served is None:
+        with _load_lock:
+            if _served is None:
+                _swap(_load_served_model(), registry_mtime())
+        return _served
+    _check_for_update()
+    return served
+
+def get_loaded_model(version: str) -> Optional[ServedModel]:
+    """
+    La versión en servicio o la anterior, si coincide con `version`.
+    """
+    for served in (get_served_model(), _previous):
+        if served is not None and served.version == version:
+            return served
+    return None
+
+def _swap(candidate: ServedModel, mtime):
+    global _served, _previous
+    if _served is not None and _served.version != candidate.version:
+        _previous = _served
+    _served = candidate
+    _registry_state["mtime"] = mtime
+
+def _check_for_update():
+    now = time.monotonic()
+    if now - _registry_state["checked_at"] < settings.MODEL_REFRESH_SECONDS or _load_lock.locked():
+        return
+    _registry_state["checked_at"] = now
+    if settings.MODEL_SERVER_SOCKET:
+        changed = get_model_server_client().active_version not in (None, _served.version)
+    else:
+        changed = registry_mtime() != _registry_state["mtime"]
+    if changed:
+        threading.Thread(target=reload_model, name="recarga-modelo", daemon=True).start()
+
+def _load_local_version(version: Optional[str] = None) -> ServedModel:
+    """
+    Versión del registro ya cargada (en servicio o anterior) o una nueva, precalentada.
+    """
+    bundle = load_bundle(version) if version else resolve_active()
+    for loaded in (_served, _previous):
+        if loaded is not None and loaded.version == bundle["version"]:
+            return loaded
+    candidate = ServedModel(bundle)
+    candidate.engine.warmup(runs=1)
+    return candidate
+
+def reload_model(version: Optional[str] = None) -> Optional[str]:
+    """
+    Pone en servicio la versión activa del registro (o `version`). La versión
+    nueva se carga y precalienta antes del cambio; las solicitudes en curso
+    terminan con la anterior. Si la carga falla se sigue sirviendo la actual.
+    Retorna la versión en servicio.
+    """
+    with _load_lock:
+        mtime = registry_mtime()
+        try:
+            if settings.MODEL_SERVER_SOCKET:
+                # El servidor de modelo decide la versión; aquí solo se actualiza el label_map
+                candidate = RemoteServedModel(get_model_server_client())
+            else:
+                candidate = _load_local_version(version)
+            if _served is not None and candidate.version == _served.version:
+                _registry_state["mtime"] = mtime
+                return _served.version
+        except Exception as e:
+            # Se registra la fecha del registro para no reintentar hasta el próximo cambio
+            _registry_state["mtime"] = mtime
+            logger.error(f"No se pudo cargar la versión {version or 'activa'} del modelo: {e}")
+            return _served.version if _served is not None else None
+        _swap(candidate, mtime)
+        logger.info(f"Versión {candidate.version} del modelo en servicio.")
+        return candidate.version
+
+def get_model_info() -> Dict:
     return {
-        "pose": normalize_points(frame.get("pose", [])),
-        "leftHand": normalize_points(frame.get("leftHand", [])),
-        "rightHand": normalize_points(frame.get("rightHand", [])),
-        "face": normalize_points(frame.get("face", [])),
+        "version": _served.version if _served is not None else None,
+        "previous_version": _previous.version if _previous is not None else None,
     }
 
-def pad_or_trim_sequence(sequence: list, target_length: int = 30) -> list:
-    if len(sequence) > target_length:
-        logger.info(f"Secuencia recortada de {len(sequence)} a {target_length} frames.")
-        return sequence[:target_length]
-    elif len(sequence) < target_length:
-        last_frame = sequence[-1]
-        logger.info(f"Secuencia rellenada de {len(sequence)} a {target_length} frames.")
-        while len(sequence) < target_length:
-            sequence.append(last_frame)
-    return sequence
-
-def preprocess_for_evaluation(data: Dict) -> np.ndarray:
-    frames = data.get("framesData", [])
-    if not frames:
-        raise ValueError("No se encontraron framesData en los datos recibidos.")
-
-    logger.info(f"Procesando {len(frames)} frames para evaluación.")
-
-    frames = pad_or_trim_sequence(frames, target_length=30)
-    normalized_frames = [normalize_landmarks(frame) for frame in frames]
-
-    input_sequence = []
-    for frame in normalized_frames:
-        frame_data = []
-        for group in ["pose", "leftHand", "rightHand", "face"]:
-            points = frame[group]
-            for point in points:
-                frame_data.extend([point["x"], point["y"], point["z"]])
-        input_sequence.append(frame_data)
-
-    input_array = np.array(input_sequence, dtype=np.float32)
+def load_label_map_cached():
+    """
+    (label_map, inv_label_map) de la versión en servicio.
+    """
+    served = get_served_model()
+    return served.label_map, served.inv_label_map
+
+def get_engine() -> InferenceEngine:
+    """
+    Motor de inferencia de la versión en servicio, del backend configurado
+    (INFERENCE_BACKEND: "keras" o "tflite").
+    """
+    return get_served_model().engine
+
+def warmup_inference():
+    """
+    Carga el modelo y precalienta el motor de inferencia (al iniciar la API con
+    INFERENCE_WARMUP o con POST /warmup).
+    """
+    get_engine().warmup()
+
+# ------------------ PREPROCESAMIENTO ------------------
+def preprocess_for_evaluation(data: Dict, diagnostics: Optional[Dict[str, int]] = None,
+                              endpointing: Endpointing = ENDPOINTING) -> np.ndarray:
+    """
+    Acepta {"framesData": [...]} o {"landmarks": array (T, POINTS_PER_FRAME, 3)}
+    ya decodificado del formato binario. Lanza NoSigningDetected si la secuencia
+    no contiene señas; en ese caso no se llega a ejecutar el modelo.
+    Los contadores de la secuencia quedan en `diagnostics` si se pasa.
+    `endpointing` es el recorte de la versión que la evalúa (ServedModel.endpointing).
+    """
+    diagnostics = diagnostics if diagnostics is not None else new_diagnostics()
+    try:
+        if data.get("landmarks") is not None:
+            frames = data["landmarks"]
+            input_array = flatten_features(preprocess_array(frames, TARGET_LENGTH, diagnostics, endpointing))
+        else:
+            frames = data.get("framesData", [])
+            if not frames:
+                raise ValueError("No se encontraron framesData en los datos recibidos.")
+            input_array = flatten_features(preprocess_frames(frames, TARGET_LENGTH, diagnostics, endpointing))
+    except NoSigningDetected:
+        with _metrics_lock:
+            EVALUATION_METRICS["rejected_sequences"] += 1
+        raise
+    logger.info(f"Secuencia de {len(frames)} frames preprocesada para evaluación: {format_diagnostics(diagnostics)}")
+    with _metrics_lock:
+        merge_diagnostics(EVALUATION_METRICS, diagnostics)
+
     input_array = np.expand_dims(input_array, axis=0)  # Agregar dimensión batch
     return input_array
 
+def get_evaluation_metrics() -> Dict[str, int]:
+    with _metrics_lock:
+        return dict(EVALUATION_METRICS)
+
 # ------------------ FUNCIÓN DE PREDICCIÓN ------------------
-def predict(data: Dict):
-    try:
-        # Cargar modelo y mapas en caché
-        model = load_model_cached()
-        label_map, inv_label_map = load_label_map_cached()
+def run_model(items) -> list:
+    """
+    Ejecuta un lote de entradas (versión en servicio, secuencia (TARGET_LENGTH, FEATURES_PER_FRAME)).
+    Normalmente hay una sola pasada; si el lote quedó entre dos versiones del
+    modelo se hace una pasada por versión.
+    """
+    groups = {}
+    for i, (served, _) in enumerate(items):
+        groups.setdefault(id(served), (served, []))[1].append(i)
+    outputs = [None] * len(items)
+    for served, indices in groups.values():
+        probabilities = served.engine.run(served.engine.collate([items[i][1] for i in indices]))
+        for i, row in zip(indices, probabilities):
+            outputs[i] = row
+    return outputs
+
+def get_batcher() -> MicroBatcher:
+    """
+    Agrupador de solicitudes compartido (INFERENCE_BATCH_WINDOW_MS, INFERENCE_MAX_BATCH_SIZE).
+    """
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    run_model,
+                    collate=list,
+                    max_batch_size=settings.INFERENCE_MAX_BATCH_SIZE,
+                    window_ms=settings.INFERENCE_BATCH_WINDOW_MS,
+                    name="lotes-evaluacion",
+                )
+    return _batcher
+
+def get_batching_metrics() -> Dict:
+    return _batcher.stats() if _batcher is not None else {}
+
+def format_prediction(probabilities: np.ndarray, inv_label_map: Dict) -> Dict:
+    """
+    Convierte las probabilidades de una secuencia en la respuesta de la API,
+    aplicando el umbral de confianza.
+    """
+    predicted_class_idx = int(np.argmax(probabilities))
+    confidence = float(probabilities[predicted_class_idx])
 
-        # Preprocesar
-        input_array = preprocess_for_evaluation(data)
+    if confidence < CONFIDENCE_THRESHOLD:
+        logger.warning(f"Confianza baja ({confidence:.2f}). Predicción no aceptada.")
+        return {
+            "predicted_label": None,
+            "confidence": confidence,
+            "message": "Confianza insuficiente para una predicción confiable."
+        }
 
-        logger.info("Realizando predicción.")
-        predictions = model.predict(input_array)
+    # Usamos inv_label_map para obtener la clase de forma directa
+    predicted_label = inv_label_map.get(predicted_class_idx, None)
 
-        predicted_class_idx = int(np.argmax(predictions))
-        confidence = float(predictions[0][predicted_class_idx])
+    logger.info(f"Predicción completada: {predicted_label} (Confianza: {confidence:.2f})")
+    return {
+        "predicted_label": predicted_label,
+        "confidence": confidence
+    }
 
-        if confidence < CONFIDENCE_THRESHOLD:
-            logger.warning(f"Confianza baja ({confidence:.2f}). Predicción no aceptada.")
-            return {
-                "predicted_label": None,
-                "confidence": confidence,
-                "message": "Confianza insuficiente para una predicción confiable."
-            }
+def predict_early_exit(window: np.ndarray, received_frames: int, served: ServedModel,
+                       active_frames: Optional[int] = None) -> Dict:
+    """
+    Retorna con el primer prefijo de la secuencia (cada EARLY_EXIT_STEP frames)
+    cuya confianza supera CONFIDENCE_THRESHOLD; si ninguno la supera se evalúa la
+    secuencia completa, igual que predict. `window` es la secuencia ya
+    preprocesada (TARGET_LENGTH, F) y `active_frames` la cantidad de frames que
+    quedaron tras recortar los de reposo.
+    Solo pueden salir antes los prefijos de al menos EARLY_EXIT_MIN_FRAMES frames
+    y EARLY_EXIT_MIN_COVERAGE de TARGET_LENGTH: los más cortos, completados con el
+    último frame, dan etiquetas confiables pero equivocadas.
+    Cada prefijo se completa hasta TARGET_LENGTH repitiendo su último frame, como
+    las secuencias de entrenamiento. Con el modelo incremental los frames del
+    prefijo se recorren una sola vez y solo se calcula el relleno de cada uno; si
+    no está disponible los prefijos se evalúan de a uno con el micro-lote. En
+    ambos casos se detiene en el primero confiable.
+    """
+    available = min(active_frames or received_frames, TARGET_LENGTH)
+    first = max(settings.EARLY_EXIT_MIN_FRAMES, math.ceil(settings.EARLY_EXIT_MIN_COVERAGE * TARGET_LENGTH))
+    lengths = list(range(first, available, max(settings.EARLY_EXIT_STEP, 1)))
+
+    probabilities, length = None, available
+    if lengths:
+        lstm = served.incremental()
+        if lstm is not None:
+            candidates = lstm.padded_prefixes(window, lengths, TARGET_LENGTH)
+        else:
+            batcher = get_batcher()
+            candidates = ((n, batcher.submit((served, pad_or_trim_array(window[:n], TARGET_LENGTH))).result())
+                          for n in lengths)
+        start = time.perf_counter()
+        for n, output in candidates:
+            if float(np.max(output)) >= CONFIDENCE_THRESHOLD:
+                probabilities, length = output, n
+                break
+        record_timing("early_exit", time.perf_counter() - start)
+    if probabilities is None:
+        probabilities = get_batcher().submit((served, window)).result()
+
+    result = format_prediction(probabilities, served.inv_label_map)
+    result["frames_used"] = length
+    result["frames_received"] = received_frames
+    return result
+
+def top_predictions(probabilities: np.ndarray, inv_label_map: Dict, k: int) -> List[Dict]:
+    """
+    Las `k` clases más probables de una secuencia, de mayor a menor.
+    """
+    indices = np.argsort(probabilities)[::-1][:k]
+    return [{"label": inv_label_map.get(int(i)), "confidence": float(probabilities[i])} for i in indices]
 
-        # Usamos inv_label_map para obtener la clase de forma directa
-        predicted_label = inv_label_map.get(predicted_class_idx, None)
+def predict_batch(sequences: List, top_k: int = 3) -> Dict:
+    """
+    Evalúa varias secuencias (listas de frames o arrays (T, POINTS_PER_FRAME, 3))
+    con un solo preprocesamiento por lotes y una sola pasada del modelo. La
+    solicitud ya es un lote, así que no pasa por el micro-lote compartido.
+    Las secuencias vacías o sin señas se informan en su posición con "error"
+    sin afectar a las demás.
+    """
+    # La versión se fija primero: su recorte de reposo define el preprocesamiento
+    served = get_served_model()
+    start = time.perf_counter()
+    diagnostics = new_diagnostics()
+    errors = {}
+    batch = flatten_features(preprocess_batch(sequences, TARGET_LENGTH, diagnostics, served.endpointing,
+                                              errors=errors))
+    with _metrics_lock:
+        merge_diagnostics(EVALUATION_METRICS, diagnostics)
+        EVALUATION_METRICS["rejected_sequences"] += sum(isinstance(e, NoSigningDetected) for e in errors.values())
+    record_timing("preprocess", time.perf_counter() - start)
+    logger.info(f"Lote de {len(sequences)} secuencias preprocesado ({len(errors)} rechazadas): "
+                f"{format_diagnostics(diagnostics)}")
+
+    results = [{"index": i, "error": str(errors[i])} if i in errors else None for i in range(len(sequences))]
+    valid = [i for i in range(len(sequences)) if i not in errors]
+    if valid:
+        probabilities = served.engine.run(batch[valid])
+        start = time.perf_counter()
+        for i, row in zip(valid, probabilities):
+            result = format_prediction(row, served.inv_label_map)
+            result["top_k"] = top_predictions(row, served.inv_label_map, top_k)
+            results[i] = {"index": i, **result}
+        record_timing("postprocess", time.perf_counter() - start)
+    return {"model_version": served.version, "results": results}
 
-        logger.info(f"Predicción completada: {predicted_label} (Confianza: {confidence:.2f})")
-        return {
-            "predicted_label": predicted_label,
-            "confidence": confidence
-        }
+def predict(data: Dict):
+    """
+    Predicción síncrona. La pasada del modelo se agrupa con las solicitudes
+    concurrentes de otros hilos (ver get_batcher); desde rutas async se ejecuta
+    en el ejecutor de inferencia (utils.ejecutor_inferencia.get_executor).
+    Con data["early_exit"] se usa predict_early_exit y la respuesta incluye
+    la cantidad de frames utilizados.
+    """
+    try:
+        # Versión del modelo (y su label_map) para toda la solicitud; su recorte de
+        # reposo define el preprocesamiento. Las secuencias sin señas se rechazan
+        # antes de ejecutar el modelo
+        served = get_served_model()
+        start = time.perf_counter()
+        diagnostics = new_diagnostics()
+        input_array = preprocess_for_evaluation(data, diagnostics, served.endpointing)
+        record_timing("preprocess", time.perf_counter() - start)
+
+        logger.info("Realizando predicción.")
+        if data.get("early_exit"):
+            frames = data["landmarks"] if data.get("landmarks") is not None else data["framesData"]
+            return predict_early_exit(input_array[0], len(frames), served, diagnostics["frames"])
+
+        probabilities = get_batcher().submit((served, input_array[0])).result()
+        start = time.perf_counter()
+        result = format_prediction(probabilities, served.inv_label_map)
+        record_timing("postprocess", time.perf_counter() - start)
+        return result
+    except NoSigningDetected as e:
+        logger.info(f"Predicción rechazada: {e}")
+        raise
     except Exception as e:
         logger.error(f"Error en la predicción: {e}")
         raise e
@@ -0,0 +1,431 @@
+# backend/utils/evaluacion_offline.py
+"""
+Evaluación offline de una versión del modelo.
+
+Mide una versión del registro (utils.registro_modelos) contra el dataset
+(secuencias ya preprocesadas: bloque empaquetado y archivos .npy) o contra una
+carpeta de capturas crudas (JSON o .npz con "label", como data/capturas).
+Sobre el dataset se evalúa por defecto solo el conjunto de prueba, reconstruido
+con la misma división y semilla del entrenamiento de la versión; con
+subset="all" se evalúa el dataset completo, que incluye los datos de
+entrenamiento (igual que las capturas). Las
+secuencias se evalúan en lotes de EVALUATION_BATCH_SIZE con una pasada del
+modelo por lote, sin el micro-lote ni el ejecutor de la API; las capturas se
+leen y preprocesan por bloques en EVALUATION_WORKERS procesos mientras el
+proceso principal ejecuta el modelo.
+
+El resultado incluye la matriz de confusión, precisión/recall/F1 por clase,
+la exactitud con y sin el umbral de confianza de la API y los tiempos de cada
+pasada. Desde la API corre en un proceso dedicado (start_evaluation_process) y
+el resultado queda en la tabla de trabajos.
+
+Uso (en backend/):
+    python -m utils.evaluacion_offline [--version V] [--source dataset|capturas] [--subset test|all] [--path DIR]
+"""
+import os
+import json
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from queue import Empty
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from utils.preprocesamiento import (
+    ENDPOINTING, TARGET_LENGTH, Endpointing, NoSigningDetected, flatten_features, preprocess_batch,
+)
+from utils.procesamiento import CAPTURE_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Directorio por defecto de cada origen
+SOURCES = {
+    "dataset": "dataset",
+    "capturas": "data/capturas",
+}
+# Subconjuntos evaluables del dataset
+SUBSETS = {
+    "test": "conjunto de prueba del entrenamiento",
+    "all": "dataset completo (incluye datos de entrenamiento)",
+}
+
+_ctx = multiprocessing.get_context("spawn")
+_lock = threading.Lock()
+_process = None
+_cancel_event = None
+
+class EvaluationCancelled(Exception):
+    pass
+
+# ------------------ LECTURA DE SECUENCIAS ------------------
+
+def _test_indices(y: np.ndarray, split: Dict) -> np.ndarray:
+    """
+    Índices del conjunto de prueba con la división registrada al entrenar la versión.
+    """
+    from utils.entrenamiento_modelo import SPLIT_SEED, split_dataset
+
+    idx_test = split_dataset(np.arange(len(y)), y, split.get("test_size", 0.2),
+                             split.get("validation_size", 0.1), split.get("seed", SPLIT_SEED))[2]
+    # Mismo orden de lectura que el dataset, para aprovechar los accesos contiguos al bloque
+    return np.sort(idx_test)
+
+def _dataset_batches(dataset_dir: str, batch_size: int, split: Optional[Dict] = None
+                     ) -> Tuple[int, Iterator[Tuple[np.ndarray, List[str], Dict]]]:
+    """
+    Retorna (total, iterador de lotes (X, etiquetas, contadores)) del dataset.
+    Con `split` (división registrada en la versión) solo se leen los registros
+    del conjunto de prueba. Los registros del bloque empaquetado se leen con un
+    solo acceso por lote.
+    """
+    from utils import dataset_shards
+    from utils.entrenamiento_modelo import index_dataset, read_record
+
+    paths, records, y, label_map = index_dataset(dataset_dir)
+    if split is not None:
+        if split.get("sequences") not in (None, len(y)):
+            logger.warning(f"El dataset cambió desde el entrenamiento ({split['sequences']} -> {len(y)} secuencias); "
+                           f"el conjunto de prueba reconstruido puede incluir datos de entrenamiento.")
+        keep = _test_indices(y, split)
+        paths, records, y = paths[keep], records[keep], y[keep]
+    words = {index: word for word, index in label_map.items()}
+
+    def batches():
+        shard = dataset_shards.open_shard(dataset_dir)[0] if dataset_shards.shard_exists(dataset_dir) else None
+        for start in range(0, len(y), batch_size):
+            batch_paths, batch_records = paths[start:start + batch_size], records[start:start + batch_size]
+            if shard is not None and (batch_records >= 0).all():
+                X = np.asarray(shard[batch_records], dtype=np.float32)
+            else:
+                X = np.stack([read_record(path, record) for path, record in zip(batch_paths, batch_records)])
+            yield X, [words[int(label)] for label in y[start:start + batch_size]], {}
+
+    return len(y), batches()
+
+def _load_capture(path: str):
+    """
+    Lee una captura cruda: retorna (frames o array (T, POINTS_PER_FRAME, 3), etiqueta).
+    """
+    if path.endswith(".npz"):
+        with np.load(path) as npz:
+            return npz["landmarks"].astype(np.float32), str(npz["label"])
+    with open(path, "r") as f:
+        data = json.load(f)
+    return data["framesData"], data["label"]
+
+def _preprocess_captures(paths: List[str], endpointing: Endpointing = ENDPOINTING) -> Tuple[np.ndarray, List[str], Dict]:
+    """
+    Lee y preprocesa un bloque de capturas en un solo lote (se ejecuta en los
+    procesos del pool) con el recorte de reposo de la versión evaluada. Las
+    capturas inválidas o sin señas se descartan y se cuentan.
+    """
+    start = time.perf_counter()
+    sequences, labels = [], []
+    counters = {"invalid": 0, "rejected": 0}
+    for path in paths:
+        try:
+            sequence, label = _load_capture(path)
+        except Exception as e:
+            logger.error(f"Captura no válida {path}: {e}")
+            counters["invalid"] += 1
+            continue
+        sequences.append(sequence)
+        labels.append(label)
+
+    errors = {}
+    X = flatten_features(preprocess_batch(sequences, TARGET_LENGTH, endpointing=endpointing, errors=errors))
+    for error in errors.values():
+        counters["rejected" if isinstance(error, NoSigningDetected) else "invalid"] += 1
+    keep = [i for i in range(len(sequences)) if i not in errors]
+    counters["preprocess_seconds"] = time.perf_counter() - start
+    return X[keep], [labels[i] for i in keep], counters
+
+def _capture_batches(input_dir: str, batch_size: int, workers: int,
+                     endpointing: Endpointing = ENDPOINTING) -> Tuple[int, Iterator[Tuple[np.ndarray, List[str], Dict]]]:
+    """
+    Retorna (total, iterador de lotes) de una carpeta de capturas. Con más de un
+    worker los bloques se preprocesan en paralelo (a lo sumo 2 por worker en
+    espera) y se entregan a medida que terminan.
+    """
+    paths = [os.path.join(input_dir, f) for f in sorted(os.listdir(input_dir)) if f.endswith(CAPTURE_EXTENSIONS)]
+    chunks = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+
+    def batches():
+        if workers <= 1:
+            for chunk in chunks:
+                yield _preprocess_captures(chunk, endpointing)
+            return
+        # "spawn": el proceso que evalúa ya tiene TensorFlow cargado
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_ctx) as pool:
+            pending_chunks = iter(chunks)
+            running = set()
+            while True:
+                while len(running) < 2 * workers:
+                    chunk = next(pending_chunks, None)
+                    if chunk is None:
+                        break
+                    running.add(pool.submit(_preprocess_captures, chunk, endpointing))
+                if not running:
+                    return
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    return len(paths), batches()
+
+# ------------------ MÉTRICAS ------------------
+
+def _percentile_ms(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)) * 1000, 3) if values else 0.0
+
+def classification_report(confusion: np.ndarray, labels: List[str]) -> Dict:
+    """
+    Exactitud, precisión/recall/F1 por clase y sus promedios macro a partir de la
+    matriz de confusión (filas = clase real, columnas = clase predicha).
+    """
+    true_positives = np.diag(confusion).astype(np.float64)
+    predicted = confusion.sum(axis=0)
+    support = confusion.sum(axis=1)
+    precision = np.divide(true_positives, predicted, out=np.zeros_like(true_positives), where=predicted > 0)
+    recall = np.divide(true_positives, support, out=np.zeros_like(true_positives), where=support > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall,
+                   out=np.zeros_like(true_positives), where=(precision + recall) > 0)
+    present = support > 0
+    return {
+        "accuracy": float(true_positives.sum() / max(confusion.sum(), 1)),
+        "macro_precision": float(precision[present].mean()) if present.any() else 0.0,
+        "macro_recall": float(recall[present].mean()) if present.any() else 0.0,
+        "macro_f1": float(f1[present].mean()) if present.any() else 0.0,
+        "per_class": {
+            label: {"precision": float(precision[i]), "recall": float(recall[i]),
+                    "f1": float(f1[i]), "support": int(support[i])}
+            for i, label in enumerate(labels)
+        },
+    }
+
+# ------------------ EVALUACIÓN ------------------
+
+def evaluate_version(version: Optional[str] = None, source: str = "dataset", path: Optional[str] = None,
+                     batch_size: Optional[int] = None, workers: Optional[int] = None,
+                     progress: Optional[Callable[[Dict], None]] = None, cancel_event=None,
+                     subset: str = "test") -> Dict:
+    """
+    Evalúa la versión `version` del registro (None = la activa) sobre `source`
+    ("dataset" o "capturas") en `path` (por defecto SOURCES[source]).
+    `subset` ("test" o "all") elige qué parte del dataset se evalúa; las
+    capturas siempre se evalúan completas.
+    `progress(datos)` se llama después de cada lote; si `cancel_event` se activa
+    se lanza EvaluationCancelled al terminar el lote en curso.
+    """
+    from utils.evaluacion import CONFIDENCE_THRESHOLD, ServedModel
+    from utils.registro_modelos import load_bundle, resolve_active
+
+    if source not in SOURCES:
+        raise ValueError(f"Origen desconocido: {source}. Opciones: {', '.join(SOURCES)}.")
+    if subset not in SUBSETS:
+        raise ValueError(f"Subconjunto desconocido: {subset}. Opciones: {', '.join(SUBSETS)}.")
+    path = path or SOURCES[source]
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"No existe el directorio {path}.")
+    batch_size = max(int(batch_size or settings.EVALUATION_BATCH_SIZE), 1)
+    workers = settings.EVALUATION_WORKERS if workers is None else workers
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+
+    served = ServedModel(load_bundle(version) if version else resolve_active())
+    labels = [served.inv_label_map[i] for i in range(len(served.inv_label_map))]
+
+    if source == "dataset":
+        split = None
+        if subset == "test":
+            split = served.bundle.get("metrics", {}).get("split")
+            if split is None:
+                logger.warning(f"La versión {served.version} no registra su división; se usan los valores por defecto.")
+                split = {}
+        total, batches = _dataset_batches(path, batch_size, split)
+    else:
+        subset = "all"
+        total, batches = _capture_batches(path, batch_size, workers, served.endpointing)
+    logger.info(f"Evaluando la versión {served.version} sobre {source} ({path}, {SUBSETS[subset]}) "
+                f"en lotes de {batch_size}.")
+
+    confusion = np.zeros((len(labels), len(labels)), dtype=np.int64)
+    confident = np.zeros(2, dtype=np.int64)   # [aceptadas, aceptadas correctas]
+    skipped = {"invalid": 0, "rejected": 0, "unknown_labels": {}}
+    forward_seconds, preprocess_seconds = [], 0.0
+    seen = evaluated = 0
+    start = time.perf_counter()
+
+    for X, words, counters in batches:
+        skipped["invalid"] += counters.get("invalid", 0)
+        skipped["rejected"] += counters.get("rejected", 0)
+        preprocess_seconds += counters.get("preprocess_seconds", 0.0)
+        seen += len(words) + counters.get("invalid", 0) + counters.get("rejected", 0)
+
+        # Etiquetas que la versión evaluada no conoce: no se pueden puntuar
+        y_true = np.array([served.label_map.get(word, -1) for word in words], dtype=np.int64)
+        for word in {w for w, y in zip(words, y_true) if y < 0}:
+            skipped["unknown_labels"][word] = skipped["unknown_labels"].get(word, 0) + words.count(word)
+        known = y_true >= 0
+        if known.any():
+            batch_start = time.perf_counter()
+            probabilities = served.engine.run(np.ascontiguousarray(X[known], dtype=np.float32))
+            forward_seconds.append(time.perf_counter() - batch_start)
+
+            y_pred = probabilities.argmax(axis=1)
+            np.add.at(confusion, (y_true[known], y_pred), 1)
+            accepted = probabilities.max(axis=1) >= CONFIDENCE_THRESHOLD
+            confident += [int(accepted.sum()), int((accepted & (y_pred == y_true[known])).sum())]
+            evaluated += int(known.sum())
+
+        if progress:
+            elapsed = time.perf_counter() - start
+            progress({"version": served.version, "source": source, "subset": subset, "total": total, "processed": seen,
+                      "evaluated": evaluated, "sequences_per_second": round(evaluated / max(elapsed, 1e-9), 1)})
+        if cancel_event is not None and cancel_event.is_set():
+            raise EvaluationCancelled()
+
+    elapsed = time.perf_counter() - start
+    forward_total = sum(forward_seconds)
+    result = {
+        "version": served.version,
+        "source": source,
+        "path": path,
+        "subset": subset,
+        "subset_description": SUBSETS[subset],
+        "total": total,
+        "evaluated": evaluated,
+        "skipped": skipped,
+        **classification_report(confusion, labels),
+        "confidence_threshold": CONFIDENCE_THRESHOLD,
+        "coverage": float(confident[0] / max(evaluated, 1)),
+        "accuracy_accepted": float(confident[1] / max(confident[0], 1)),
+        "labels": labels,
+        "confusion_matrix": confusion.tolist(),
+        "latency": {
+            "batch_size": batch_size,
+            "batches": len(forward_seconds),
+            "batch_ms_p50": _percentile_ms(forward_seconds, 50),
+            "batch_ms_p95": _percentile_ms(forward_seconds, 95),
+            "batch_ms_max": _percentile_ms(forward_seconds, 100),
+            "ms_per_sequence": round(forward_total * 1000 / max(evaluated, 1), 4),
+            "preprocess_seconds": round(preprocess_seconds, 3),
+            "elapsed_seconds": round(elapsed, 3),
+            "sequences_per_second": round(evaluated / max(elapsed, 1e-9), 1),
+        },
+    }
+    logger.info(f"Evaluación de la versión {served.version}: exactitud {result['accuracy']:.4f} "
+                f"en {evaluated} secuencias ({elapsed:.1f}s).")
+    return result
+
+# ------------------ PROCESO DEDICADO ------------------
+
+def _worker_main(queue, cancel_event, kwargs: Dict):
+    """
+    Punto de entrada del proceso hijo. Envía a la cola tuplas (tipo, datos) con
+    tipo "progress", "completed", "cancelled" o "failed".
+    """
+    try:
+        # Misma prioridad baja que el entrenamiento: no compite con las predicciones
+        if settings.TRAINING_NICE and hasattr(os, "nice"):
+            os.nice(settings.TRAINING_NICE)
+        result = evaluate_version(progress=lambda data: queue.put(("progress", data)),
+                                  cancel_event=cancel_event, **kwargs)
+        queue.put(("completed", result))
+    except EvaluationCancelled:
+        queue.put(("cancelled", {}))
+    except Exception as e:
+        queue.put(("failed", {"error": str(e)}))
+
+def _monitor(process, queue, cancel_event, state: Dict, on_finish: Optional[Callable[[str, Dict], None]]):
+    """
+    Hilo del proceso de la API: vuelca los mensajes del hijo en `state` y al
+    terminar llama a `on_finish(estado, state)`.
+    """
+    final_status = None
+    while final_status is None:
+        try:
+            kind, data = queue.get(timeout=1)
+        except Empty:
+            if not process.is_alive():
+                break
+            continue
+        if kind == "progress":
+            state["progress"] = data
+        else:
+            final_status = kind
+            state["result"] = data
+
+    process.join()
+    if final_status is None:
+        final_status = "cancelled" if cancel_event.is_set() else "failed"
+        state["result"] = {"exitcode": process.exitcode}
+    state["status"] = final_status
+    logger.info(f"Evaluación offline finalizada: {final_status}.")
+    if on_finish:
+        try:
+            on_finish(final_status, state)
+        except Exception as e:
+            logger.error(f"Error al registrar el fin de la evaluación: {e}")
+
+def is_evaluation_running() -> bool:
+    return _process is not None and _process.is_alive()
+
+def start_evaluation_process(state: Dict, on_finish: Optional[Callable[[str, Dict], None]] = None, **kwargs):
+    """
+    Lanza evaluate_version(**kwargs) en un proceso dedicado, así TensorFlow y el
+    modelo evaluado no se cargan en el proceso de la API. Actualiza `state`
+    ("status", "progress", "result") a medida que avanza.
+    """
+    global _process, _cancel_event
+    with _lock:
+        if is_evaluation_running():
+            raise RuntimeError("Ya hay una evaluación en curso.")
+        queue = _ctx.Queue()
+        _cancel_event = _ctx.Event()
+        # No es daemon: puede crear sus propios procesos para preprocesar capturas
+        _process = _ctx.Process(target=_worker_main, args=(queue, _cancel_event, kwargs), name="evaluacion-offline")
+        _process.start()
+
+        state.update({"status": "running", "progress": {}, "result": {}})
+        threading.Thread(target=_monitor, args=(_process, queue, _cancel_event, state, on_finish), daemon=True).start()
+        logger.info(f"Evaluación offline iniciada en el proceso {_process.pid} ({kwargs}).")
+
+def cancel_evaluation_process() -> bool:
+    """
+    Solicita que la evaluación en curso se detenga al terminar el lote actual.
+    Retorna False si no había evaluación en curso.
+    """
+    if not is_evaluation_running():
+        return False
+    _cancel_event.set()
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Evaluación offline de una versión del modelo.")
+    parser.add_argument("--version", default=None, help="versión del registro (por defecto la activa)")
+    parser.add_argument("--source", choices=list(SOURCES), default="dataset")
+    parser.add_argument("--subset", choices=list(SUBSETS), default="test",
+                        help="test = conjunto de prueba del entrenamiento, all = dataset completo")
+    parser.add_argument("--path", default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None, help="archivo JSON donde guardar el resultado")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    report = evaluate_version(args.version, args.source, args.path, args.batch_size, args.workers,
+                              subset=args.subset)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    summary = {key: report[key] for key in ("version", "subset_description", "evaluated", "skipped", "accuracy", "macro_f1",
+                                            "coverage", "accuracy_accepted", "latency")}
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
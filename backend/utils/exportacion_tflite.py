@@ -0,0 +1,193 @@
+# backend/utils/exportacion_tflite.py
+"""
+Exportación del modelo a TFLite y comparación con el backend Keras.
+
+- export_tflite: convierte el modelo entrenado (sin cuantizar, con cuantización de
+  rango dinámico o int8 calibrada con secuencias de entrenamiento).
+- compare_backends: mide en procesos separados la exactitud, la latencia por
+  secuencia y la memoria residente (RSS) de cada backend sobre el mismo conjunto.
+
+Uso desde la línea de comandos (en backend/):
+    python -m utils.exportacion_tflite export [none|dynamic|int8]   (publica una versión nueva)
+    python -m utils.exportacion_tflite compare
+"""
+import os
+import time
+import logging
+import multiprocessing
+from queue import Empty
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import tensorflow as tf
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ("none", "dynamic", "int8")
+TFLITE_MODEL_PATH = "models/gesture_model.tflite"
+
+# ------------------ EXPORTACIÓN ------------------
+
+def export_tflite(model, output_path: str = TFLITE_MODEL_PATH, quantization: str = "none",
+                  calibration_data: Optional[Callable[[], np.ndarray]] = None,
+                  calibration_samples: int = 200) -> str:
+    """
+    Convierte un modelo Keras a TFLite y lo guarda en `output_path`.
+
+    - quantization: "none", "dynamic" (pesos int8) o "int8" (pesos y activaciones,
+      calibradas con `calibration_data()`, que retorna secuencias (n, T, F)).
+    La entrada y la salida del modelo se mantienen en float32.
+    """
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Cuantización no soportada: {quantization}. Opciones: {QUANTIZATION_MODES}.")
+
+    # Firma con lote 1: el LSTM se convierte a la operación fusionada de TFLite,
+    # cuyo estado queda fijo en lote 1 (TFLiteEngine ejecuta una secuencia por invocación)
+    input_shape = tuple(model.input_shape[1:])
+    forward = tf.function(lambda x: model(x, training=False))
+    concrete = forward.get_concrete_function(tf.TensorSpec((1, *input_shape), tf.float32))
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete], model)
+
+    if quantization in ("dynamic", "int8"):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "int8":
+        if calibration_data is None:
+            raise ValueError("La cuantización int8 requiere datos de calibración.")
+        samples = np.asarray(calibration_data(), dtype=np.float32)[:calibration_samples]
+
+        def representative_dataset():
+            for sample in samples:
+                yield [sample[None]]
+
+        converter.representative_dataset = representative_dataset
+
+    tflite_model = converter.convert()
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(tflite_model)
+    os.replace(tmp_path, output_path)
+    logger.info(f"Modelo TFLite ({quantization}) exportado en {output_path}: {len(tflite_model) / 1024:.1f} KiB.")
+    return output_path
+
+# ------------------ COMPARACIÓN ------------------
+
+def _rss_mb() -> float:
+    """
+    Memoria residente pico del proceso en MiB.
+    """
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 if os.name != "darwin" else rss / (1024 * 1024)
+
+def _measure_backend(backend: str, X: np.ndarray, y: np.ndarray, queue):
+    """
+    Se ejecuta en un proceso hijo para que la RSS de un backend no incluya la del otro.
+    """
+    try:
+        from utils import evaluacion
+        evaluacion.settings.INFERENCE_BACKEND = backend
+
+        start = time.perf_counter()
+        engine = evaluacion.get_engine()
+        engine.warmup(runs=1)
+        load_seconds = time.perf_counter() - start
+
+        latencies = []
+        predictions = []
+        for sample in X:
+            start = time.perf_counter()
+            probabilities = engine.run(engine.collate([sample]))
+            latencies.append(time.perf_counter() - start)
+            predictions.append(int(np.argmax(probabilities[0])))
+
+        latencies_ms = np.array(latencies) * 1000
+        queue.put({
+            "backend": backend,
+            "accuracy": float(np.mean(np.array(predictions) == y)) if len(y) else None,
+            "load_seconds": round(load_seconds, 3),
+            "latency_ms_mean": round(float(latencies_ms.mean()), 3),
+            "latency_ms_p50": round(float(np.percentile(latencies_ms, 50)), 3),
+            "latency_ms_p95": round(float(np.percentile(latencies_ms, 95)), 3),
+            "rss_mb": round(_rss_mb(), 1),
+        })
+    except Exception as e:
+        queue.put({"backend": backend, "error": str(e)})
+
+def _wait_result(process, queue, backend: str, timeout: float) -> Dict:
+    """
+    Espera el resultado del proceso hijo. Si el proceso muere sin responder (p. ej.
+    un fallo en código nativo) o se agota `timeout`, retorna el error.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return queue.get(timeout=1)
+        except Empty:
+            pass
+        if not process.is_alive():
+            try:
+                return queue.get(timeout=1)
+            except Empty:
+                return {"backend": backend, "error": f"El proceso terminó sin resultado (código {process.exitcode})."}
+        if time.monotonic() > deadline:
+            process.terminate()
+            return {"backend": backend, "error": f"Sin resultado después de {timeout:.0f}s."}
+
+def compare_backends(X: np.ndarray, y: np.ndarray, backends=("keras", "tflite"), timeout: float = 600) -> Dict:
+    """
+    Evalúa cada backend de utils.evaluacion sobre (X, y) en un proceso propio.
+    Retorna las métricas por backend y la diferencia de exactitud respecto a Keras.
+    `timeout` limita los segundos de espera por backend.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    report = {}
+    for backend in backends:
+        queue = ctx.Queue()
+        process = ctx.Process(target=_measure_backend, args=(backend, X, y, queue))
+        process.start()
+        report[backend] = _wait_result(process, queue, backend, timeout)
+        process.join()
+        logger.info(f"Backend {backend}: {report[backend]}")
+
+    baseline = report.get("keras", {}).get("accuracy")
+    for backend, metrics in report.items():
+        if baseline is not None and metrics.get("accuracy") is not None:
+            metrics["accuracy_delta"] = round(metrics["accuracy"] - baseline, 4)
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+    import json
+    from utils.entrenamiento_modelo import load_dataset, split_dataset
+    import shutil
+    import tempfile
+    from utils.registro_modelos import TFLITE_FILE, publish_bundle, resolve_active
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "compare"
+    X, y, _ = load_dataset("dataset")
+    X_train, _, X_test, _, _, y_test = split_dataset(X, y)
+
+    if command == "export":
+        quantization = sys.argv[2] if len(sys.argv) > 2 else "none"
+        # Los bundles son inmutables: se publica una versión nueva con los mismos
+        # pesos y etiquetas de la activa más el modelo TFLite
+        bundle = resolve_active()
+        with open(bundle["label_map_path"], "r", encoding="utf-8") as f:
+            label_map = json.load(f)
+        model = tf.keras.models.load_model(bundle["model_path"])
+        export_dir = tempfile.mkdtemp()
+        try:
+            tflite_path = export_tflite(model, os.path.join(export_dir, TFLITE_FILE), quantization,
+                                        calibration_data=lambda: X_train)
+            version = publish_bundle(bundle["model_path"], label_map, tflite_path, metrics={
+                **bundle.get("metrics", {}),
+                "tflite_quantization": quantization,
+                "exported_from": bundle["version"],
+            })
+        finally:
+            shutil.rmtree(export_dir, ignore_errors=True)
+        print(f"Versión {version} publicada con el modelo TFLite ({quantization}) de la versión {bundle['version']}.")
+    else:
+        print(json.dumps(compare_backends(np.asarray(X_test), y_test), indent=2))
@@ -0,0 +1,131 @@
+# backend/utils/formato_binario.py
+"""
+Formato binario compacto para enviar secuencias de landmarks.
+
+Estructura (little-endian):
+  - Cabecera (12 bytes): magic b"LMKB", versión (u8), dtype (u8: 1=float32, 2=float16),
+    cantidad de grupos (u16) y cantidad de frames (u32).
+  - Cantidad de puntos por grupo (u16 cada uno), en el orden de LANDMARK_GROUPS
+    (pose, leftHand, rightHand, face). Aplica a todos los frames; un grupo no
+    detectado en un frame se envía con ceros.
+  - Datos: frames × puntos × (x, y, z) en el dtype indicado.
+
+El contenido se decodifica directamente a un array (T, POINTS_PER_FRAME, 3) float32.
+Un lote de secuencias (evaluación por lotes) se envía como registros consecutivos
+con este mismo formato.
+"""
+import struct
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.preprocesamiento import GROUP_OFFSETS, LANDMARK_GROUPS, POINTS_PER_FRAME
+
+BINARY_CONTENT_TYPE = "application/x-landmarks"
+
+MAGIC = b"LMKB"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHI")
+DTYPES = {
+    1: np.dtype("<f4"),
+    2: np.dtype("<f2"),
+}
+_DTYPE_CODES = {dtype: code for code, dtype in DTYPES.items()}
+
+class TooManyRecords(ValueError):
+    """El lote trae más registros de los admitidos."""
+
+def decode_landmarks(buffer: bytes) -> np.ndarray:
+    """
+    Decodifica un buffer binario y retorna un array (T, POINTS_PER_FRAME, 3) float32.
+    Lanza ValueError si el contenido no respeta el formato.
+    """
+    array, end = _decode_record(buffer, 0)
+    if end != len(buffer):
+        raise ValueError(
+            f"Tamaño de datos inválido: se esperaban {end} bytes, se recibieron {len(buffer)}."
+        )
+    return array
+
+def decode_landmarks_batch(buffer: bytes, max_records: Optional[int] = None) -> List[np.ndarray]:
+    """
+    Decodifica registros consecutivos y retorna un array (T, POINTS_PER_FRAME, 3) por secuencia.
+    Con `max_records` lanza TooManyRecords al encontrar un registro de más, sin decodificarlo.
+    """
+    arrays = []
+    offset = 0
+    while offset < len(buffer):
+        if max_records is not None and len(arrays) >= max_records:
+            raise TooManyRecords(f"El lote admite hasta {max_records} secuencias.")
+        array, offset = _decode_record(buffer, offset)
+        arrays.append(array)
+    if not arrays:
+        raise ValueError("El lote no contiene secuencias.")
+    return arrays
+
+def _decode_record(buffer: bytes, start: int) -> Tuple[np.ndarray, int]:
+    """
+    Decodifica el registro que comienza en `start`; retorna el array y la posición
+    donde termina.
+    """
+    if len(buffer) - start < HEADER.size:
+        raise ValueError("Contenido binario demasiado corto.")
+    magic, version, dtype_code, n_groups, n_frames = HEADER.unpack_from(buffer, start)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Cabecera binaria inválida o versión no soportada.")
+    if dtype_code not in DTYPES:
+        raise ValueError(f"Tipo de dato no soportado: {dtype_code}.")
+    if n_groups != len(LANDMARK_GROUPS):
+        raise ValueError(f"Se esperaban {len(LANDMARK_GROUPS)} grupos de puntos, se recibieron {n_groups}.")
+    if n_frames == 0:
+        raise ValueError("La secuencia no contiene frames.")
+
+    if len(buffer) - start < HEADER.size + 2 * n_groups:
+        raise ValueError("Contenido binario demasiado corto.")
+    counts = np.frombuffer(buffer, dtype="<u2", count=n_groups, offset=start + HEADER.size).astype(int)
+    offset = start + HEADER.size + 2 * n_groups
+    dtype = DTYPES[dtype_code]
+    total_points = int(counts.sum())
+    expected_size = n_frames * total_points * 3 * dtype.itemsize
+    if len(buffer) - offset < expected_size:
+        raise ValueError(
+            f"Tamaño de datos inválido: se esperaban {expected_size} bytes, se recibieron {len(buffer) - offset}."
+        )
+    end = offset + expected_size
+
+    raw = np.frombuffer(buffer, dtype=dtype, count=n_frames * total_points * 3, offset=offset)
+    raw = raw.reshape(n_frames, total_points, 3)
+    if not np.isfinite(raw).all():
+        raise ValueError("Los datos contienen valores no finitos.")
+
+    if tuple(counts) == tuple(count for _, count in LANDMARK_GROUPS):
+        return raw.astype(np.float32), end
+
+    # Cantidades distintas a las esperadas: se copia cada grupo a su posición,
+    # rellenando con ceros o descartando los puntos sobrantes
+    array = np.zeros((n_frames, POINTS_PER_FRAME, 3), dtype=np.float32)
+    source = 0
+    for (group, expected), received in zip(LANDMARK_GROUPS, counts):
+        start = GROUP_OFFSETS[group][0]
+        used = min(expected, received)
+        array[:, start:start + used] = raw[:, source:source + used]
+        source += received
+    return array, end
+
+def encode_landmarks(array: np.ndarray, dtype: str = "float32") -> bytes:
+    """
+    Codifica un array (T, POINTS_PER_FRAME, 3) en el formato binario.
+    """
+    dtype = np.dtype(dtype).newbyteorder("<")
+    array = np.asarray(array)
+    if array.ndim != 3 or array.shape[1:] != (POINTS_PER_FRAME, 3):
+        raise ValueError(f"Se esperaba un array (T, {POINTS_PER_FRAME}, 3), se recibió {array.shape}.")
+    header = HEADER.pack(MAGIC, VERSION, _DTYPE_CODES[dtype], len(LANDMARK_GROUPS), array.shape[0])
+    counts = np.array([count for _, count in LANDMARK_GROUPS], dtype="<u2").tobytes()
+    return header + counts + array.astype(dtype).tobytes()
+
+def encode_landmarks_batch(arrays: Sequence[np.ndarray], dtype: str = "float32") -> bytes:
+    """
+    Codifica varias secuencias como registros consecutivos.
+    """
+    return b"".join(encode_landmarks(array, dtype) for array in arrays)
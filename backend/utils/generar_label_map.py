@@ -1,6 +1,7 @@
 # backend/utils/generar_label_map.py
 import os
 import json
+from utils.dataset_shards import shard_labels
 
 def create_label_map_from_folders(dataset_dir="dataset", output_path="models/label_map.json"):
     """
@@ -11,11 +12,11 @@ def create_label_map_from_folders(dataset_dir="dataset", output_path="models/lab
         print(f"Carpeta {dataset_dir} no existe.")
         return
 
-    # Leer subcarpetas
-    labels = sorted([
+    # Leer subcarpetas y etiquetas del bloque empaquetado (si existe)
+    labels = sorted(set(
         d for d in os.listdir(dataset_dir)
         if os.path.isdir(os.path.join(dataset_dir, d))
-    ])
+    ) | set(shard_labels(dataset_dir)))
 
     # Crear el mapeo label -> índice
     label_map = {}
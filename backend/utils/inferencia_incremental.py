@@ -0,0 +1,222 @@
+# backend/utils/inferencia_incremental.py
+"""
+Inferencia incremental del LSTM para ventanas deslizantes.
+
+IncrementalLSTM reimplementa en NumPy las capas del modelo entrenado
+(LSTM -> LSTM -> Dense -> Dropout -> Dense, ver create_lstm_model) a partir de
+sus pesos, y avanza el estado oculto y de celda de un frame a la vez.
+
+SlidingWindowLSTM aplica esto a la ventana deslizante: cada `stride` frames
+inicia un estado nuevo y los avanza todos juntos como un lote; cuando un estado
+completa `window` frames su salida es exactamente la del modelo sobre esa
+ventana y se descarta. Como el LSTM empieza cada ventana desde cero, hay
+ceil(window / stride) estados vivos y cada frame cuesta ese número de pasos:
+el mismo cómputo total que reevaluar la ventana cada `stride` frames. Lo que
+cambia es cómo se reparte: un paso pequeño en lote por frame, sin la pasada de
+Keras ni el pico de latencia al completar cada ventana.
+
+Validación contra el modelo completo (en backend/):
+    python -m utils.inferencia_incremental
+"""
+import logging
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-x))
+
+def _relu(x: np.ndarray) -> np.ndarray:
+    return np.maximum(x, 0)
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+_ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": _relu,
+    "sigmoid": _sigmoid,
+    "tanh": np.tanh,
+    "softmax": _softmax,
+}
+
+class IncrementalLSTM:
+    """
+    Capas del modelo como arrays float32:
+      lstm_layers: [(kernel (F, 4u), recurrent_kernel (u, 4u), bias (4u,))]
+      dense_layers: [(kernel, bias, activación)]
+    Las compuertas siguen el orden de Keras (i, f, c, o).
+    """
+    def __init__(self, lstm_layers: List[Tuple], dense_layers: List[Tuple]):
+        self.lstm_layers = [tuple(np.asarray(w, dtype=np.float32) for w in layer) for layer in lstm_layers]
+        self.dense_layers = [
+            (np.asarray(kernel, dtype=np.float32), np.asarray(bias, dtype=np.float32), _ACTIVATIONS[activation])
+            for kernel, bias, activation in dense_layers
+        ]
+        self.units = [recurrent.shape[0] for _, recurrent, _ in self.lstm_layers]
+
+    @classmethod
+    def from_keras_model(cls, model) -> "IncrementalLSTM":
+        """
+        Extrae los pesos de un modelo Keras secuencial de capas LSTM y Dense.
+        Lanza ValueError si el modelo tiene otra arquitectura.
+        """
+        lstm_layers, dense_layers = [], []
+        for layer in model.layers:
+            kind = type(layer).__name__
+            if kind == "LSTM":
+                if dense_layers:
+                    raise ValueError("Las capas LSTM deben preceder a las densas.")
+                if layer.activation.__name__ != "tanh" or layer.recurrent_activation.__name__ != "sigmoid":
+                    raise ValueError(f"Activaciones no soportadas en la capa {layer.name}.")
+                kernel, recurrent, bias = layer.get_weights()
+                lstm_layers.append((kernel, recurrent, bias))
+            elif kind == "Dense":
+                kernel, bias = layer.get_weights()
+                dense_layers.append((kernel, bias, layer.activation.__name__))
+            elif kind in ("Dropout", "InputLayer"):
+                continue
+            else:
+                raise ValueError(f"Capa no soportada para inferencia incremental: {kind}.")
+        if not lstm_layers:
+            raise ValueError("El modelo no tiene capas LSTM.")
+        return cls(lstm_layers, dense_layers)
+
+    def initial_state(self, batch: int) -> List[np.ndarray]:
+        """
+        Estado (h, c) de cada capa en ceros, para `batch` secuencias.
+        """
+        return [np.zeros((2, batch, units), dtype=np.float32) for units in self.units]
+
+    def step(self, x: np.ndarray, state: List[np.ndarray]) -> Tuple[np.ndarray, List[np.ndarray]]:
+        """
+        Avanza un frame. x: (batch, F). Retorna (probabilidades (batch, clases), estado nuevo).
+        """
+        new_state = []
+        for (kernel, recurrent, bias), (h, c) in zip(self.lstm_layers, state):
+            z = x @ kernel + h @ recurrent + bias
+            i, f, g, o = np.split(z, 4, axis=-1)
+            c = _sigmoid(f) * c + _sigmoid(i) * np.tanh(g)
+            h = _sigmoid(o) * np.tanh(c)
+            new_state.append(np.stack([h, c]))
+            x = h
+        for kernel, bias, activation in self.dense_layers:
+            x = activation(x @ kernel + bias)
+        return x, new_state
+
+    def run_sequence(self, sequence: np.ndarray) -> np.ndarray:
+        """
+        Probabilidades después de cada frame de una secuencia (T, F) -> (T, clases).
+        La última fila equivale a la salida del modelo sobre la secuencia completa.
+        """
+        state = self.initial_state(1)
+        outputs = []
+        for frame in np.asarray(sequence, dtype=np.float32):
+            probabilities, state = self.step(frame[None], state)
+            outputs.append(probabilities[0])
+        return np.stack(outputs)
+
+    def padded_prefixes(self, sequence: np.ndarray, lengths: List[int],
+                        target_length: int) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Para cada n de `lengths` (creciente y menor que target_length) genera
+        (n, probabilidades del modelo sobre sequence[:n] completado hasta
+        target_length repitiendo su último frame), igual que pad_or_trim_array.
+        Los frames del prefijo se recorren una sola vez; solo el relleno se
+        calcula para cada prefijo. Es un generador para cortar en el primero útil.
+        """
+        sequence = np.asarray(sequence, dtype=np.float32)
+        state = self.initial_state(1)
+        position = 0
+        for n in lengths:
+            for frame in sequence[position:n]:
+                _, state = self.step(frame[None], state)
+            position = n
+            padded_state, last = state, sequence[n - 1][None]
+            for _ in range(target_length - n):
+                probabilities, padded_state = self.step(last, padded_state)
+            yield n, probabilities[0]
+
+class SlidingWindowLSTM:
+    """
+    Salida del modelo sobre la ventana de los últimos `window` frames, cada
+    `stride` frames. Cada frame recibido avanza en un lote los
+    `steps_per_frame` estados vivos, uno por ventana en curso.
+    """
+    def __init__(self, lstm: IncrementalLSTM, window: int, stride: int = 1):
+        self.lstm = lstm
+        self.window = window
+        self.stride = max(int(stride), 1)
+        self.frames = 0
+        self._ages = np.zeros(0, dtype=np.int64)   # frames vistos por cada estado activo
+        self._state = lstm.initial_state(0)
+
+    @property
+    def steps_per_frame(self) -> int:
+        """
+        Pasos del LSTM por frame una vez llena la ventana: ceil(window / stride).
+        """
+        return -(-self.window // self.stride)
+
+    def push(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Avanza un frame (F,) ya normalizado. Retorna las probabilidades de la
+        ventana que termina en este frame cuando corresponde evaluar, si no None.
+        """
+        if self.frames % self.stride == 0:
+            # Nueva ventana que comienza en este frame
+            self._ages = np.append(self._ages, 0)
+            self._state = [np.concatenate([s, z], axis=1)
+                           for s, z in zip(self._state, self.lstm.initial_state(1))]
+        self.frames += 1
+
+        batch = np.broadcast_to(np.asarray(frame, dtype=np.float32), (len(self._ages), len(frame)))
+        probabilities, self._state = self.lstm.step(batch, self._state)
+        self._ages += 1
+
+        done = self._ages >= self.window
+        if not done.any():
+            return None
+        result = probabilities[np.flatnonzero(done)[-1]]
+        keep = ~done
+        self._ages = self._ages[keep]
+        self._state = [s[:, keep] for s in self._state]
+        return result
+
+def max_difference(model, lstm: IncrementalLSTM, sequences: np.ndarray) -> float:
+    """
+    Diferencia máxima entre la salida del modelo sobre ventanas completas
+    (n, T, F) y la del último paso incremental.
+    """
+    sequences = np.asarray(sequences, dtype=np.float32)
+    expected = np.asarray(model(sequences, training=False))
+    incremental = np.stack([lstm.run_sequence(sequence)[-1] for sequence in sequences])
+    return float(np.abs(expected - incremental).max())
+
+
+if __name__ == "__main__":
+    import tensorflow as tf
+    from utils.entrenamiento_modelo import load_dataset
+    from utils.registro_modelos import resolve_active
+
+    model = tf.keras.models.load_model(resolve_active()["model_path"])
+    lstm = IncrementalLSTM.from_keras_model(model)
+    X, _, _ = load_dataset("dataset")
+    sample = np.asarray(X[np.random.default_rng(0).choice(len(X), size=min(len(X), 64), replace=False)])
+    print(f"Diferencia máxima con el modelo completo: {max_difference(model, lstm, sample):.2e}")
+
+    # Ventana deslizante: la salida incremental coincide con el modelo sobre cada ventana
+    stream = np.concatenate(sample[:3])
+    sliding = SlidingWindowLSTM(lstm, window=X.shape[1], stride=5)
+    diffs = []
+    for t, frame in enumerate(stream):
+        probabilities = sliding.push(frame)
+        if probabilities is not None:
+            window = stream[t + 1 - X.shape[1]:t + 1][None]
+            diffs.append(np.abs(np.asarray(model(window, training=False))[0] - probabilities).max())
+    print(f"Ventanas deslizantes comparadas: {len(diffs)}, diferencia máxima: {max(diffs):.2e}")
+    print(f"Pasos del LSTM por frame: {sliding.steps_per_frame} (reevaluar la ventana cada "
+          f"{sliding.stride} frames: {X.shape[1] / sliding.stride:.1f})")
@@ -0,0 +1,116 @@
+# backend/utils/lotes_inferencia.py
+"""
+Agrupación de solicitudes de inferencia en micro-lotes.
+
+Las solicitudes que llegan dentro de una ventana corta (window_ms, contada desde
+la primera solicitud del lote) se apilan y se resuelven con una sola pasada del
+modelo, hasta max_batch_size entradas. Cada solicitud recibe un
+concurrent.futures.Future con su fila del resultado, así que sirve tanto a hilos
+(future.result()) como a código async (asyncio.wrap_future).
+"""
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """
+    Ejecuta `run_batch(array (n, ...)) -> array (n, ...)` sobre lotes de
+    solicitudes individuales en un hilo dedicado. `collate(lista de entradas)`
+    arma el lote (por defecto np.stack); permite escribir en un buffer preasignado.
+    """
+    def __init__(self, run_batch: Callable[[np.ndarray], np.ndarray],
+                 max_batch_size: int = 32, window_ms: float = 5.0, name: str = "micro-lotes",
+                 collate: Optional[Callable[[List[np.ndarray]], np.ndarray]] = None):
+        self.run_batch = run_batch
+        self.collate = collate or np.stack
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.window = max(window_ms, 0) / 1000
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "batches": 0, "max_batch_size": 0, "failed_batches": 0,
+                       "queue_wait_seconds": 0.0}
+
+    def submit(self, item: np.ndarray) -> Future:
+        """
+        Encola una entrada (sin dimensión de lote) y retorna el Future de su resultado.
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["avg_batch_size"] = round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0
+        queue_wait = stats.pop("queue_wait_seconds")
+        stats["avg_queue_wait_ms"] = round(queue_wait * 1000 / stats["requests"], 3) if stats["requests"] else 0
+        stats["window_ms"] = self.window * 1000
+        stats["max_batch_limit"] = self.max_batch_size
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def _collect(self):
+        """
+        Espera la primera solicitud y agrega las que lleguen dentro de la ventana.
+        """
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            try:
+                # Lo que ya está en cola se toma sin esperar
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Se descartan las solicitudes canceladas (p. ej. cliente desconectado)
+        return [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                continue
+            started = time.perf_counter()
+            queue_wait = sum(started - submitted for _, _, submitted in batch)
+            try:
+                outputs = self.run_batch(self.collate([item for item, _, _ in batch]))
+            except Exception as e:
+                logger.error(f"Error al ejecutar un lote de {len(batch)} solicitudes: {e}")
+                with self._stats_lock:
+                    self._stats["failed_batches"] += 1
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future, _), output in zip(batch, outputs):
+                future.set_result(output)
+            with self._stats_lock:
+                self._stats["requests"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["queue_wait_seconds"] += queue_wait
+                self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
@@ -0,0 +1,308 @@
+# backend/utils/preprocesamiento.py
+"""
+Motor de preprocesamiento de landmarks compartido por entrenamiento y evaluación.
+
+Convierte una captura (lista de frames con grupos de puntos {"x","y","z"}) en un
+array float32 de forma (T, puntos, 3) una sola vez, y aplica el relleno, la
+normalización centrada en los hombros y el ajuste temporal como operaciones
+NumPy sobre el array completo. Antes del ajuste temporal se recortan los frames
+de reposo al inicio y al final de la captura (detect_active_span).
+"""
+import os
+import logging
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ------------------ CONSTANTES ------------------
+
+# Orden y cantidad de puntos por grupo dentro de cada frame.
+# El rostro usa la malla refinada de MediaPipe Holistic (refineFaceLandmarks),
+# que es la que envía el frontend y la que define el dataset actual (553 puntos).
+LANDMARK_GROUPS = (
+    ("pose", 33),
+    ("leftHand", 21),
+    ("rightHand", 21),
+    ("face", 478),
+)
+GROUP_OFFSETS = {}
+_offset = 0
+for _name, _count in LANDMARK_GROUPS:
+    GROUP_OFFSETS[_name] = (_offset, _offset + _count)
+    _offset += _count
+POINTS_PER_FRAME = _offset
+FEATURES_PER_FRAME = POINTS_PER_FRAME * 3
+
+TARGET_LENGTH = 30
+
+# Detalle de diagnóstico por frame (solo para depuración; requiere nivel DEBUG)
+DEBUG_FRAMES = os.getenv("PIPELINE_DEBUG_FRAMES", "0") == "1"
+
+# Índices de los hombros dentro de la pose (MediaPipe)
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+
+# Detección del tramo con señas (endpointing). Un frame es activo si hay alguna
+# mano detectada o si los brazos de la pose se mueven más de MOTION_THRESHOLD
+# (coordenadas de imagen, 0-1) respecto al frame anterior.
+ENDPOINTING = os.getenv("PIPELINE_ENDPOINTING", "1") == "1"
+MOTION_THRESHOLD = float(os.getenv("PIPELINE_MOTION_THRESHOLD", "0.01"))
+ENDPOINT_MARGIN = int(os.getenv("PIPELINE_ENDPOINT_MARGIN", "2"))
+MIN_ACTIVE_FRAMES = int(os.getenv("PIPELINE_MIN_ACTIVE_FRAMES", "3"))
+
+# Parámetros del recorte: True usa los de arriba, False lo desactiva y un dict
+# {"motion_threshold", "margin", "min_active_frames"} fija otros (p. ej. los
+# registrados en el bundle del modelo, ver registro_modelos.bundle_endpointing)
+Endpointing = Union[bool, Dict, None]
+
+# Codos y muñecas dentro de la pose (MediaPipe)
+ARM_POINTS = [13, 14, 15, 16]
+
+_get_xyz = itemgetter("x", "y", "z")
+
+# ------------------ CONVERSIÓN ------------------
+
+def frames_to_array(frames: Sequence[Dict]) -> np.ndarray:
+    """
+    Convierte una lista de frames en un array (T, POINTS_PER_FRAME, 3) float32.
+    Cada grupo puede venir como lista de puntos {"x","y","z"} o como array (n, 3)
+    ya validado. Los grupos ausentes o incompletos quedan rellenos con ceros y los
+    puntos sobrantes se descartan.
+    """
+    array = np.zeros((len(frames), POINTS_PER_FRAME, 3), dtype=np.float32)
+    for t, frame in enumerate(frames):
+        for group, count in LANDMARK_GROUPS:
+            points = frame.get(group)
+            if points is None or len(points) == 0:
+                continue
+            start = GROUP_OFFSETS[group][0]
+            points = points[:count]
+            if isinstance(points, np.ndarray):
+                array[t, start:start + len(points)] = points
+            else:
+                array[t, start:start + len(points)] = list(map(_get_xyz, points))
+    return array
+
+def array_to_frames(array: np.ndarray) -> List[Dict]:
+    """
+    Operación inversa de frames_to_array: reconstruye la lista de frames en
+    formato {"x","y","z"} (usada para escribir los JSON procesados).
+    """
+    frames = []
+    for frame in array.tolist():
+        frames.append({
+            group: [{"x": p[0], "y": p[1], "z": p[2]} for p in frame[start:end]]
+            for group, (start, end) in GROUP_OFFSETS.items()
+        })
+    return frames
+
+# ------------------ OPERACIONES VECTORIZADAS ------------------
+
+def normalize_array(array: np.ndarray) -> np.ndarray:
+    """
+    Centra cada frame en el punto medio de los hombros y lo escala por la
+    distancia entre ellos. Acepta arrays (..., POINTS_PER_FRAME, 3).
+    Si la distancia es cero (pose ausente) se usa 1.
+    """
+    left = array[..., LEFT_SHOULDER, :]
+    right = array[..., RIGHT_SHOULDER, :]
+    center = (left + right) / 2
+    ref_distance = np.linalg.norm(left - right, axis=-1)
+    ref_distance[ref_distance == 0] = 1
+    return ((array - center[..., None, :]) / ref_distance[..., None, None]).astype(np.float32, copy=False)
+
+def pad_or_trim_array(array: np.ndarray, target_length: int = TARGET_LENGTH) -> np.ndarray:
+    """
+    Ajusta un array (T, ...) a target_length frames: recorta los sobrantes o
+    repite el último frame.
+    """
+    length = array.shape[0]
+    if length == 0:
+        raise ValueError("La secuencia no contiene frames.")
+    if length > target_length:
+        return array[:target_length]
+    if length < target_length:
+        padding = np.repeat(array[-1:], target_length - length, axis=0)
+        return np.concatenate([array, padding], axis=0)
+    return array
+
+# ------------------ ENDPOINTING ------------------
+
+class NoSigningDetected(ValueError):
+    """La secuencia no contiene frames con señas."""
+
+def detect_active_span(array: np.ndarray, motion_threshold: float = MOTION_THRESHOLD,
+                       margin: int = ENDPOINT_MARGIN,
+                       min_active_frames: int = MIN_ACTIVE_FRAMES) -> Optional[Tuple[int, int]]:
+    """
+    Retorna el tramo [inicio, fin) de un array (T, POINTS_PER_FRAME, 3) sin
+    normalizar entre el primer y el último frame activo, ampliado en `margin`
+    frames a cada lado. Retorna None si hay menos de `min_active_frames` activos.
+    """
+    present = np.any(array != 0, axis=-1)  # (T, puntos)
+    hands = np.zeros(len(array), dtype=bool)
+    for group in ("leftHand", "rightHand"):
+        start, end = GROUP_OFFSETS[group]
+        hands |= present[:, start:end].any(axis=1)
+
+    # Desplazamiento máximo de codos y muñecas entre frames consecutivos
+    arms = array[:, ARM_POINTS, :2]
+    arms_present = present[:, ARM_POINTS].all(axis=1)
+    displacement = np.linalg.norm(np.diff(arms, axis=0), axis=-1).max(axis=1, initial=0)
+    moving = np.zeros(len(array), dtype=bool)
+    moving[1:] = (displacement > motion_threshold) & arms_present[1:] & arms_present[:-1]
+
+    active = np.flatnonzero(hands | moving)
+    if len(active) < max(min_active_frames, 1):
+        return None
+    return max(int(active[0]) - margin, 0), min(int(active[-1]) + 1 + margin, len(array))
+
+def trim_idle_frames(array: np.ndarray, params: Optional[Dict] = None) -> np.ndarray:
+    """
+    Recorta los frames de reposo de un array (T, POINTS_PER_FRAME, 3).
+    `params` reemplaza los parámetros de detect_active_span.
+    Lanza NoSigningDetected si no hay actividad de señas.
+    """
+    span = detect_active_span(array, **(params or {}))
+    if span is None:
+        raise NoSigningDetected("No se detectaron señas en la secuencia.")
+    start, end = span
+    return array[start:end]
+
+# ------------------ DIAGNÓSTICO ------------------
+
+DIAGNOSTIC_COUNTERS = (
+    "sequences",
+    "frames",
+    "idle_frames",
+    "missing_pose_frames",
+    "missing_left_hand_frames",
+    "missing_right_hand_frames",
+    "missing_both_hands_frames",
+    "missing_face_frames",
+    "zero_shoulder_frames",
+    "padded_frames",
+    "trimmed_frames",
+)
+
+def new_diagnostics() -> Dict[str, int]:
+    return dict.fromkeys(DIAGNOSTIC_COUNTERS, 0)
+
+def merge_diagnostics(total: Dict[str, int], diagnostics: Dict[str, int]) -> Dict[str, int]:
+    for key in DIAGNOSTIC_COUNTERS:
+        total[key] = total.get(key, 0) + diagnostics.get(key, 0)
+    return total
+
+def format_diagnostics(diagnostics: Dict[str, int]) -> str:
+    """
+    Resumen de una línea con los contadores distintos de cero.
+    """
+    return ", ".join(f"{key}={value}" for key, value in diagnostics.items() if value)
+
+def diagnose_array(array: np.ndarray, target_length: int = TARGET_LENGTH,
+                   idle_frames: int = 0) -> Dict[str, int]:
+    """
+    Calcula los contadores de diagnóstico de una secuencia (T, POINTS_PER_FRAME, 3)
+    antes de rellenar/normalizar; `idle_frames` son los frames de reposo ya
+    recortados. El detalle por frame solo se registra con DEBUG_FRAMES activo
+    (variable de entorno PIPELINE_DEBUG_FRAMES=1).
+    """
+    present = np.any(array != 0, axis=-1)  # (T, puntos)
+    missing = {
+        group: ~present[:, start:end].any(axis=1)
+        for group, (start, end) in GROUP_OFFSETS.items()
+    }
+    zero_shoulder = ~np.any(array[:, LEFT_SHOULDER] != array[:, RIGHT_SHOULDER], axis=-1)
+    length = len(array)
+
+    if DEBUG_FRAMES and logger.isEnabledFor(logging.DEBUG):
+        for group, mask in missing.items():
+            if mask.any():
+                logger.debug(f"Frames sin '{group}': {np.flatnonzero(mask).tolist()}")
+        if zero_shoulder.any():
+            logger.debug(f"Frames con distancia entre hombros cero: {np.flatnonzero(zero_shoulder).tolist()}")
+
+    return {
+        "sequences": 1,
+        "frames": length,
+        "idle_frames": idle_frames,
+        "missing_pose_frames": int(missing["pose"].sum()),
+        "missing_left_hand_frames": int(missing["leftHand"].sum()),
+        "missing_right_hand_frames": int(missing["rightHand"].sum()),
+        "missing_both_hands_frames": int((missing["leftHand"] & missing["rightHand"]).sum()),
+        "missing_face_frames": int(missing["face"].sum()),
+        "zero_shoulder_frames": int(zero_shoulder.sum()),
+        "padded_frames": max(target_length - length, 0),
+        "trimmed_frames": max(length - target_length, 0),
+    }
+
+# ------------------ API DEL MOTOR ------------------
+
+def preprocess_frames(frames: Sequence[Dict], target_length: int = TARGET_LENGTH,
+                      diagnostics: Optional[Dict[str, int]] = None,
+                      endpointing: Endpointing = ENDPOINTING) -> np.ndarray:
+    """
+    Procesa una secuencia completa y retorna un array (target_length, POINTS_PER_FRAME, 3).
+    Si se pasa `diagnostics`, se acumulan en él los contadores de la secuencia.
+    Con `endpointing` se recortan antes los frames de reposo (ver trim_idle_frames
+    y Endpointing).
+    """
+    if not frames:
+        raise ValueError("La secuencia no contiene frames.")
+    return preprocess_array(frames_to_array(frames), target_length, diagnostics, endpointing)
+
+def _trim_and_diagnose(array: np.ndarray, target_length: int, diagnostics: Optional[Dict[str, int]],
+                       endpointing: Endpointing) -> np.ndarray:
+    length = len(array)
+    if endpointing and length:
+        array = trim_idle_frames(array, endpointing if isinstance(endpointing, dict) else None)
+    if diagnostics is not None:
+        merge_diagnostics(diagnostics, diagnose_array(array, target_length, length - len(array)))
+    return array
+
+def preprocess_array(array: np.ndarray, target_length: int = TARGET_LENGTH,
+                     diagnostics: Optional[Dict[str, int]] = None,
+                     endpointing: Endpointing = ENDPOINTING) -> np.ndarray:
+    """
+    Igual que preprocess_frames, pero a partir de un array (T, POINTS_PER_FRAME, 3)
+    ya decodificado (p. ej. desde el formato binario).
+    """
+    array = _trim_and_diagnose(array, target_length, diagnostics, endpointing)
+    array = pad_or_trim_array(array, target_length)
+    return normalize_array(array)
+
+def preprocess_batch(sequences: Sequence, target_length: int = TARGET_LENGTH,
+                     diagnostics: Optional[Dict[str, int]] = None,
+                     endpointing: Endpointing = ENDPOINTING,
+                     errors: Optional[Dict[int, ValueError]] = None) -> np.ndarray:
+    """
+    Variante por lotes: retorna un array (N, target_length, POINTS_PER_FRAME, 3)
+    normalizado en una sola operación. Cada secuencia puede ser una lista de
+    frames o un array (T, POINTS_PER_FRAME, 3). Con `errors`, las secuencias
+    inválidas o sin señas no interrumpen el lote: quedan en ceros y la excepción
+    se registra en errors[índice].
+    """
+    batch = np.zeros((len(sequences), target_length, POINTS_PER_FRAME, 3), dtype=np.float32)
+    for i, frames in enumerate(sequences):
+        try:
+            if len(frames) == 0:
+                raise ValueError(f"La secuencia {i} no contiene frames.")
+            array = frames if isinstance(frames, np.ndarray) else frames_to_array(frames)
+            array = _trim_and_diagnose(array, target_length, diagnostics, endpointing)
+        except ValueError as e:
+            if errors is None:
+                raise
+            errors[i] = e
+            continue
+        batch[i] = pad_or_trim_array(array, target_length)
+    return normalize_array(batch)
+
+def flatten_features(array: np.ndarray) -> np.ndarray:
+    """
+    Aplana los puntos de cada frame: (..., T, POINTS_PER_FRAME, 3) -> (..., T, FEATURES_PER_FRAME),
+    que es el formato de entrada del modelo y de los archivos .npy del dataset.
+    """
+    return array.reshape(*array.shape[:-2], FEATURES_PER_FRAME)
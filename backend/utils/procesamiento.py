@@ -1,9 +1,27 @@
 # backend/utils/procesamiento.py
 import os
 import json
+import time
+import hashlib
 import logging
+import multiprocessing
 import numpy as np
-from typing import List, Dict
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Optional, Union
+from utils import dataset_shards
+from utils.dataset_writer import SHARD_LOCK_NAME, file_lock, save_sequences
+from utils.preprocesamiento import (
+    TARGET_LENGTH,
+    NoSigningDetected,
+    array_to_frames,
+    flatten_features,
+    format_diagnostics,
+    merge_diagnostics,
+    new_diagnostics,
+    preprocess_array,
+    preprocess_frames,
+)
 
 
 # Configuración de logging
@@ -19,175 +37,452 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-# ------------------ FUNCIONES DE NORMALIZACIÓN ------------------
+# Los workers no heredan por fork los hilos, conexiones ni el estado de TensorFlow del proceso padre
+_ctx = multiprocessing.get_context("spawn")
 
-def fill_missing_landmarks(frame: Dict) -> Dict:
-    """
-    Rellena puntos de referencia faltantes con valores predeterminados (0, 0, 0).
-    """
-    expected_points = {
-        "pose": 33,
-        "leftHand": 21,
-        "rightHand": 21,
-        "face": 33 #solo contorno facial
-        
-        # "face": 468 #rostro completo
-    }
+# ------------------ PREPROCESAMIENTO ------------------
 
-    def fill_landmarks(points, expected_count):
-        if not points:
-            logger.warning(f"Puntos faltantes detectados, rellenando con {expected_count} puntos.")
-            return [{"x": 0, "y": 0, "z": 0} for _ in range(expected_count)]
-        elif len(points) < expected_count:
-            missing = expected_count - len(points)
-            logger.warning(f"Puntos incompletos detectados, rellenando con {missing} puntos.")
-            return points + [{"x": 0, "y": 0, "z": 0} for _ in range(missing)]
-        return points
-
-    filled_frame = {
-        "pose": fill_landmarks(frame.get("pose", []), expected_points["pose"]),
-        "leftHand": fill_landmarks(frame.get("leftHand", []), expected_points["leftHand"]),
-        "rightHand": fill_landmarks(frame.get("rightHand", []), expected_points["rightHand"]),
-        "face": fill_landmarks(frame.get("face", []), expected_points["face"]),
-    }
-    logger.debug(f"Frame completado: {filled_frame}")
-    return filled_frame
-
-def normalize_landmarks(frame: Dict) -> Dict:
-    """
-    Normaliza los puntos de referencia de un frame.
-    """
-    pose = frame.get("pose", [])
-    if not pose or len(pose) < 12:
-        logger.warning("No se encontraron suficientes puntos para normalizar. Frame no procesado.")
-        return frame
-
-    left_shoulder = np.array([pose[11]["x"], pose[11]["y"], pose[11]["z"]])
-    right_shoulder = np.array([pose[12]["x"], pose[12]["y"], pose[12]["z"]])
-    center = (left_shoulder + right_shoulder) / 2
-    ref_distance = np.linalg.norm(left_shoulder - right_shoulder)
-
-    if ref_distance == 0:
-        logger.warning("La distancia de referencia entre hombros es cero. Ajustando a 1.")
-        ref_distance = 1
-
-    def normalize_points(points):
-        return [
-            {
-                "x": (p["x"] - center[0]) / ref_distance,
-                "y": (p["y"] - center[1]) / ref_distance,
-                "z": (p["z"] - center[2]) / ref_distance,
-            }
-            for p in points
-        ]
-
-    normalized_frame = {
-        "pose": normalize_points(frame.get("pose", [])),
-        "leftHand": normalize_points(frame.get("leftHand", [])),
-        "rightHand": normalize_points(frame.get("rightHand", [])),
-        "face": normalize_points(frame.get("face", [])),
-    }
-    logger.debug(f"Frame normalizado: {normalized_frame}")
-    return normalized_frame
-
-def pad_or_trim_sequence(sequence: List[Dict], target_length: int = 30) -> List[Dict]:
+def preprocess_sequence(sequence: Union[List[Dict], np.ndarray], target_length: int = TARGET_LENGTH,
+                        diagnostics: Optional[Dict[str, int]] = None) -> np.ndarray:
     """
-    Ajusta una secuencia a una longitud fija.
-    """
-    if len(sequence) > target_length:
-        logger.info(f"Secuencia recortada de {len(sequence)} a {target_length} frames.")
-        return sequence[:target_length]
-    elif len(sequence) < target_length:
-        last_frame = sequence[-1]
-        logger.info(f"Secuencia rellenada de {len(sequence)} a {target_length} frames.")
-        while len(sequence) < target_length:
-            sequence.append(last_frame)
-    return sequence
-
-def preprocess_sequence(sequence: List[Dict], target_length: int = 30) -> List[Dict]:
+    Procesa una secuencia completa: recorta los frames de reposo, rellena,
+    normaliza y ajusta frames.
+    Acepta la lista de frames o un array (T, POINTS_PER_FRAME, 3) ya decodificado.
+    Retorna un array (target_length, POINTS_PER_FRAME, 3) float32.
+    Los contadores de diagnóstico se acumulan en `diagnostics` y se registran
+    en una sola línea por secuencia.
     """
-    Procesa una secuencia completa: normaliza, rellena y ajusta frames.
-    """
-    logger.info(f"Iniciando preprocesamiento de secuencia con {len(sequence)} frames.")
-    processed_frames = [fill_missing_landmarks(frame) for frame in sequence]
-    processed_frames = [normalize_landmarks(frame) for frame in processed_frames]
-    final_sequence = pad_or_trim_sequence(processed_frames, target_length)
-    logger.info("Preprocesamiento de secuencia completado.")
+    sequence_diagnostics = new_diagnostics()
+    if isinstance(sequence, np.ndarray):
+        final_sequence = preprocess_array(sequence, target_length, sequence_diagnostics)
+    else:
+        final_sequence = preprocess_frames(sequence, target_length, sequence_diagnostics)
+    logger.info(f"Secuencia preprocesada ({len(sequence)} frames): {format_diagnostics(sequence_diagnostics)}")
+    if diagnostics is not None:
+        merge_diagnostics(diagnostics, sequence_diagnostics)
     return final_sequence
 
 # ------------------ FUNCIONES DE ALMACENAMIENTO ------------------
 
-def save_sequence_as_numpy(sequence: List[Dict], word: str, dataset_dir: str = "dataset") -> str:
+def save_sequence_as_numpy(sequence: np.ndarray, word: str, dataset_dir: str = "dataset",
+                           dataset_format: str = "npy") -> str:
     """
-    Guarda una secuencia normalizada en formato NumPy (.npy), organizada por palabra.
+    Guarda una secuencia normalizada en formato NumPy, organizada por palabra.
+    - dataset_format="npy": un archivo seq_NNN.npy por secuencia dentro de dataset/<palabra>.
+    - dataset_format="shard": se agrega al bloque empaquetado (ver utils.dataset_shards).
+    La asignación de ids y la escritura atómica están en utils.dataset_writer.
     """
     try:
-        word_dir = os.path.join(dataset_dir, word)
-        os.makedirs(word_dir, exist_ok=True)
-
-        seq_id = len(os.listdir(word_dir)) + 1
-        file_name = f"seq_{seq_id:03d}.npy"
-        file_path = os.path.join(word_dir, file_name)
-
-        np_sequence = []
-        for frame in sequence:
-            frame_data = []
-            for group in ["pose", "leftHand", "rightHand", "face"]:
-                points = frame[group]
-                for point in points:
-                    frame_data.extend([point["x"], point["y"], point["z"]])
-            np_sequence.append(frame_data)
-
-        np_sequence = np.array(np_sequence, dtype=np.float32)
-        np.save(file_path, np_sequence)
-        
+        np_sequence = flatten_features(np.asarray(sequence, dtype=np.float32))
+        file_path = save_sequences(np_sequence[None], word, dataset_dir, dataset_format)[0]
         logger.info(f"Secuencia guardada en {file_path}")
         return file_path
     except Exception as e:
         logger.error(f"Error al guardar secuencia como NumPy: {e}")
         raise
 
-def store_sequence(sequence: List[Dict], word: str, dataset_dir: str = "dataset"):
+def store_sequence(sequence: np.ndarray, word: str, dataset_dir: str = "dataset", dataset_format: str = "npy"):
     """
     Guarda una secuencia en formato NumPy.
     """
     try:
-        numpy_path = save_sequence_as_numpy(sequence, word, dataset_dir)
+        numpy_path = save_sequence_as_numpy(sequence, word, dataset_dir, dataset_format)
         logger.info(f"Secuencia guardada en formato:\n NumPy: {numpy_path}")
+        return numpy_path
     except Exception as e:
         logger.error(f"Error en el almacenamiento estructurado: {e}")
         raise
 
+def sequence_exists(path: str, label_ids: Optional[np.ndarray] = None) -> bool:
+    """
+    `label_ids`: etiquetas del bloque del dataset ya abiertas (ver dataset_shards.record_exists).
+    """
+    if dataset_shards.is_record_locator(path):
+        return dataset_shards.record_exists(path, label_ids)
+    return os.path.exists(path)
+
+def overwrite_sequence(path: str, sequence: np.ndarray):
+    """
+    Reemplaza una secuencia ya almacenada (archivo .npy o registro del bloque).
+    """
+    np_sequence = flatten_features(np.asarray(sequence, dtype=np.float32))
+    if dataset_shards.is_record_locator(path):
+        dataset_shards.overwrite_record(path, np_sequence)
+    else:
+        np.save(path, np_sequence)
+
+def remove_sequence(path: str):
+    if dataset_shards.is_record_locator(path):
+        dataset_shards.delete_record(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+# ------------------ MANIFIESTO DE CAPTURAS PROCESADAS ------------------
+
+MANIFEST_NAME = "manifest.jsonl"
+CAPTURE_EXTENSIONS = (".json", ".npz")
+
+def load_manifest(manifest_path: str) -> Dict[str, Dict]:
+    """
+    Lee el manifiesto (un registro JSON por línea) y retorna {archivo: registro}.
+    Los registros posteriores reemplazan a los anteriores; una línea truncada
+    por una caída del proceso se ignora.
+    """
+    manifest = {}
+    if not os.path.exists(manifest_path):
+        return manifest
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Línea inválida ignorada en el manifiesto {manifest_path}.")
+                continue
+            manifest[entry["file"]] = entry
+    return manifest
+
+def write_manifest(manifest_path: str, manifest: Dict[str, Dict]):
+    """
+    Reescribe el manifiesto compactado de forma atómica (archivo temporal + rename).
+    """
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for entry in manifest.values():
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, manifest_path)
+
+def append_manifest_entry(manifest_path: str, entry: Dict):
+    """
+    Agrega un registro al manifiesto. Se escribe tras cada archivo almacenado
+    para poder reanudar después de una caída sin duplicar secuencias.
+    """
+    with open(manifest_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def recover_pending_entries(manifest: Dict[str, Dict]) -> int:
+    """
+    Resuelve los registros marcados "pending" que dejó una caída entre la escritura
+    de las secuencias y su registro definitivo. Si la secuencia llegó a escribirse
+    se adopta (y se elimina la de la versión anterior de la captura); si no, se
+    restaura el registro anterior para que la captura se vuelva a procesar.
+    Retorna la cantidad de registros resueltos.
+    """
+    recovered = 0
+    for filename, entry in list(manifest.items()):
+        if not entry.get("pending"):
+            continue
+        previous = entry.get("previous")
+        if sequence_exists(entry["path"]):
+            if previous and previous.get("path") and previous["path"] != entry["path"] \
+                    and sequence_exists(previous["path"]):
+                remove_sequence(previous["path"])
+            manifest[filename] = {k: v for k, v in entry.items() if k not in ("pending", "previous")}
+        elif previous:
+            manifest[filename] = previous
+        else:
+            del manifest[filename]
+        recovered += 1
+    if recovered:
+        logger.warning(f"{recovered} registros pendientes del manifiesto resueltos tras una interrupción.")
+    return recovered
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def select_pending_files(input_dir: str, filenames: List[str], manifest: Dict[str, Dict]) -> Dict[str, Dict]:
+    """
+    Retorna {archivo: firma} con las capturas nuevas o modificadas.
+    Si tamaño y fecha de modificación coinciden con el manifiesto no se lee el archivo;
+    en otro caso se compara el hash del contenido.
+    """
+    pending = {}
+    for filename in filenames:
+        info = os.stat(os.path.join(input_dir, filename))
+        entry = manifest.get(filename)
+        if entry and entry["size"] == info.st_size and entry["mtime"] == info.st_mtime:
+            continue
+        sha256 = file_sha256(os.path.join(input_dir, filename))
+        if entry and entry["sha256"] == sha256:
+            # Contenido igual (p. ej. archivo tocado o copiado): solo se actualiza la firma
+            manifest[filename] = {**entry, "size": info.st_size, "mtime": info.st_mtime}
+            continue
+        pending[filename] = {"sha256": sha256, "size": info.st_size, "mtime": info.st_mtime}
+    return pending
+
+def reset_dataset_from_manifest(manifest: Dict[str, Dict]):
+    """
+    Elimina del dataset las secuencias registradas en el manifiesto (modo reconstrucción).
+    Las secuencias que no figuran en el manifiesto no se tocan. Los registros del
+    bloque empaquetado se eliminan juntos y el bloque se compacta, para que la
+    reconstrucción no acumule registros eliminados.
+    """
+    locators = []
+    for entry in manifest.values():
+        path = entry.get("path")
+        if not path:
+            continue
+        if dataset_shards.is_record_locator(path):
+            locators.append(path)
+        elif os.path.exists(path):
+            os.remove(path)
+    for dataset_dir in dataset_shards.delete_records(locators):
+        with file_lock(os.path.join(dataset_dir, SHARD_LOCK_NAME)):
+            dataset_shards.compact_shard(dataset_dir)
+    manifest.clear()
+
 # ------------------ PROCESAMIENTO COMPLETO ------------------
 
-def preprocess_all_files(input_dir: str, output_dir: str, dataset_dir: str = "dataset"):
+def process_file(filename: str, input_dir: str, output_dir: str) -> Optional[Dict]:
+    """
+    Procesa un único archivo de captura (JSON, o .npz si llegó en formato binario):
+    lo preprocesa y escribe la versión normalizada en output_dir con el mismo formato. No toca el dataset; el proceso principal se
+    encarga de almacenar el resultado para evitar colisiones entre workers.
+    Retorna {"filename", "label", "sequence", "diagnostics", "elapsed"}; {"filename", "label",
+    "rejected", "elapsed"} si la captura no contiene señas, o None si el archivo no es válido.
+    """
+    start = time.perf_counter()
+    input_path = os.path.join(input_dir, filename)
+    output_path = os.path.join(output_dir, filename)
+
+    try:
+        if filename.endswith(".npz"):
+            with np.load(input_path) as npz:
+                if "landmarks" not in npz or "label" not in npz:
+                    logger.error(f"Estructura no válida en el archivo: {filename}")
+                    return None
+                label = str(npz["label"])
+                sequence = npz["landmarks"].astype(np.float32)
+        else:
+            with open(input_path, "r") as infile:
+                data = json.load(infile)
+
+            if "framesData" not in data or "label" not in data:
+                logger.error(f"Estructura no válida en el archivo: {filename}")
+                return None
+            label = data["label"]
+            sequence = data["framesData"]
+
+        diagnostics = new_diagnostics()
+        processed_sequence = preprocess_sequence(sequence, diagnostics=diagnostics)
+        if filename.endswith(".npz"):
+            np.savez(output_path, landmarks=processed_sequence, label=np.array(label))
+        else:
+            with open(output_path, "w") as outfile:
+                json.dump({"framesData": array_to_frames(processed_sequence), "label": label}, outfile, indent=4)
+    except NoSigningDetected:
+        logger.warning(f"Captura descartada, no contiene señas: {filename}")
+        if os.path.exists(output_path):
+            os.remove(output_path)   # versión normalizada de una captura anterior
+        return {
+            "filename": filename,
+            "label": label,
+            "rejected": "sin señas",
+            "elapsed": time.perf_counter() - start,
+        }
+    except Exception as e:
+        logger.exception(f"Error procesando el archivo {filename}: {e}")
+        return None
+
+    return {
+        "filename": filename,
+        "label": label,
+        "sequence": processed_sequence,
+        "diagnostics": diagnostics,
+        "elapsed": time.perf_counter() - start,
+    }
+
+def _process_chunk(filenames: List[str], input_dir: str, output_dir: str) -> List[Optional[Dict]]:
     """
-    Preprocesa todos los archivos JSON en un directorio y los guarda en formato estructurado.
+    Procesa un bloque de archivos dentro de un worker del pool.
+    """
+    return [process_file(filename, input_dir, output_dir) for filename in filenames]
+
+def _chunks(items: List[str], size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def preprocess_all_files(input_dir: str, output_dir: str, dataset_dir: str = "dataset",
+                         workers: int = 1, chunk_size: int = 16, stats: Optional[Dict] = None,
+                         rebuild: bool = False, dataset_format: str = "npy") -> Dict:
+    """
+    Preprocesa los archivos JSON de un directorio y los guarda en formato estructurado.
+    Solo se procesan las capturas nuevas o modificadas según el manifiesto del dataset.
+
+    - workers: número de procesos (1 = modo secuencial, 0 = todos los núcleos disponibles).
+    - chunk_size: archivos enviados a cada worker por tarea.
+    - stats: diccionario opcional que se actualiza en vivo con el progreso y el rendimiento.
+    - rebuild: elimina las secuencias registradas en el manifiesto y reprocesa todas las capturas.
+    - dataset_format: "npy" (un archivo por secuencia) o "shard" (bloque empaquetado).
     """
     logger.info(f"Iniciando preprocesamiento en el directorio: {input_dir}")
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         logger.info(f"Directorio de salida creado: {output_dir}")
 
-    for filename in os.listdir(input_dir):
-        if filename.endswith(".json"):
-            input_path = os.path.join(input_dir, filename)
-            output_path = os.path.join(output_dir, filename)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    chunk_size = max(1, chunk_size)
+
+    os.makedirs(dataset_dir, exist_ok=True)
+    manifest_path = os.path.join(dataset_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    recover_pending_entries(manifest)
+    if rebuild:
+        logger.info("Reconstrucción completa: se eliminan las secuencias registradas en el manifiesto.")
+        reset_dataset_from_manifest(manifest)
+
+    all_files = sorted(f for f in os.listdir(input_dir) if f.endswith(CAPTURE_EXTENSIONS))
+    pending = select_pending_files(input_dir, all_files, manifest)
+    # Compactar el manifiesto antes de empezar a agregar registros
+    write_manifest(manifest_path, manifest)
+    filenames = list(pending)
+    logger.info(f"{len(filenames)} capturas nuevas o modificadas de {len(all_files)}.")
+
+    stats = stats if stats is not None else {}
+    stats.update({
+        "workers": workers,
+        "total_files": len(filenames),
+        "skipped_files": len(all_files) - len(filenames),
+        "processed_files": 0,
+        "failed_files": 0,
+        "rejected_files": 0,
+        "elapsed_seconds": 0.0,
+        "files_per_second": 0.0,
+        "avg_file_seconds": 0.0,
+        "max_file_seconds": 0.0,
+        "diagnostics": new_diagnostics(),
+    })
+    start = time.perf_counter()
+    file_seconds = 0.0
 
+    def reserve(group: List[Dict]):
+        # Registra como pendientes las rutas reservadas antes de escribir las secuencias,
+        # para que una caída antes de commit no deje secuencias sin registrar
+        def write_pending(paths: List[str]):
+            for result, path in zip(group, paths):
+                filename = result["filename"]
+                append_manifest_entry(manifest_path, {
+                    "file": filename,
+                    **pending[filename],
+                    "label": result["label"],
+                    "path": path,
+                    "pending": True,
+                    "previous": manifest.get(filename),
+                    "processed_at": datetime.utcnow().isoformat(),
+                })
+        return write_pending
+
+    def commit(result: Dict, path: str):
+        # Registra en el manifiesto una secuencia ya escrita en el dataset
+        nonlocal file_seconds
+        filename = result["filename"]
+        entry = {
+            "file": filename,
+            **pending[filename],
+            "label": result["label"],
+            "path": path,
+            "processed_at": datetime.utcnow().isoformat(),
+        }
+        append_manifest_entry(manifest_path, entry)
+        manifest[filename] = entry
+        logger.info(f"Archivo procesado y almacenado: {filename}")
+        merge_diagnostics(stats["diagnostics"], result["diagnostics"])
+        stats["processed_files"] += 1
+        file_seconds += result["elapsed"]
+        stats["avg_file_seconds"] = file_seconds / stats["processed_files"]
+        stats["max_file_seconds"] = max(stats["max_file_seconds"], result["elapsed"])
+
+    def reject(result: Dict, label_ids):
+        # Captura sin señas: se registra sin secuencia para no volver a procesarla
+        # y se elimina la secuencia de una versión anterior del archivo
+        filename = result["filename"]
+        previous = manifest.get(filename)
+        if previous and previous.get("path") and sequence_exists(previous["path"], label_ids):
+            remove_sequence(previous["path"])
+        entry = {
+            "file": filename,
+            **pending[filename],
+            "label": result["label"],
+            "path": None,
+            "rejected": result["rejected"],
+            "processed_at": datetime.utcnow().isoformat(),
+        }
+        append_manifest_entry(manifest_path, entry)
+        manifest[filename] = entry
+        stats["rejected_files"] += 1
+
+    def merge(results: List[Optional[Dict]]):
+        # Solo el proceso principal escribe en el dataset; las secuencias nuevas
+        # de un bloque se guardan en un único lote por palabra
+        new_by_label = {}
+        # El bloque se abre una vez por lote de resultados para consultar sus registros
+        label_ids = dataset_shards.open_shard(dataset_dir)[1] if dataset_shards.shard_exists(dataset_dir) else None
+        for result in results:
+            if result is None:
+                stats["failed_files"] += 1
+                continue
+            if result.get("rejected"):
+                reject(result, label_ids)
+                continue
+            previous = manifest.get(result["filename"])
+            if (previous and previous.get("path") and previous["label"] == result["label"]
+                    and sequence_exists(previous["path"], label_ids)):
+                # Captura modificada: se reemplaza su secuencia en el mismo lugar
+                try:
+                    overwrite_sequence(previous["path"], result["sequence"])
+                except Exception as e:
+                    logger.exception(f"Error almacenando el archivo {result['filename']}: {e}")
+                    stats["failed_files"] += 1
+                    continue
+                commit(result, previous["path"])
+            else:
+                new_by_label.setdefault(result["label"], []).append(result)
+
+        for label, group in new_by_label.items():
             try:
-                with open(input_path, "r") as infile:
-                    data = json.load(infile)
-
-                if "framesData" in data and "label" in data:
-                    label = data["label"]
-                    frames_data = data["framesData"]
-
-                    processed_sequence = preprocess_sequence(frames_data)
-                    with open(output_path, "w") as outfile:
-                        json.dump({"framesData": processed_sequence, "label": label}, outfile, indent=4)
-                    store_sequence(processed_sequence, label, dataset_dir)
-                    logger.info(f"Archivo procesado y almacenado: {filename}")
-                else:
-                    logger.error(f"Estructura no válida en el archivo: {filename}")
+                paths = save_sequences(
+                    flatten_features(np.stack([r["sequence"] for r in group])),
+                    label, dataset_dir, dataset_format, before_write=reserve(group)
+                )
             except Exception as e:
-                logger.exception(f"Error procesando el archivo {filename}: {e}")
+                logger.exception(f"Error almacenando {len(group)} secuencias de '{label}': {e}")
+                stats["failed_files"] += len(group)
+                continue
+            for result, path in zip(group, paths):
+                previous = manifest.get(result["filename"])
+                if previous and previous.get("path") and sequence_exists(previous["path"], label_ids):
+                    remove_sequence(previous["path"])
+                commit(result, path)
+
+        stats["elapsed_seconds"] = time.perf_counter() - start
+        if stats["elapsed_seconds"] > 0:
+            stats["files_per_second"] = stats["processed_files"] / stats["elapsed_seconds"]
+
+    if workers == 1:
+        for chunk in _chunks(filenames, chunk_size):
+            merge(_process_chunk(chunk, input_dir, output_dir))
+    else:
+        logger.info(f"Preprocesamiento paralelo con {workers} procesos (bloques de {chunk_size}).")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_ctx) as executor:
+            futures = [
+                executor.submit(_process_chunk, chunk, input_dir, output_dir)
+                for chunk in _chunks(filenames, chunk_size)
+            ]
+            for future in as_completed(futures):
+                merge(future.result())
+
+    logger.info(
+        f"Preprocesamiento finalizado: {stats['processed_files']} archivos en "
+        f"{stats['elapsed_seconds']:.2f}s ({stats['files_per_second']:.2f} archivos/s), "
+        f"{stats['failed_files']} con errores, {stats['rejected_files']} sin señas, "
+        f"{stats['skipped_files']} sin cambios."
+    )
+    return stats
@@ -0,0 +1,120 @@
+# backend/utils/reconocimiento_continuo.py
+"""
+Reconocimiento continuo sobre un flujo de frames (endpoint WebSocket).
+
+Cada sesión guarda los últimos `window` frames ya normalizados en un buffer
+circular de tamaño fijo. Cada `stride` frames nuevos se arma la ventana en orden
+cronológico y se evalúa; las predicciones se filtran con un antirrebote: una
+etiqueta se emite solo cuando es la más probable (sobre el umbral) en `debounce`
+evaluaciones seguidas y no es la última emitida.
+
+Con un IncrementalLSTM (utils.inferencia_incremental) la sesión avanza el
+estado del LSTM con cada frame (push_incremental) y obtiene directamente las
+probabilidades de cada ventana completa; el cómputo es el mismo que reevaluar
+la ventana, pero repartido en un paso pequeño por frame. Mientras aún no hay `window` frames se
+arman ventanas parciales igual que en el modo por ventanas, así ambos modos
+empiezan a evaluar en `min_frames`.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.inferencia_incremental import IncrementalLSTM, SlidingWindowLSTM
+from utils.preprocesamiento import FEATURES_PER_FRAME, TARGET_LENGTH, flatten_features, normalize_array
+
+class StreamingSession:
+    def __init__(self, window: int = TARGET_LENGTH, stride: int = 5, min_frames: int = TARGET_LENGTH // 2,
+                 debounce: int = 2, threshold: float = 0.8, incremental: Optional[IncrementalLSTM] = None):
+        self.window = window
+        self.stride = max(int(stride), 1)
+        self.min_frames = min(max(int(min_frames), 1), window)
+        self.debounce = max(int(debounce), 1)
+        self.threshold = threshold
+
+        self.buffer = np.zeros((window, FEATURES_PER_FRAME), dtype=np.float32)
+        self.frames = 0           # frames recibidos en la sesión
+        self._since_eval = 0
+        self._candidate = None
+        self._streak = 0
+        self._misses = 0
+        self._emitted = None
+        self.incremental = SlidingWindowLSTM(incremental, window, self.stride) if incremental else None
+
+    def push(self, frames: np.ndarray) -> List[np.ndarray]:
+        """
+        Agrega frames (n, POINTS_PER_FRAME, 3) sin normalizar y retorna las
+        ventanas (window, FEATURES_PER_FRAME) que corresponde evaluar.
+        """
+        windows = []
+        for row in flatten_features(normalize_array(np.asarray(frames, dtype=np.float32))):
+            self.buffer[self.frames % self.window] = row
+            self.frames += 1
+            self._since_eval += 1
+            if self.frames >= self.min_frames and self._since_eval >= self.stride:
+                self._since_eval = 0
+                windows.append(self.current_window())
+        return windows
+
+    def push_incremental(self, frames: np.ndarray) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """
+        Modo incremental: agrega frames (n, POINTS_PER_FRAME, 3) sin normalizar.
+        Retorna (probabilidades de las ventanas completas que terminan en ellos,
+        ventanas parciales a evaluar con el modelo antes de reunir `window` frames).
+        """
+        results, windows = [], []
+        for row in flatten_features(normalize_array(np.asarray(frames, dtype=np.float32))):
+            self.buffer[self.frames % self.window] = row
+            self.frames += 1
+            self._since_eval += 1
+            probabilities = self.incremental.push(row)
+            if probabilities is not None:
+                self._since_eval = 0
+                results.append(probabilities)
+            elif self.frames < self.window and self.frames >= self.min_frames and self._since_eval >= self.stride:
+                self._since_eval = 0
+                windows.append(self.current_window())
+        return results, windows
+
+    def current_window(self) -> np.ndarray:
+        """
+        Ventana en orden cronológico; si aún no hay `window` frames se completa
+        repitiendo el último, igual que pad_or_trim_array.
+        """
+        if self.frames >= self.window:
+            return np.roll(self.buffer, -(self.frames % self.window), axis=0)
+        filled = self.buffer[:self.frames]
+        padding = np.repeat(filled[-1:], self.window - self.frames, axis=0)
+        return np.concatenate([filled, padding], axis=0)
+
+    def update(self, probabilities: np.ndarray, inv_label_map: Dict) -> Optional[Dict]:
+        """
+        Aplica el antirrebote a las probabilidades de una ventana. Retorna el
+        evento a enviar al cliente o None.
+        """
+        predicted_class_idx = int(np.argmax(probabilities))
+        confidence = float(probabilities[predicted_class_idx])
+        label = inv_label_map.get(predicted_class_idx) if confidence >= self.threshold else None
+
+        if label is None:
+            self._candidate, self._streak = None, 0
+            self._misses += 1
+            # Tras una pausa sin señas confiables se puede volver a emitir la misma palabra
+            if self._misses >= self.debounce:
+                self._emitted = None
+            return None
+
+        self._misses = 0
+        if label == self._candidate:
+            self._streak += 1
+        else:
+            self._candidate, self._streak = label, 1
+
+        if self._streak >= self.debounce and label != self._emitted:
+            self._emitted = label
+            return {
+                "type": "prediction",
+                "predicted_label": label,
+                "confidence": confidence,
+                "frame": self.frames,
+            }
+        return None
@@ -0,0 +1,252 @@
+# backend/utils/registro_modelos.py
+"""
+Registro de versiones del modelo.
+
+Cada entrenamiento publica un bundle inmutable en models/versions/<versión>/ con
+los pesos (gesture_model.h5 y, si existe, gesture_model.tflite), el label_map
+con el que se entrenó, el formato de las features y la configuración del
+preprocesamiento (bundle.json). El bundle se arma en un directorio temporal y se
+renombra al final, así nunca queda uno a medio escribir.
+
+models/registry.json indica la versión activa y el historial de activaciones
+(para volver a la anterior). Los procesos de la API lo consultan periódicamente
+y cambian de versión sin reiniciarse (ver utils.evaluacion.get_served_model).
+
+Sin registro se sirve la instalación anterior (models/gesture_model.h5 y
+models/label_map.json) como versión "legacy".
+"""
+import os
+import json
+import shutil
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from utils import preprocesamiento
+from utils.preprocesamiento import FEATURES_PER_FRAME, LANDMARK_GROUPS, POINTS_PER_FRAME, TARGET_LENGTH
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = settings.MODEL_DIR
+VERSIONS_DIR = "versions"
+REGISTRY_FILE = "registry.json"
+BUNDLE_FILE = "bundle.json"
+KERAS_FILE = "gesture_model.h5"
+TFLITE_FILE = "gesture_model.tflite"
+LABEL_MAP_FILE = "label_map.json"
+LEGACY_VERSION = "legacy"
+
+# ------------------ FORMATO DEL BUNDLE ------------------
+
+def feature_layout() -> Dict:
+    """
+    Formato de entrada que espera el modelo, según utils.preprocesamiento.
+    """
+    return {
+        "landmark_groups": [[group, count] for group, count in LANDMARK_GROUPS],
+        "points_per_frame": POINTS_PER_FRAME,
+        "features_per_frame": FEATURES_PER_FRAME,
+        "target_length": TARGET_LENGTH,
+    }
+
+def preprocessing_config() -> Dict:
+    return {
+        "normalization": "shoulders",
+        "endpointing": preprocesamiento.ENDPOINTING,
+        "motion_threshold": preprocesamiento.MOTION_THRESHOLD,
+        "endpoint_margin": preprocesamiento.ENDPOINT_MARGIN,
+        "min_active_frames": preprocesamiento.MIN_ACTIVE_FRAMES,
+    }
+
+def bundle_endpointing(bundle: Dict) -> Optional[Dict]:
+    """
+    Parámetros del recorte de frames de reposo con los que se entrenó el bundle
+    (ver preprocesamiento.Endpointing), o None si se entrenó sin recorte. Los
+    bundles anteriores al recorte no lo registran y se sirven sin él.
+    """
+    config = bundle.get("preprocessing") or {}
+    if not config.get("endpointing"):
+        return None
+    return {
+        "motion_threshold": config.get("motion_threshold", preprocesamiento.MOTION_THRESHOLD),
+        "margin": config.get("endpoint_margin", preprocesamiento.ENDPOINT_MARGIN),
+        "min_active_frames": config.get("min_active_frames", preprocesamiento.MIN_ACTIVE_FRAMES),
+    }
+
+def _write_json_atomic(path: str, data: Dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+@contextmanager
+def _registry_lock(model_dir: str):
+    """
+    Serializa las escrituras del registro entre procesos (entrenamiento y API).
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    with open(os.path.join(model_dir, ".registry.lock"), "w") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# ------------------ REGISTRO ------------------
+
+def read_registry(model_dir: str = MODEL_DIR) -> Dict:
+    path = os.path.join(model_dir, REGISTRY_FILE)
+    if not os.path.exists(path):
+        return {"active": None, "history": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def registry_mtime(model_dir: str = MODEL_DIR) -> Optional[int]:
+    """
+    Fecha de modificación del registro (None si no existe); sirve para detectar
+    cambios de versión sin leer el archivo.
+    """
+    try:
+        return os.stat(os.path.join(model_dir, REGISTRY_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def publish_bundle(model_path: str, label_map: Dict[str, int], tflite_path: Optional[str] = None,
+                   metrics: Optional[Dict] = None, model_dir: str = MODEL_DIR, activate: bool = True) -> str:
+    """
+    Copia los artefactos de un entrenamiento a un bundle nuevo y, con `activate`,
+    lo marca como versión activa. Retorna la versión.
+    """
+    versions_dir = os.path.join(model_dir, VERSIONS_DIR)
+    os.makedirs(versions_dir, exist_ok=True)
+    version = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    suffix = 1
+    while os.path.exists(os.path.join(versions_dir, version)):
+        suffix += 1
+        version = f"{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{suffix}"
+
+    tmp_dir = os.path.join(versions_dir, f".tmp-{version}")
+    os.makedirs(tmp_dir)
+    try:
+        shutil.copy2(model_path, os.path.join(tmp_dir, KERAS_FILE))
+        if tflite_path and os.path.exists(tflite_path):
+            shutil.copy2(tflite_path, os.path.join(tmp_dir, TFLITE_FILE))
+        _write_json_atomic(os.path.join(tmp_dir, LABEL_MAP_FILE), label_map)
+        _write_json_atomic(os.path.join(tmp_dir, BUNDLE_FILE), {
+            "version": version,
+            "created_at": datetime.utcnow().isoformat(),
+            "n_classes": len(label_map),
+            "feature_layout": feature_layout(),
+            "preprocessing": preprocessing_config(),
+            "metrics": metrics or {},
+        })
+        os.rename(tmp_dir, os.path.join(versions_dir, version))
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    logger.info(f"Bundle del modelo publicado: versión {version}.")
+    if activate:
+        activate_version(version, model_dir)
+    return version
+
+def load_bundle(version: str, model_dir: str = MODEL_DIR) -> Dict:
+    """
+    Metadatos de un bundle con las rutas de sus artefactos. Lanza
+    FileNotFoundError si no existe y ValueError si su formato de features o su
+    normalización no coinciden con los del preprocesamiento actual. El recorte de
+    reposo se aplica según lo registrado en el bundle (bundle_endpointing).
+    """
+    bundle_dir = os.path.join(model_dir, VERSIONS_DIR, version)
+    bundle_path = os.path.join(bundle_dir, BUNDLE_FILE)
+    if not os.path.exists(bundle_path):
+        raise FileNotFoundError(f"La versión {version} del modelo no existe.")
+    with open(bundle_path, "r", encoding="utf-8") as f:
+        bundle = json.load(f)
+    if bundle.get("feature_layout") != feature_layout():
+        raise ValueError(f"La versión {version} usa un formato de features distinto al del preprocesamiento actual.")
+    normalization = (bundle.get("preprocessing") or {}).get("normalization", "shoulders")
+    if normalization != preprocessing_config()["normalization"]:
+        raise ValueError(f"La versión {version} usa una normalización distinta ({normalization}).")
+
+    tflite_path = os.path.join(bundle_dir, TFLITE_FILE)
+    bundle.update({
+        "model_path": os.path.join(bundle_dir, KERAS_FILE),
+        "tflite_path": tflite_path if os.path.exists(tflite_path) else None,
+        "label_map_path": os.path.join(bundle_dir, LABEL_MAP_FILE),
+    })
+    return bundle
+
+def resolve_active(model_dir: str = MODEL_DIR) -> Dict:
+    """
+    Bundle de la versión activa, o la instalación anterior sin registro.
+    """
+    active = read_registry(model_dir).get("active")
+    if active:
+        return load_bundle(active, model_dir)
+
+    model_path = os.path.join(model_dir, KERAS_FILE)
+    label_map_path = os.path.join(model_dir, LABEL_MAP_FILE)
+    tflite_path = os.path.join(model_dir, TFLITE_FILE)
+    for path in (model_path, label_map_path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No hay una versión activa del modelo y no se encontró {path}.")
+    return {
+        "version": LEGACY_VERSION,
+        "model_path": model_path,
+        "tflite_path": tflite_path if os.path.exists(tflite_path) else None,
+        "label_map_path": label_map_path,
+    }
+
+def list_versions(model_dir: str = MODEL_DIR) -> List[Dict]:
+    versions_dir = os.path.join(model_dir, VERSIONS_DIR)
+    if not os.path.isdir(versions_dir):
+        return []
+    versions = []
+    for name in sorted(os.listdir(versions_dir)):
+        bundle_path = os.path.join(versions_dir, name, BUNDLE_FILE)
+        if name.startswith(".") or not os.path.exists(bundle_path):
+            continue
+        with open(bundle_path, "r", encoding="utf-8") as f:
+            versions.append(json.load(f))
+    return versions
+
+def activate_version(version: str, model_dir: str = MODEL_DIR) -> Dict:
+    """
+    Marca `version` como activa; queda al final del historial.
+    """
+    load_bundle(version, model_dir)
+    with _registry_lock(model_dir):
+        registry = read_registry(model_dir)
+        history = [v for v in registry.get("history", []) if v != version] + [version]
+        registry = {"active": version, "history": history, "updated_at": datetime.utcnow().isoformat()}
+        _write_json_atomic(os.path.join(model_dir, REGISTRY_FILE), registry)
+    logger.info(f"Versión activa del modelo: {version}.")
+    return registry
+
+def rollback(model_dir: str = MODEL_DIR) -> Dict:
+    """
+    Vuelve a la versión activada antes de la actual.
+    """
+    with _registry_lock(model_dir):
+        registry = read_registry(model_dir)
+        history = list(registry.get("history", []))
+        if len(history) < 2:
+            raise ValueError("No hay una versión anterior a la cual volver.")
+        history.pop()
+        load_bundle(history[-1], model_dir)
+        registry = {"active": history[-1], "history": history, "updated_at": datetime.utcnow().isoformat()}
+        _write_json_atomic(os.path.join(model_dir, REGISTRY_FILE), registry)
+    logger.info(f"Rollback del modelo a la versión {registry['active']}.")
+    return registry
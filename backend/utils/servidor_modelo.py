@@ -0,0 +1,193 @@
+# backend/utils/servidor_modelo.py
+"""
+Servidor de modelo local compartido por los workers de la API.
+
+Un solo proceso carga TensorFlow y el modelo, con los hilos de
+INFERENCE_INTRA_OP_THREADS / INFERENCE_INTER_OP_THREADS, y agrupa en micro-lotes
+las solicitudes de todos los workers (utils.evaluacion.get_batcher). Los workers
+configurados con MODEL_SERVER_SOCKET no importan TensorFlow: preprocesan la
+secuencia y envían el array ya listo por un socket Unix.
+
+Protocolo: cada mensaje es un encabezado "!II" (largo del JSON, largo del
+payload), un JSON y un payload binario opcional (float32 en orden C).
+  {"op": "info"}                              -> {"version", "label_map", "endpointing"}
+  {"op": "predict", "version", "shape"} + X   -> {"version", "active", "shape"} + probabilidades
+Una solicitud indica la versión del modelo con la que la armó el worker; el
+servidor la atiende con la versión en servicio o la anterior, que mantiene
+cargada, y "active" le avisa al worker cuando debe actualizar su label_map.
+
+Uso (en backend/):
+    python -m utils.servidor_modelo [ruta del socket]
+"""
+import os
+import json
+import socket
+import struct
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("!II")
+
+class ModelServerError(Exception):
+    """El servidor de modelo rechazó la solicitud o no está disponible."""
+
+# ------------------ PROTOCOLO ------------------
+
+def encode_message(header: Dict, payload: bytes = b"") -> bytes:
+    data = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    return _HEADER.pack(len(data), len(payload)) + data + payload
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("El servidor de modelo cerró la conexión.")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+def recv_message(sock: socket.socket) -> Tuple[Dict, bytes]:
+    header_size, payload_size = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    header = json.loads(_recv_exact(sock, header_size))
+    return header, _recv_exact(sock, payload_size) if payload_size else b""
+
+async def _read_message(reader: asyncio.StreamReader) -> Tuple[Dict, bytes]:
+    header_size, payload_size = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    header = json.loads(await reader.readexactly(header_size))
+    return header, await reader.readexactly(payload_size) if payload_size else b""
+
+# ------------------ CLIENTE (workers de la API) ------------------
+
+class ModelServerClient:
+    """
+    Cliente del servidor de modelo con una conexión por hilo. Si la conexión se
+    corta se reintenta una vez con una conexión nueva.
+    """
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.active_version = None   # versión en servicio reportada por el servidor
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError as e:
+                sock.close()
+                raise ModelServerError(f"No se pudo conectar al servidor de modelo en {self.socket_path}: {e}")
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def request(self, header: Dict, payload: bytes = b"") -> Tuple[Dict, bytes]:
+        message = encode_message(header, payload)
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                sock.sendall(message)
+                response, data = recv_message(sock)
+                break
+            except (ConnectionError, socket.timeout, OSError) as e:
+                self._close()
+                if attempt or isinstance(e, socket.timeout):
+                    raise ModelServerError(f"Error de comunicación con el servidor de modelo: {e}")
+        if "active" in response:
+            self.active_version = response["active"]
+        if "error" in response:
+            raise ModelServerError(response["error"])
+        return response, data
+
+    def info(self) -> Dict:
+        response, _ = self.request({"op": "info"})
+        self.active_version = response["version"]
+        return response
+
+    def predict(self, batch: np.ndarray, version: str) -> np.ndarray:
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        response, data = self.request({"op": "predict", "version": version, "shape": list(batch.shape)},
+                                      batch.tobytes())
+        return np.frombuffer(data, dtype=np.float32).reshape(response["shape"])
+
+# ------------------ SERVIDOR ------------------
+
+async def _handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    from utils import evaluacion
+
+    try:
+        while True:
+            try:
+                header, payload = await _read_message(reader)
+            except asyncio.IncompleteReadError:
+                break
+            try:
+                response, data = await _dispatch(evaluacion, header, payload)
+            except Exception as e:
+                logger.error(f"Error al atender la solicitud {header.get('op')}: {e}")
+                response, data = {"error": str(e)}, b""
+            writer.write(encode_message(response, data))
+            await writer.drain()
+    finally:
+        writer.close()
+
+async def _dispatch(evaluacion, header: Dict, payload: bytes) -> Tuple[Dict, bytes]:
+    op = header.get("op")
+    if op == "info":
+        served = evaluacion.get_served_model()
+        return {"version": served.version, "label_map": served.label_map, "endpointing": served.endpointing}, b""
+    if op != "predict":
+        return {"error": f"Operación desconocida: {op}"}, b""
+
+    served = evaluacion.get_loaded_model(header.get("version"))
+    active = evaluacion.get_served_model().version
+    if served is None:
+        return {"error": f"La versión {header.get('version')} no está cargada (activa: {active}).",
+                "active": active}, b""
+    batch = np.frombuffer(payload, dtype=np.float32).reshape(header["shape"])
+    batcher = evaluacion.get_batcher()
+    # Cada fila entra al micro-lote compartido con las solicitudes de los demás workers
+    futures = [asyncio.wrap_future(batcher.submit((served, row))) for row in batch]
+    probabilities = np.stack(await asyncio.gather(*futures)).astype(np.float32, copy=False)
+    return {"version": served.version, "active": active, "shape": list(probabilities.shape)}, probabilities.tobytes()
+
+async def serve(socket_path: str):
+    """
+    Carga y precalienta el modelo y atiende a los workers en `socket_path`.
+    """
+    from utils import evaluacion
+
+    evaluacion.warmup_inference()
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = await asyncio.start_unix_server(_handle_connection, path=socket_path)
+    os.chmod(socket_path, 0o660)
+    logger.info(f"Servidor de modelo (versión {evaluacion.get_model_info()['version']}) escuchando en {socket_path}.")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    import sys
+
+    socket_path = sys.argv[1] if len(sys.argv) > 1 else settings.MODEL_SERVER_SOCKET or "/tmp/tcc-modelo.sock"
+    # Este proceso es el que carga el modelo: no debe reenviarse a sí mismo
+    settings.MODEL_SERVER_SOCKET = ""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    asyncio.run(serve(socket_path))
@@ -0,0 +1,207 @@
+# backend/utils/trabajador_entrenamiento.py
+"""
+Proceso dedicado para el entrenamiento del modelo.
+
+El entrenamiento corre en un proceso hijo (multiprocessing "spawn"), así que
+TensorFlow no se importa en el proceso de la API ni compite por el GIL con las
+predicciones. El proceso hijo:
+  - limita los hilos de TensorFlow/BLAS, fija su afinidad de CPU y baja su prioridad
+    (TRAINING_THREADS, TRAINING_INTER_OP_THREADS, TRAINING_CPU_AFFINITY, TRAINING_NICE);
+  - reporta el progreso por época a través de una cola;
+  - se detiene al final del batch en curso cuando se solicita la cancelación.
+
+Un hilo del proceso de la API lee la cola y actualiza el diccionario de estado
+que expone el router.
+"""
+import os
+import logging
+import threading
+import multiprocessing
+from datetime import datetime
+from queue import Empty
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Segundos de espera tras solicitar la cancelación antes de terminar el proceso
+CANCEL_GRACE_SECONDS = 30
+
+_ctx = multiprocessing.get_context("spawn")
+_lock = threading.Lock()
+_process = None
+_cancel_event = None
+
+# ------------------ CONFIGURACIÓN DEL PROCESO HIJO ------------------
+
+def parse_cpu_list(value: str) -> List[int]:
+    """
+    Convierte "0,2,4-7" en [0, 2, 4, 5, 6, 7]. Una cadena vacía retorna [].
+    """
+    cpus = []
+    for part in filter(None, (p.strip() for p in value.split(","))):
+        start, _, end = part.partition("-")
+        cpus.extend(range(int(start), int(end or start) + 1))
+    return cpus
+
+def _limit_resources(threads: int, inter_op_threads: int, cpu_affinity: List[int], nice: int):
+    """
+    Se ejecuta en el proceso hijo antes de importar TensorFlow.
+    """
+    if cpu_affinity and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpu_affinity)
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+    if threads:
+        for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "TF_NUM_INTRAOP_THREADS"):
+            os.environ[var] = str(threads)
+    if inter_op_threads:
+        os.environ["TF_NUM_INTEROP_THREADS"] = str(inter_op_threads)
+
+    import tensorflow as tf
+    if threads:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+    if inter_op_threads:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+def _worker_main(meta_entrenamiento_id: int, queue, cancel_event, limits: Dict, train_kwargs: Dict):
+    """
+    Punto de entrada del proceso hijo. Envía a la cola tuplas (tipo, datos) con
+    tipo "progress", "completed", "cancelled" o "failed".
+    """
+    try:
+        _limit_resources(**limits)
+        from utils.entrenamiento_modelo import (
+            TrainingCancelled, TrainingProgress, train_gesture_recognition_model
+        )
+
+        epochs = train_kwargs.get("epochs", 50)
+        progress = TrainingProgress(lambda data: queue.put(("progress", data)), epochs, cancel_event)
+        queue.put(("progress", {"epoch": 0, "epochs": epochs, "pid": os.getpid()}))
+        try:
+            result = train_gesture_recognition_model(meta_entrenamiento_id, callbacks=[progress], **train_kwargs)
+        except TrainingCancelled:
+            queue.put(("cancelled", {}))
+            return
+        queue.put(("completed", {
+            "model_path": result["model_path"],
+            "model_version": result["model_version"],
+            "test_accuracy": float(result["test_accuracy"]),
+        }))
+    except Exception as e:
+        queue.put(("failed", {"error": str(e)}))
+
+# ------------------ CONTROL DESDE LA API ------------------
+
+def is_training_running() -> bool:
+    return _process is not None and _process.is_alive()
+
+def _mark_meta(meta_entrenamiento_id: int, estado: str):
+    """
+    Registra el estado final cuando el proceso hijo terminó sin poder hacerlo.
+    """
+    from app.db.coneccion import SessionLocal
+    from app.models.meta_entrenamiento_model import MetadatosEntrenamiento
+
+    db = SessionLocal()
+    try:
+        meta = db.query(MetadatosEntrenamiento).filter_by(id=meta_entrenamiento_id).first()
+        if meta and meta.estado not in ("completed", "failed", "cancelled"):
+            meta.estado = estado
+            meta.hora_fin = datetime.utcnow()
+            db.commit()
+    finally:
+        db.close()
+
+def _monitor(process, queue, cancel_event, state: Dict, meta_entrenamiento_id: int,
+             on_finish: Optional[Callable[[str, Dict], None]]):
+    """
+    Hilo del proceso de la API: vuelca los mensajes del hijo en `state` y al
+    terminar llama a `on_finish(estado, state)`.
+    """
+    final_status = None
+    while final_status is None:
+        try:
+            kind, data = queue.get(timeout=1)
+        except Empty:
+            if not process.is_alive():
+                break
+            continue
+        if kind == "progress":
+            state["progress"] = data
+        else:
+            final_status = kind
+            state["result"] = data
+
+    process.join()
+    if final_status is None:
+        # El proceso terminó sin reportar (cancelación forzada o caída)
+        final_status = "cancelled" if cancel_event.is_set() else "failed"
+        state["result"] = {"exitcode": process.exitcode}
+        try:
+            _mark_meta(meta_entrenamiento_id, final_status)
+        except Exception as e:
+            logger.error(f"No se pudo actualizar el entrenamiento {meta_entrenamiento_id}: {e}")
+
+    state["status"] = final_status
+    logger.info(f"Proceso de entrenamiento finalizado: {final_status} ({state.get('result')})")
+    if on_finish:
+        try:
+            on_finish(final_status, state)
+        except Exception as e:
+            logger.error(f"Error al registrar el fin del entrenamiento {meta_entrenamiento_id}: {e}")
+
+def start_training_process(meta_entrenamiento_id: int, state: Dict,
+                           on_finish: Optional[Callable[[str, Dict], None]] = None, **train_kwargs):
+    """
+    Lanza el entrenamiento en un proceso dedicado y actualiza `state`
+    ("status", "progress", "result") a medida que avanza. `on_finish(estado, state)`
+    se llama desde el hilo monitor cuando el proceso termina.
+    """
+    global _process, _cancel_event
+    with _lock:
+        if is_training_running():
+            raise RuntimeError("Ya hay un entrenamiento en curso.")
+
+        limits = {
+            "threads": settings.TRAINING_THREADS,
+            "inter_op_threads": settings.TRAINING_INTER_OP_THREADS,
+            "cpu_affinity": parse_cpu_list(settings.TRAINING_CPU_AFFINITY),
+            "nice": settings.TRAINING_NICE,
+        }
+        queue = _ctx.Queue()
+        _cancel_event = _ctx.Event()
+        _process = _ctx.Process(
+            target=_worker_main,
+            args=(meta_entrenamiento_id, queue, _cancel_event, limits, train_kwargs),
+            name=f"entrenamiento-{meta_entrenamiento_id}",
+            daemon=True,
+        )
+        _process.start()
+
+        state.update({"status": "running", "progress": {}, "result": {}})
+        threading.Thread(
+            target=_monitor, args=(_process, queue, _cancel_event, state, meta_entrenamiento_id, on_finish), daemon=True
+        ).start()
+        logger.info(f"Entrenamiento {meta_entrenamiento_id} iniciado en el proceso {_process.pid} ({limits}).")
+
+def cancel_training_process(grace_seconds: Optional[float] = CANCEL_GRACE_SECONDS) -> bool:
+    """
+    Solicita la cancelación del entrenamiento en curso. Si el proceso no termina
+    dentro de `grace_seconds` se fuerza su terminación.
+    Retorna False si no había entrenamiento en curso.
+    """
+    process = _process
+    if process is None or not process.is_alive():
+        return False
+    _cancel_event.set()
+
+    def _terminate_if_needed():
+        process.join(grace_seconds)
+        if process.is_alive():
+            logger.warning(f"El proceso {process.pid} no respondió a la cancelación; se termina.")
+            process.terminate()
+
+    threading.Thread(target=_terminate_if_needed, daemon=True).start()
+    return True